@@ -0,0 +1,291 @@
+import os
+import math
+import time
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+from ..integrations.pool_stream import PoolRecord
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("cycle_detector")
+
+# Load environment variables
+load_dotenv()
+
+CYCLE_MAX_HOPS = int(os.getenv("CYCLE_MAX_HOPS", 4))  # Longest cycle searched, in swaps
+CYCLE_MIN_PROFIT_PCT = float(os.getenv("CYCLE_MIN_PROFIT_PCT", 0.1))  # Net profit a cycle must clear
+CYCLE_EDGE_MAX_AGE = float(os.getenv("CYCLE_EDGE_MAX_AGE", 30))  # Seconds before a rate is ignored
+CYCLE_REFRESH_DEBOUNCE = float(os.getenv("CYCLE_REFRESH_DEBOUNCE", 0.2))  # Seconds live updates batch up before a refresh
+
+class Edge:
+    """Best known rate for swapping one mint into another on one DEX, net of fees"""
+    __slots__ = ("dex", "input_mint", "output_mint", "rate", "weight", "updated_at")
+
+    def __init__(self, dex: str, input_mint: str, output_mint: str, rate: float, fee_rate: float = 0.0,
+                 updated_at: Optional[float] = None):
+        self.dex = dex
+        self.input_mint = input_mint
+        self.output_mint = output_mint
+        self.rate = rate * (1 - fee_rate)
+        # Multiplying rates around a cycle becomes adding weights; a negative sum is a profit
+        self.weight = -math.log(self.rate)
+        self.updated_at = time.time() if updated_at is None else updated_at
+
+class Cycle:
+    """A closed sequence of swaps, starting and ending at mints[0]"""
+    __slots__ = ("mints", "dexes", "weight", "found_at")
+
+    def __init__(self, mints: Tuple[str, ...], dexes: Tuple[str, ...], weight: float):
+        self.mints = mints
+        self.dexes = dexes
+        self.weight = weight
+        self.found_at = time.time()
+
+    @property
+    def key(self) -> Tuple[str, ...]:
+        return self.mints
+
+    @property
+    def profit_pct(self) -> float:
+        return (math.exp(-self.weight) - 1) * 100
+
+    def edges(self) -> List[Tuple[str, str]]:
+        return [(self.mints[i], self.mints[(i + 1) % len(self.mints)]) for i in range(len(self.mints))]
+
+    def to_dict(self) -> Dict:
+        return {
+            "mints": list(self.mints) + [self.mints[0]],
+            "dexes": list(self.dexes),
+            "profit_pct": self.profit_pct,
+            "found_at": self.found_at
+        }
+
+def _canonical(mints: List[str], dexes: List[str]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """Rotate a cycle to start at its smallest mint, so each cycle has one key"""
+    start = mints.index(min(mints))
+    return tuple(mints[start:] + mints[:start]), tuple(dexes[start:] + dexes[:start])
+
+class CycleDetector:
+    """
+    Rate graph over every (DEX, mint, mint) quote, weighted by -log(rate) net of fees.
+    Profitable cycles of up to max_hops swaps are negative-weight cycles, found with a
+    hop-bounded Bellman-Ford that only relaxes the nodes improved in the previous round.
+    Rate updates mark edges dirty; refresh() then re-prices the known cycles through
+    those edges and searches for new cycles from their endpoints only, so the graph is
+    never rebuilt while following the live feed.
+    """
+    def __init__(self, max_hops: int = CYCLE_MAX_HOPS, min_profit_pct: float = CYCLE_MIN_PROFIT_PCT,
+                 edge_max_age: float = CYCLE_EDGE_MAX_AGE, refresh_debounce: float = CYCLE_REFRESH_DEBOUNCE):
+        self.max_hops = max_hops
+        self.min_profit_pct = min_profit_pct
+        self.edge_max_age = edge_max_age
+        self.refresh_debounce = refresh_debounce
+        self.refresh_handle: Optional[asyncio.TimerHandle] = None
+        # input mint -> output mint -> dex -> edge
+        self.graph: Dict[str, Dict[str, Dict[str, Edge]]] = {}
+        self.dirty: Set[Tuple[str, str]] = set()
+        self.cycles: Dict[Tuple[str, ...], Cycle] = {}
+        self.cycles_by_edge: Dict[Tuple[str, str], Set[Tuple[str, ...]]] = {}
+        self.searches = 0
+
+    @property
+    def max_weight(self) -> float:
+        """Cycle weight below which the cycle clears the profit threshold"""
+        return -math.log(1 + self.min_profit_pct / 100)
+
+    def update_rate(self, dex: str, input_mint: str, output_mint: str, rate: float, fee_rate: float = 0.0,
+                    updated_at: Optional[float] = None):
+        """Set the rate for one direction of a pair on a DEX"""
+        if input_mint == output_mint:
+            return
+        if not rate or rate <= 0 or not math.isfinite(rate):
+            self.remove_rate(dex, input_mint, output_mint)
+            return
+        self.graph.setdefault(input_mint, {}).setdefault(output_mint, {})[dex] = Edge(
+            dex, input_mint, output_mint, rate, fee_rate, updated_at
+        )
+        self.dirty.add((input_mint, output_mint))
+
+    def update_pool(self, dex: str, pool: PoolRecord):
+        """Set both directions of a pool from its spot price, charging the pool fee each way"""
+        if not pool.price or pool.price <= 0:
+            return
+        self.update_rate(dex, pool.base_mint, pool.quote_mint, pool.price, pool.fee_rate)
+        self.update_rate(dex, pool.quote_mint, pool.base_mint, 1 / pool.price, pool.fee_rate)
+
+    def remove_rate(self, dex: str, input_mint: str, output_mint: str):
+        by_dex = self.graph.get(input_mint, {}).get(output_mint)
+        if by_dex and by_dex.pop(dex, None) is not None:
+            if not by_dex:
+                del self.graph[input_mint][output_mint]
+            self.dirty.add((input_mint, output_mint))
+
+    def best_edge(self, input_mint: str, output_mint: str, now: Optional[float] = None) -> Optional[Edge]:
+        """Lowest-weight fresh edge between two mints across DEXes"""
+        now = time.time() if now is None else now
+        best = None
+        for edge in self.graph.get(input_mint, {}).get(output_mint, {}).values():
+            if now - edge.updated_at > self.edge_max_age:
+                continue
+            if best is None or edge.weight < best.weight:
+                best = edge
+        return best
+
+    def search(self, source: str, now: Optional[float] = None) -> List[Cycle]:
+        """
+        Profitable cycles through source of up to max_hops swaps.
+        Round k holds the cheapest k-swap path from source to every node it reaches;
+        a path that gets back to source with weight below the threshold is a cycle.
+        """
+        now = time.time() if now is None else now
+        self.searches += 1
+        threshold = self.max_weight
+        # node -> (weight, mints on the path, dexes on the path)
+        frontier: Dict[str, Tuple[float, List[str], List[str]]] = {source: (0.0, [source], [])}
+        found = []
+        for hop in range(1, self.max_hops + 1):
+            next_frontier: Dict[str, Tuple[float, List[str], List[str]]] = {}
+            for node, (weight, path, dexes) in frontier.items():
+                for output_mint in self.graph.get(node, {}):
+                    edge = self.best_edge(node, output_mint, now)
+                    if edge is None:
+                        continue
+                    total = weight + edge.weight
+                    if output_mint == source:
+                        if hop > 1 and total < threshold:
+                            mints, cycle_dexes = _canonical(path, dexes + [edge.dex])
+                            found.append(Cycle(mints, cycle_dexes, total))
+                        continue
+                    if output_mint in path or hop == self.max_hops:
+                        continue  # Keep cycles simple; the last hop can only close the cycle
+                    best = next_frontier.get(output_mint)
+                    if best is None or total < best[0]:
+                        next_frontier[output_mint] = (total, path + [output_mint], dexes + [edge.dex])
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        return found
+
+    def cycle_weight(self, cycle: Cycle, now: Optional[float] = None) -> Optional[float]:
+        """Current weight of a known cycle along its best edges, or None if an edge is gone"""
+        weight = 0.0
+        dexes = []
+        for input_mint, output_mint in cycle.edges():
+            edge = self.best_edge(input_mint, output_mint, now)
+            if edge is None:
+                return None
+            weight += edge.weight
+            dexes.append(edge.dex)
+        cycle.dexes = tuple(dexes)
+        return weight
+
+    def _add_cycle(self, cycle: Cycle):
+        existing = self.cycles.get(cycle.key)
+        if existing is not None:
+            existing.weight = cycle.weight
+            existing.dexes = cycle.dexes
+            return
+        self.cycles[cycle.key] = cycle
+        for edge in cycle.edges():
+            self.cycles_by_edge.setdefault(edge, set()).add(cycle.key)
+
+    def _drop_cycle(self, key: Tuple[str, ...]):
+        cycle = self.cycles.pop(key, None)
+        if cycle is None:
+            return
+        for edge in cycle.edges():
+            keys = self.cycles_by_edge.get(edge)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.cycles_by_edge[edge]
+
+    def refresh(self, full: bool = False) -> List[Cycle]:
+        """
+        Bring the cycle set up to date with the rate changes since the last call.
+        Returns the cycles that are new or re-priced; full=True searches from every node.
+        """
+        now = time.time()
+        if full:
+            dirty = {(input_mint, output_mint) for input_mint, outputs in self.graph.items() for output_mint in outputs}
+            # Drop cycles that went stale without any update touching them
+            for key in list(self.cycles):
+                if self.cycle_weight(self.cycles[key], now) is None:
+                    self._drop_cycle(key)
+        else:
+            dirty = self.dirty
+        self.dirty = set()
+        if not dirty:
+            return []
+
+        changed: Dict[Tuple[str, ...], Cycle] = {}
+        # Re-price the known cycles through the changed edges
+        for edge in dirty:
+            for key in list(self.cycles_by_edge.get(edge, ())):
+                cycle = self.cycles[key]
+                weight = self.cycle_weight(cycle, now)
+                if weight is None or weight >= self.max_weight:
+                    self._drop_cycle(key)
+                else:
+                    cycle.weight = weight
+                    changed[key] = cycle
+
+        # Any new cycle through a changed edge passes through the edge's input mint
+        for source in {input_mint for input_mint, _ in dirty}:
+            for cycle in self.search(source, now):
+                is_new = cycle.key not in self.cycles
+                self._add_cycle(cycle)
+                if is_new or cycle.key in changed:
+                    changed[cycle.key] = self.cycles[cycle.key]
+        return sorted(changed.values(), key=lambda cycle: cycle.weight)
+
+    def get_cycles(self, limit: Optional[int] = None) -> List[Cycle]:
+        """Known profitable cycles whose rates are all still fresh, most profitable first"""
+        now = time.time()
+        cycles = sorted(
+            (cycle for cycle in self.cycles.values() if self.cycle_weight(cycle, now) is not None),
+            key=lambda cycle: cycle.weight
+        )
+        return cycles[:limit] if limit else cycles
+
+    def schedule_refresh(self):
+        """
+        Refresh refresh_debounce seconds after the first of a burst of updates, so
+        pools changing in the same slot are re-priced together
+        """
+        if self.refresh_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No event loop; the next scan refreshes
+        self.refresh_handle = loop.call_later(self.refresh_debounce, self._debounced_refresh)
+
+    def _debounced_refresh(self):
+        self.refresh_handle = None
+        try:
+            cycles = self.refresh()
+        except Exception as e:
+            logger.error(f"Error refreshing cycles: {str(e)}")
+            return
+        if cycles:
+            logger.info(f"Live pool updates changed {len(cycles)} cycles; best {cycles[0].profit_pct:.3f}%")
+
+    def on_pool_update(self, dex_name: str, pool: PoolRecord, slot: int):
+        """Account stream listener: fold a live pool change into the graph and schedule a refresh"""
+        self.update_pool(dex_name, pool)
+        self.schedule_refresh()
+
+    def get_stats(self) -> Dict:
+        return {
+            "mints": len(self.graph),
+            "edges": sum(len(by_dex) for outputs in self.graph.values() for by_dex in outputs.values()),
+            "dirty_edges": len(self.dirty),
+            "cycles": len(self.cycles),
+            "searches": self.searches
+        }
+
+# Shared detector fed by scans and the live pool stream
+cycle_detector = CycleDetector()
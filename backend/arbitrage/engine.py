@@ -1,25 +1,67 @@
 import os
 import json
+import math
 import asyncio
 import time
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 from decimal import Decimal
 import logging
+from dotenv import load_dotenv
 from sqlalchemy.orm import Session
 from ..db import models
-from ..integrations.jupiter_client import JupiterClient
+from ..db.database import SessionLocal
+from ..db.opportunity_store import upsert_opportunities
+from ..db.reference_cache import TokenRef, reference_cache
+from .price_matrix import ArbitrageCandidate, PriceMatrix
+from .cycle_detector import Cycle, cycle_detector
+from .trade_sizing import SizingResult, TradeSizer, sizing_cache
+from ..integrations.dex_client import DexClient, Pair
+from ..integrations.jupiter_client import JupiterClient, QuoteHandle, QuoteHandleStore
 from ..integrations.raydium_client import RaydiumClient
 from ..integrations.orca_client import OrcaClient
 from ..integrations.meteora_client import MeteoraClient
 from ..integrations.solana_client import SolanaClient
+from ..integrations.circuit_breaker import dex_breakers
+from ..integrations.chain_prefetcher import chain_prefetcher
+from ..integrations.atomic_transaction import AtomicArbitrageBuilder, ATOMIC_COMPUTE_UNIT_LIMIT
 from ..utils.encryption import decrypt_data
-from ..realtime.price_feed import PriceFeed
+from ..realtime.price_feed import PriceFeed, PRICE_FEED_MODE
+from ..realtime.account_stream import account_stream
 from ..simulation.transaction_simulator import TransactionSimulator
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("arbitrage_engine")
 
+# Load environment variables
+load_dotenv()
+
+SCAN_MAX_CONCURRENCY = int(os.getenv("SCAN_MAX_CONCURRENCY", 8))  # Price requests in flight per scan
+SCAN_BATCH_SIZE = int(os.getenv("SCAN_BATCH_SIZE", 100))  # Pairs per bulk price request
+SCAN_REQUEST_TIMEOUT = float(os.getenv("SCAN_REQUEST_TIMEOUT", 2.0))  # Deadline of each price request
+SCAN_BUDGET = float(os.getenv("SCAN_BUDGET", 5.0))  # Seconds a scan waits for prices before evaluating
+SCAN_MAX_SIZED = int(os.getenv("SCAN_MAX_SIZED", 16))  # Widest-spread candidates sized per scan
+CYCLE_SCAN_MAX_MINTS = int(os.getenv("CYCLE_SCAN_MAX_MINTS", 20))  # Mints whose every pair is priced for cycle search
+FULL_SCAN_INTERVAL = float(os.getenv("FULL_SCAN_INTERVAL", 60))  # Seconds between full consistency scans
+PRICE_CHANGE_EPSILON_PCT = float(os.getenv("PRICE_CHANGE_EPSILON_PCT", 0.05))  # Smaller moves leave a token clean
+# Execute both legs in one transaction guarded by the minimum profit, instead of two swaps
+ATOMIC_ARBITRAGE = os.getenv("ATOMIC_ARBITRAGE", "true").lower() == "true"
+
+SOL_MINT = "So11111111111111111111111111111111111111112"
+BASE_FEE_LAMPORTS = 5000  # Per signature
+LAMPORTS_PER_SOL = 1_000_000_000
+
+# Pair used to probe a DEX whose circuit is open
+PROBE_INPUT_MINT = SOL_MINT
+PROBE_OUTPUT_MINT = "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"  # USDC
+
+def dex_probe(client):
+    """Build a probe that checks a DEX client can price SOL/USDC"""
+    async def probe() -> bool:
+        price_data = await client.get_price(PROBE_INPUT_MINT, PROBE_OUTPUT_MINT)
+        return bool(price_data) and price_data.get("price", 0) > 0 and not price_data.get("error")
+    return probe
+
 class ArbitrageEngine:
     def __init__(self, db: Session):
         self.db = db
@@ -30,74 +72,302 @@ class ArbitrageEngine:
         self.solana_client = SolanaClient()
         self.price_feed = PriceFeed(db)
         self.transaction_simulator = TransactionSimulator()
-        self.dex_clients = {
+        self.dex_clients: Dict[str, DexClient] = {
             "Jupiter": self.jupiter_client,
             "Raydium": self.raydium_client,
             "Orca": self.orca_client,
             "Meteora": self.meteora_client
         }
+        self.trade_sizer = TradeSizer(self.dex_clients)
+        self.atomic_builder = AtomicArbitrageBuilder(self.jupiter_client, self.solana_client)
+        for dex_name, client in self.dex_clients.items():
+            breaker = dex_breakers.get(dex_name)
+            if breaker.probe is None:
+                breaker.probe = dex_probe(client)
         self.price_feed_started = False
+        # Jupiter quotes taken at trade size while sizing, per pair and direction
+        self.quote_handles = QuoteHandleStore(self.jupiter_client.max_quote_age)
+        # Prices kept between scans; only tokens whose price moved are re-evaluated
+        self.price_matrix: Optional[PriceMatrix] = None
+        self.quote_mint: Optional[str] = None
+        self.dirty_tokens: Set[str] = set()
+        self.last_full_scan: Optional[float] = None
+        self.scan_lock = asyncio.Lock()  # Scans share the price matrix, so they run one at a time
         logger.info("Initialized Arbitrage Engine")
     
     async def start_price_feed(self):
         """Start the real-time price feed"""
         if not self.price_feed_started:
             await self.price_feed.initialize_from_db()
+            if PRICE_FEED_MODE == "push":
+                self.price_feed.watch_pools(account_stream, {
+                    "Raydium": self.raydium_client.pool_registry,
+                    "Orca": self.orca_client.pool_registry
+                })
+                # Live pool changes also update the cycle graph
+                account_stream.add_listener(cycle_detector.on_pool_update)
+            self.price_feed.subscribe_all(self.on_price_update)
             self.price_feed.start_background_task()
             self.price_feed_started = True
             logger.info("Started real-time price feed")
     
-    async def get_token_price(self, token_mint: str, quote_mint: str, dex_name: str) -> Dict:
-        """Get token price from a specific DEX"""
+    def on_price_update(self, pair: Tuple[str, str], price_data: Dict):
+        """Price feed subscriber: mark a token dirty when its price on some DEX moved beyond epsilon"""
+        token_mint, quote_mint = pair
+        if self.price_matrix is None or quote_mint != self.quote_mint or token_mint not in self.price_matrix.token_index:
+            return
+        
+        dex_name = price_data.get("source", "Jupiter")
+        if dex_name not in self.price_matrix.dex_index:
+            return  # DEX not scanned
+        client = self.dex_clients.get(dex_name)
+        if hasattr(client, "quote_amounts"):
+            # An on-chain pool moved; re-quote it locally the same way the scan prices it
+            amounts = client.quote_amounts(token_mint, quote_mint, 1.0)
+            if amounts is None:
+                return
+            price = float(amounts[0])
+            old_price = self.price_matrix.prices[self.price_matrix.token_index[token_mint], self.price_matrix.dex_index[dex_name]]
+            self.price_matrix.set_price(token_mint, dex_name, price)
+            if not math.isnan(old_price) and old_price > 0 and abs(price - old_price) / old_price * 100 <= PRICE_CHANGE_EPSILON_PCT:
+                return
+        else:
+            # Polled quotes are in raw units, so only their relative move is compared
+            if abs(price_data.get("price_change_pct", float("inf"))) <= PRICE_CHANGE_EPSILON_PCT:
+                return
+        self.dirty_tokens.add(token_mint)
+    
+    def needs_full_scan(self) -> bool:
+        return (
+            self.price_matrix is None
+            or self.last_full_scan is None
+            or time.time() - self.last_full_scan >= FULL_SCAN_INTERVAL
+        )
+    
+    async def get_dex_prices(self, dex_name: str, pairs: List[Pair], timeout: Optional[float] = None) -> Dict[Pair, Dict]:
+        """
+        Price a whole set of token pairs on one DEX in a single bulk call
+        Returns no prices if the call does not finish within timeout seconds
+        Each call's latency and outcome go to the DEX's circuit breaker
+        """
+        breaker = dex_breakers.get(dex_name)
+        if not breaker.allow_request():
+            return {}
+        
+        client = self.dex_clients.get(dex_name)
+        if not client:
+            logger.error(f"DEX client not found for {dex_name}")
+            return {}
+        
+        start = time.perf_counter()
+        failed = False
+        cancelled = False
         try:
-            # First check if we have a real-time price
-            if dex_name == "Jupiter":
-                latest_price = self.price_feed.get_latest_price(token_mint, quote_mint)
-                if latest_price and "price" in latest_price and latest_price["price"] > 0:
-                    return latest_price
-            
-            # If not, fetch from the DEX API
-            client = self.dex_clients.get(dex_name)
-            if not client:
-                logger.error(f"DEX client not found for {dex_name}")
-                return None
-            
-            price_data = await client.get_price(token_mint, quote_mint)
-            return price_data
+            prices = await asyncio.wait_for(client.get_prices(pairs), timeout)
+            failed = any(price_data.get("error") for price_data in prices.values())
+            return prices
+        except asyncio.TimeoutError:
+            failed = True
+            logger.warning(f"Prices for {len(pairs)} pairs on {dex_name} missed the {timeout}s deadline")
+            return {}
+        except asyncio.CancelledError:
+            # Cancelled as a straggler when the scan budget ran out. Its own deadline had not
+            # passed, so it started late rather than ran slow, and there is no outcome to record
+            cancelled = True
+            raise
         except Exception as e:
-            logger.error(f"Error getting price for {token_mint} on {dex_name}: {str(e)}")
-            return None
+            failed = True
+            logger.error(f"Error getting prices for {len(pairs)} pairs on {dex_name}: {str(e)}")
+            return {}
+        finally:
+            # The breaker counts calls over CIRCUIT_SLOW_CALL_SECONDS as slow from the latency
+            if not cancelled:
+                breaker.record(time.perf_counter() - start, failed)
+    
+    async def fetch_scan_prices(self, dex_names: List[str], pairs: List[Pair]) -> Dict[str, Dict[Pair, Dict]]:
+        """
+        Fetch prices for every pair on every DEX concurrently
+        Requests are batched per DEX and capped at SCAN_MAX_CONCURRENCY in flight. Each one has
+        its own deadline, and whatever is still running when SCAN_BUDGET is spent is cancelled,
+        so the scan evaluates the prices that arrived instead of waiting on the slowest DEX.
+        """
+        semaphore = asyncio.Semaphore(SCAN_MAX_CONCURRENCY)
+        
+        async def fetch(dex_name: str, batch: List[Pair]) -> Tuple[str, Dict[Pair, Dict]]:
+            async with semaphore:
+                return dex_name, await self.get_dex_prices(dex_name, batch, SCAN_REQUEST_TIMEOUT)
+        
+        tasks = [
+            asyncio.create_task(fetch(dex_name, pairs[start:start + SCAN_BATCH_SIZE]))
+            for dex_name in dex_names
+            for start in range(0, len(pairs), SCAN_BATCH_SIZE)
+        ]
+        dex_prices: Dict[str, Dict[Pair, Dict]] = {dex_name: {} for dex_name in dex_names}
+        if not tasks:
+            return dex_prices
+        
+        done, pending = await asyncio.wait(tasks, timeout=SCAN_BUDGET)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            logger.warning(f"Scan budget of {SCAN_BUDGET}s spent; cancelled {len(pending)} of {len(tasks)} price requests")
+        
+        for task in done:
+            if task.exception() is not None:
+                logger.error(f"Error fetching scan prices: {str(task.exception())}")
+                continue
+            dex_name, prices = task.result()
+            dex_prices[dex_name].update(prices)
+        return dex_prices
+    
+    async def scan_cycles(self, mints: List[str], dex_names: List[str]) -> List[Dict]:
+        """
+        Price every ordered pair of mints on every DEX into the cycle graph and
+        return the profitable multi-hop cycles; runs on full scans, so cycles whose
+        rates went stale are dropped as well
+        """
+        mints = mints[:CYCLE_SCAN_MAX_MINTS]
+        pairs = [(input_mint, output_mint) for input_mint in mints for output_mint in mints if input_mint != output_mint]
+        dex_prices = await self.fetch_scan_prices(dex_names, pairs)
+        self.update_cycle_rates(dex_prices)
+        return self.report_cycles(cycle_detector.refresh(full=True))
+    
+    def update_cycle_rates(self, dex_prices: Dict[str, Dict[Pair, Dict]], known_only: bool = False):
+        """
+        Set the cycle graph's rates from scanned prices
+        known_only skips mints the graph has no rates from yet, so incremental scans stay in its universe
+        """
+        for dex_name, prices in dex_prices.items():
+            for (input_mint, output_mint), price_data in prices.items():
+                if known_only and input_mint not in cycle_detector.graph:
+                    continue
+                # Every DEX client prices net of its fees, so the rate is the edge's whole cost
+                cycle_detector.update_rate(dex_name, input_mint, output_mint, price_data.get("price", 0))
+    
+    def report_cycles(self, cycles: List[Cycle]) -> List[Dict]:
+        """Log new or re-priced cycles and return them as dicts"""
+        for cycle in cycles:
+            route = " -> ".join(f"{mint} ({dex})" for mint, dex in zip(cycle.mints, cycle.dexes))
+            logger.info(f"Found arbitrage cycle: {route} -> {cycle.mints[0]}, Profit: {cycle.profit_pct:.3f}%")
+        return [cycle.to_dict() for cycle in cycles]
+    
+    def get_dex_health(self) -> Dict[str, Dict]:
+        """Circuit state and health score of each DEX price source"""
+        return {dex_name: dex_breakers.get(dex_name).get_stats() for dex_name in self.dex_clients}
+    
+    def remember_quote(self, quote_handle: QuoteHandle):
+        """Keep a trade-size quote for reuse when building the swap"""
+        self.quote_handles.remember(quote_handle)
+    
+    def remember_sizing(self, sizing: Optional[SizingResult]):
+        """Keep the quotes a sizing took at its trade size"""
+        if sizing is not None:
+            for quote_handle in sizing.quotes.values():
+                self.remember_quote(quote_handle)
+    
+    def get_quote_handle(self, input_mint: str, output_mint: str, amount: float, slippage_bps: int) -> Optional[QuoteHandle]:
+        """Get a quote taken for exactly this swap if it is still within the staleness window"""
+        return self.quote_handles.get(input_mint, output_mint, amount, slippage_bps)
+    
+    def transaction_cost_usd(self) -> float:
+        """
+        Network fees of executing one arbitrage in USD, at the prefetched priority fee and
+        the last scanned SOL price; 0 until SOL has been priced
+        """
+        sol_price = self.price_matrix.token_price(SOL_MINT) if self.price_matrix is not None else None
+        if not sol_price:
+            return 0.0
+        signatures = 1 if ATOMIC_ARBITRAGE else 2
+        lamports = signatures * BASE_FEE_LAMPORTS + chain_prefetcher.get_priority_fee() * ATOMIC_COMPUTE_UNIT_LIMIT / 1_000_000
+        return lamports / LAMPORTS_PER_SOL * sol_price
+    
+    async def size_candidates(self, candidates: List[ArbitrageCandidate], token_by_mint: Dict[str, TokenRef],
+                              usdc_token: TokenRef, min_trade_size: float, max_trade_size: float,
+                              slippage_bps: int) -> List[Optional[SizingResult]]:
+        """
+        Size the widest-spread candidates against both legs' liquidity curves.
+        Quote ladders cost a dozen quotes per candidate, so at most SCAN_MAX_SIZED candidates are
+        sized, SCAN_MAX_CONCURRENCY at a time, and sizing still running when SCAN_BUDGET is spent
+        is cancelled. Candidates left unsized get None.
+        """
+        semaphore = asyncio.Semaphore(SCAN_MAX_CONCURRENCY)
+        fixed_cost = self.transaction_cost_usd()
+        
+        async def size(candidate: ArbitrageCandidate) -> Optional[SizingResult]:
+            async with semaphore:
+                sizing = await self.trade_sizer.size(
+                    candidate.buy_dex, candidate.sell_dex,
+                    candidate.token, token_by_mint[candidate.token].decimals,
+                    usdc_token.mint_address, usdc_token.decimals,
+                    min_trade_size, max_trade_size,
+                    fixed_cost=fixed_cost, slippage_bps=slippage_bps
+                )
+            sizing_cache.remember(candidate.token, candidate.buy_dex, candidate.sell_dex, sizing)
+            self.remember_sizing(sizing)
+            return sizing
+        
+        ranked = sorted(range(len(candidates)), key=lambda i: candidates[i].spread_pct, reverse=True)
+        tasks = {i: asyncio.create_task(size(candidates[i])) for i in ranked[:SCAN_MAX_SIZED]}
+        sizings: List[Optional[SizingResult]] = [None] * len(candidates)
+        if not tasks:
+            return sizings
+        if len(candidates) > len(tasks):
+            logger.info(f"Sizing the {len(tasks)} widest of {len(candidates)} candidates")
+        
+        done, pending = await asyncio.wait(tasks.values(), timeout=SCAN_BUDGET)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            logger.warning(f"Scan budget of {SCAN_BUDGET}s spent; cancelled sizing of {len(pending)} of {len(tasks)} candidates")
+        
+        for i, task in tasks.items():
+            if task in done and task.exception() is None:
+                sizings[i] = task.result()
+        return sizings
     
     async def find_arbitrage_opportunities(self, user_id: int) -> List[Dict]:
-        """Find arbitrage opportunities for all token pairs across all DEXes"""
+        """
+        Find arbitrage opportunities for all token pairs across all DEXes
+        A scan requested while another is running waits for it, then scans what moved meanwhile
+        """
+        async with self.scan_lock:
+            return await self._find_arbitrage_opportunities(user_id)
+    
+    async def _find_arbitrage_opportunities(self, user_id: int) -> List[Dict]:
         try:
             # Ensure price feed is running
             await self.start_price_feed()
             
-            # Get user settings
-            trading_settings = self.db.query(models.Setting).filter(
-                models.Setting.user_id == user_id,
-                models.Setting.category == "trading"
-            ).first()
+            # In a quiet market nothing moved since the last scan, so there is nothing to do
+            full_scan = self.needs_full_scan()
+            if not full_scan and not self.dirty_tokens:
+                return []
+            
+            # Snapshot quote cache counters to report per-scan savings
+            cache_stats_before = self.jupiter_client.get_cache_stats()
             
-            if not trading_settings:
+            # Tokens, DEXes and settings come from the reference cache, not the database
+            reference = reference_cache.get(self.db)
+            
+            # Get user settings
+            settings = reference_cache.get_settings(user_id, "trading", self.db)
+            if settings is None:
                 logger.error(f"Trading settings not found for user {user_id}")
                 return []
             
-            settings = trading_settings.settings
             min_profit_threshold = Decimal(settings.get("min_profit_threshold", 0.25))
+            min_trade_size = float(settings.get("min_trade_size", 10))
+            max_trade_size = float(settings.get("max_trade_size", 1000))
+            slippage_bps = int(float(settings.get("max_slippage", 0.5)) * 100)  # Convert to basis points
             
             # Get active DEXes
-            dexes_settings = self.db.query(models.Setting).filter(
-                models.Setting.user_id == user_id,
-                models.Setting.category == "dexes"
-            ).first()
-            
-            if not dexes_settings:
+            dex_settings = reference_cache.get_settings(user_id, "dexes", self.db)
+            if dex_settings is None:
                 logger.error(f"DEXes settings not found for user {user_id}")
                 return []
             
-            dex_settings = dexes_settings.settings
             active_dexes = [dex for dex, is_active in dex_settings.items() if is_active]
             
             if not active_dexes:
@@ -105,71 +375,102 @@ class ArbitrageEngine:
                 return []
             
             # Get all tokens
-            tokens = self.db.query(models.Token).all()
+            tokens = reference.tokens
             
             # Get USDC token for price comparison
-            usdc_token = self.db.query(models.Token).filter(models.Token.symbol == "USDC").first()
+            usdc_token = reference.usdc
             if not usdc_token:
                 logger.error("USDC token not found")
                 return []
             
-            # Get all DEXes
-            dexes = self.db.query(models.Dex).filter(models.Dex.name.in_(active_dexes)).all()
-            dex_map = {dex.name: dex for dex in dexes}
+            # Get the active DEXes' rows
+            dex_map = {name: reference.dexes_by_name[name] for name in active_dexes if name in reference.dexes_by_name}
             
-            opportunities = []
+            opportunity_rows = []
             
-            # For each token, check prices across all DEXes
-            for token in tokens:
-                if token.symbol == "USDC":
-                    continue  # Skip USDC/USDC pair
-                
-                # Get prices across all DEXes
-                prices = {}
-                for dex_name in active_dexes:
-                    price_data = await self.get_token_price(token.mint_address, usdc_token.mint_address, dex_name)
-                    if price_data and "price" in price_data and price_data["price"] > 0:
-                        prices[dex_name] = Decimal(str(price_data["price"]))
-                
-                if len(prices) < 2:
-                    continue  # Need at least 2 DEXes for arbitrage
-                
-                # Find best buy and sell prices
-                buy_dex = min(prices.items(), key=lambda x: x[1])
-                sell_dex = max(prices.items(), key=lambda x: x[1])
+            tokens = [token for token in tokens if token.symbol != "USDC"]  # Skip USDC/USDC pair
+            token_by_mint = {token.mint_address: token for token in tokens}
+            if (self.price_matrix is None or self.price_matrix.tokens != list(token_by_mint)
+                    or self.price_matrix.dexes != active_dexes or self.quote_mint != usdc_token.mint_address):
+                full_scan = True
+            
+            if full_scan:
+                # Periodic consistency check: re-price the whole token universe
+                self.price_matrix = PriceMatrix(list(token_by_mint), active_dexes)
+                self.quote_mint = usdc_token.mint_address
+                self.dirty_tokens.clear()
+                scan_mints = list(token_by_mint)
+            else:
+                # Updates arriving while this scan runs mark their tokens dirty for the next one
+                scan_mints = [mint for mint in self.dirty_tokens if mint in token_by_mint]
+                self.dirty_tokens.clear()
+                logger.info(f"Incremental scan of {len(scan_mints)} of {len(token_by_mint)} tokens")
+            
+            # Price the tokens on every DEX at once
+            pairs = [(mint, usdc_token.mint_address) for mint in scan_mints]
+            dex_prices = await self.fetch_scan_prices(active_dexes, pairs)
+            for dex_name in active_dexes:
+                self.price_matrix.update_dex(dex_name, {
+                    pair[0]: price_data.get("price", 0)
+                    for pair, price_data in dex_prices[dex_name].items()
+                })
+            
+            # Best buy/sell and spread for the scanned tokens in one vectorized pass
+            candidates = self.price_matrix.find_opportunities(float(min_profit_threshold), tokens=scan_mints)
+            
+            # Size the candidates against both legs' liquidity curves, net of network fees
+            sizings = await self.size_candidates(
+                candidates, token_by_mint, usdc_token, min_trade_size, max_trade_size, slippage_bps
+            )
+            
+            for candidate, sizing in zip(candidates, sizings):
+                token = token_by_mint[candidate.token]
+                buy_dex_name, sell_dex_name = candidate.buy_dex, candidate.sell_dex
+                buy_price = Decimal(str(candidate.buy_price))
+                sell_price = Decimal(str(candidate.sell_price))
+                price_diff_percent = (sell_price - buy_price) / buy_price * 100
                 
-                buy_dex_name, buy_price = buy_dex
-                sell_dex_name, sell_price = sell_dex
+                if sizing is None:
+                    # Not sized, or no curve for a leg; estimate from the spot prices of a 1 token trade
+                    potential_profit = sell_price - buy_price
+                elif sizing.profit <= 0:
+                    logger.info(f"Skipping {token.symbol} {buy_dex_name} -> {sell_dex_name}: price impact outweighs the spread at every size")
+                    continue
+                else:
+                    potential_profit = Decimal(str(sizing.profit))
                 
-                # Calculate price difference
-                price_diff_percent = (sell_price - buy_price) / buy_price * 100
+                # Collect the opportunity; the whole scan is upserted at once below
+                opportunity_rows.append({
+                    "token_id": token.id,
+                    "buy_dex_id": dex_map[buy_dex_name].id,
+                    "sell_dex_id": dex_map[sell_dex_name].id,
+                    "buy_price": buy_price,
+                    "sell_price": sell_price,
+                    "price_diff_percent": price_diff_percent,
+                    "potential_profit_usd": potential_profit,
+                    "status": "active"
+                })
                 
-                # Only consider opportunities with profit above threshold
-                if price_diff_percent > min_profit_threshold and buy_dex_name != sell_dex_name:
-                    # Calculate potential profit (assuming 1 SOL trade size)
-                    trade_size = Decimal("1")  # 1 token
-                    potential_profit = trade_size * (sell_price - buy_price)
-                    
-                    # Create opportunity
-                    opportunity = models.Opportunity(
-                        token_id=token.id,
-                        buy_dex_id=dex_map[buy_dex_name].id,
-                        sell_dex_id=dex_map[sell_dex_name].id,
-                        buy_price=buy_price,
-                        sell_price=sell_price,
-                        price_diff_percent=price_diff_percent,
-                        potential_profit_usd=potential_profit,
-                        status="active"
-                    )
-                    
-                    self.db.add(opportunity)
-                    self.db.commit()
-                    self.db.refresh(opportunity)
-                    
-                    # Add to opportunities list
-                    opportunities.append(opportunity)
-                    
-                    logger.info(f"Found arbitrage opportunity: {token.symbol} - Buy: {buy_dex_name} at {buy_price}, Sell: {sell_dex_name} at {sell_price}, Profit: {price_diff_percent}%")
+                logger.info(f"Found arbitrage opportunity: {token.symbol} - Buy: {buy_dex_name} at {buy_price}, Sell: {sell_dex_name} at {sell_price}, Profit: {price_diff_percent}%")
+            
+            # One bulk upsert in one transaction: spreads seen before update their live row
+            opportunities = upsert_opportunities(self.db, opportunity_rows)
+            
+            if full_scan:
+                # Multi-hop cycles among the quote token and the first tokens of the universe
+                await self.scan_cycles([usdc_token.mint_address] + [token.mint_address for token in tokens], active_dexes)
+                self.last_full_scan = time.time()
+            else:
+                # Only the cycles through the re-priced tokens are re-priced or searched
+                self.update_cycle_rates(dex_prices, known_only=True)
+                self.report_cycles(cycle_detector.refresh())
+            
+            cache_stats = self.jupiter_client.get_cache_stats()
+            logger.info(
+                f"Quote cache this scan: {cache_stats['hits'] - cache_stats_before['hits']} hits, "
+                f"{cache_stats['coalesced'] - cache_stats_before['coalesced']} coalesced, "
+                f"{cache_stats['misses'] - cache_stats_before['misses']} misses"
+            )
             
             return opportunities
         except Exception as e:
@@ -177,6 +478,41 @@ class ArbitrageEngine:
             self.db.rollback()
             return []
     
+    async def prepare_swap_leg(self, side: str, input_mint: str, output_mint: str, amount: float,
+                               wallet_address: str, slippage_bps: int, quote_handle: Optional[QuoteHandle],
+                               compute_unit_price: Optional[int]) -> Dict:
+        """
+        Build and simulate one Jupiter swap leg of a trade
+        On failure the result carries the error and a message naming the leg
+        """
+        tx_result = await self.jupiter_client.create_swap_transaction(
+            input_mint,
+            output_mint,
+            amount,
+            wallet_address,
+            slippage_bps,
+            quote_handle=quote_handle,
+            compute_unit_price_micro_lamports=compute_unit_price
+        )
+        
+        if not tx_result["success"]:
+            message = f"Failed to create {side} transaction: {tx_result.get('error')}"
+            logger.error(message)
+            return {**tx_result, "message": message}
+        
+        # Simulate the transaction
+        if tx_result.get("swapTransaction"):
+            simulation_result = await self.transaction_simulator.simulate_transaction(tx_result["swapTransaction"])
+            
+            if not simulation_result["success"]:
+                message = f"{side.capitalize()} transaction simulation failed: {simulation_result.get('error')}"
+                logger.error(message)
+                return {"success": False, "error": simulation_result.get("error"), "message": message}
+            
+            logger.info(f"{side.capitalize()} transaction simulation successful")
+        
+        return tx_result
+    
     async def execute_arbitrage(self, opportunity_id: int, wallet_id: int) -> Dict:
         """Execute an arbitrage trade"""
         try:
@@ -204,8 +540,10 @@ class ArbitrageEngine:
                 self.db.commit()
                 return {"success": False, "error": "Wallet not found"}
             
+            reference = reference_cache.get(self.db)
+            
             # Get token
-            token = self.db.query(models.Token).filter(models.Token.id == opportunity.token_id).first()
+            token = reference.tokens_by_id.get(opportunity.token_id)
             if not token:
                 logger.error(f"Token {opportunity.token_id} not found")
                 opportunity.status = "failed"
@@ -214,8 +552,8 @@ class ArbitrageEngine:
                 return {"success": False, "error": "Token not found"}
             
             # Get buy and sell DEXes
-            buy_dex = self.db.query(models.Dex).filter(models.Dex.id == opportunity.buy_dex_id).first()
-            sell_dex = self.db.query(models.Dex).filter(models.Dex.id == opportunity.sell_dex_id).first()
+            buy_dex = reference.dexes_by_id.get(opportunity.buy_dex_id)
+            sell_dex = reference.dexes_by_id.get(opportunity.sell_dex_id)
             if not buy_dex or not sell_dex:
                 logger.error(f"DEX not found")
                 opportunity.status = "failed"
@@ -224,7 +562,7 @@ class ArbitrageEngine:
                 return {"success": False, "error": "DEX not found"}
             
             # Get USDC token for trading
-            usdc_token = self.db.query(models.Token).filter(models.Token.symbol == "USDC").first()
+            usdc_token = reference.usdc
             if not usdc_token:
                 logger.error("USDC token not found")
                 opportunity.status = "failed"
@@ -245,114 +583,157 @@ class ArbitrageEngine:
                     return {"success": False, "error": "Error decrypting private key"}
             
             # Get trading settings
-            trading_settings = self.db.query(models.Setting).filter(
-                models.Setting.user_id == wallet.user_id,
-                models.Setting.category == "trading"
-            ).first()
+            settings = reference_cache.get_settings(wallet.user_id, "trading", self.db)
             
-            if not trading_settings:
+            if settings is None:
                 logger.error(f"Trading settings not found for user {wallet.user_id}")
                 opportunity.status = "failed"
                 opportunity.error_message = "Trading settings not found"
                 self.db.commit()
                 return {"success": False, "error": "Trading settings not found"}
             
-            settings = trading_settings.settings
             max_slippage = float(settings.get("max_slippage", 0.5))
+            min_profit_threshold = Decimal(settings.get("min_profit_threshold", 0.25))
             
             # Calculate trade amount based on settings
             min_trade_size = float(settings.get("min_trade_size", 10))
             max_trade_size = float(settings.get("max_trade_size", 1000))
             
-            # For this implementation, we'll use a fixed trade size
-            trade_size_usd = min(max(min_trade_size, 100), max_trade_size)
-            
-            # Calculate token amount based on buy price
-            token_amount = trade_size_usd / float(opportunity.buy_price)
+            # Reuse the scan's sizing of this spread, or size it against current liquidity on both legs
+            sizing = sizing_cache.get(token.mint_address, buy_dex.name, sell_dex.name, min_trade_size, max_trade_size)
+            if sizing is None:
+                sizing = await self.trade_sizer.size(
+                    buy_dex.name, sell_dex.name,
+                    token.mint_address, token.decimals,
+                    usdc_token.mint_address, usdc_token.decimals,
+                    min_trade_size, max_trade_size,
+                    fixed_cost=self.transaction_cost_usd(),
+                    slippage_bps=int(max_slippage * 100)
+                )
+            self.remember_sizing(sizing)
+            if sizing is not None and sizing.profit > 0:
+                trade_size_usd = sizing.size
+                token_amount = sizing.token_amount
+                logger.info(f"Optimal trade size ${trade_size_usd:.2f} for an expected profit of ${sizing.profit:.4f}")
+            else:
+                # No usable curves; fall back to a fixed trade size
+                trade_size_usd = min(max(min_trade_size, 100), max_trade_size)
+                token_amount = trade_size_usd / float(opportunity.buy_price)
             
             logger.info(f"Executing arbitrage: {token.symbol} - Buy: {buy_dex.name} at {opportunity.buy_price}, Sell: {sell_dex.name} at {opportunity.sell_price}")
             logger.info(f"Trade size: ${trade_size_usd} ({token_amount} {token.symbol})")
             
-            # Create buy transaction using Jupiter
-            if buy_dex.name == "Jupiter":
-                # Convert USD to USDC amount (assuming 1:1)
-                usdc_amount = trade_size_usd * 1_000_000  # USDC has 6 decimals
-                
-                # Create swap transaction
-                buy_tx_result = await self.jupiter_client.create_swap_transaction(
+            # Blockhash and priority fee are prefetched in the background; reading them costs no I/O
+            recent_blockhash = chain_prefetcher.get_blockhash()
+            compute_unit_price = chain_prefetcher.get_priority_fee()
+            if recent_blockhash is None:
+                logger.warning("No fresh prefetched blockhash; swap transactions carry their own")
+            else:
+                logger.info(f"Using blockhash {recent_blockhash.blockhash} ({recent_blockhash.age:.1f}s old), priority fee {compute_unit_price} micro-lamports/CU")
+            
+            slippage_bps = int(max_slippage * 100)  # Convert to basis points
+            # Convert USD to USDC amount (assuming 1:1)
+            usdc_amount = int(trade_size_usd * 10 ** usdc_token.decimals)
+            
+            if ATOMIC_ARBITRAGE:
+                # Both legs in one transaction that reverts unless it clears the minimum profit
+                min_profit = int(trade_size_usd * float(min_profit_threshold) / 100 * 10 ** usdc_token.decimals)
+                atomic_result = await self.atomic_builder.build(
                     usdc_token.mint_address,
                     token.mint_address,
                     usdc_amount,
                     wallet.address,
-                    int(max_slippage * 100)  # Convert to basis points
+                    slippage_bps,
+                    min_profit,
+                    buy_dex.name,
+                    sell_dex.name,
+                    compute_unit_price,
+                    # The sizing's buy quote routes anywhere, so it only stands in for a Jupiter buy
+                    buy_quote=self.get_quote_handle(usdc_token.mint_address, token.mint_address, usdc_amount, slippage_bps)
+                    if buy_dex.name == "Jupiter" else None
                 )
                 
-                if not buy_tx_result["success"]:
-                    logger.error(f"Failed to create buy transaction: {buy_tx_result.get('error')}")
+                if not atomic_result["success"]:
+                    logger.error(f"Failed to create arbitrage transaction: {atomic_result.get('error')}")
                     opportunity.status = "failed"
-                    opportunity.error_message = f"Failed to create buy transaction: {buy_tx_result.get('error')}"
+                    opportunity.error_message = f"Failed to create arbitrage transaction: {atomic_result.get('error')}"
                     self.db.commit()
-                    return {"success": False, "error": buy_tx_result.get('error')}
+                    return {"success": False, "error": atomic_result.get("error")}
                 
                 # Simulate the transaction
-                if buy_tx_result.get("swapTransaction"):
-                    simulation_result = await self.transaction_simulator.simulate_transaction(buy_tx_result["swapTransaction"])
-                    
-                    if not simulation_result["success"]:
-                        logger.error(f"Buy transaction simulation failed: {simulation_result.get('error')}")
-                        opportunity.status = "failed"
-                        opportunity.error_message = f"Buy transaction simulation failed: {simulation_result.get('error')}"
-                        self.db.commit()
-                        return {"success": False, "error": simulation_result.get('error')}
-                    
-                    logger.info(f"Buy transaction simulation successful")
-                
-                # Calculate token amount received
-                token_amount = float(buy_tx_result.get("outputAmount", 0)) / (10 ** token.decimals)
-            
-            # Create sell transaction using Jupiter
-            if sell_dex.name == "Jupiter" and token_amount > 0:
-                # Convert token amount to smallest units
-                token_amount_smallest = int(token_amount * (10 ** token.decimals))
-                
-                # Create swap transaction
-                sell_tx_result = await self.jupiter_client.create_swap_transaction(
-                    token.mint_address,
-                    usdc_token.mint_address,
-                    token_amount_smallest,
-                    wallet.address,
-                    int(max_slippage * 100)  # Convert to basis points
-                )
+                simulation_result = await self.transaction_simulator.simulate_transaction(atomic_result["transaction"])
                 
-                if not sell_tx_result["success"]:
-                    logger.error(f"Failed to create sell transaction: {sell_tx_result.get('error')}")
+                if not simulation_result["success"]:
+                    logger.error(f"Arbitrage transaction simulation failed: {simulation_result.get('error')}")
                     opportunity.status = "failed"
-                    opportunity.error_message = f"Failed to create sell transaction: {sell_tx_result.get('error')}"
+                    opportunity.error_message = f"Arbitrage transaction simulation failed: {simulation_result.get('error')}"
                     self.db.commit()
-                    return {"success": False, "error": sell_tx_result.get('error')}
+                    return {"success": False, "error": simulation_result.get("error")}
                 
-                # Simulate the transaction
-                if sell_tx_result.get("swapTransaction"):
-                    simulation_result = await self.transaction_simulator.simulate_transaction(sell_tx_result["swapTransaction"])
-                    
-                    if not simulation_result["success"]:
-                        logger.error(f"Sell transaction simulation failed: {simulation_result.get('error')}")
+                logger.info(f"Arbitrage transaction simulation successful ({atomic_result['size']} bytes, {simulation_result.get('unitsConsumed')} CU)")
+                
+                token_amount = atomic_result["tokenAmount"] / (10 ** token.decimals)
+                usdc_amount_received = atomic_result["outputAmount"] / (10 ** usdc_token.decimals)
+                actual_profit = usdc_amount_received - trade_size_usd
+            else:
+                # Quote the buy leg first, reusing the sizing's quote for this amount; its output sizes the sell leg
+                buy_quote = None
+                if buy_dex.name == "Jupiter":
+                    buy_quote = self.get_quote_handle(usdc_token.mint_address, token.mint_address, usdc_amount, slippage_bps)
+                    if buy_quote is None:
+                        buy_quote = await self.jupiter_client.get_quote(
+                            usdc_token.mint_address, token.mint_address, usdc_amount, slippage_bps
+                        )
+                    if buy_quote is None:
+                        logger.error("Failed to quote buy transaction")
                         opportunity.status = "failed"
-                        opportunity.error_message = f"Sell transaction simulation failed: {simulation_result.get('error')}"
+                        opportunity.error_message = "Failed to quote buy transaction"
                         self.db.commit()
-                        return {"success": False, "error": simulation_result.get('error')}
-                    
-                    logger.info(f"Sell transaction simulation successful")
+                        return {"success": False, "error": "Failed to quote buy transaction"}
                 
-                # Calculate USDC amount received
-                usdc_amount_received = float(sell_tx_result.get("outputAmount", 0)) / 1_000_000  # USDC has 6 decimals
+                    # Calculate token amount received
+                    token_amount = buy_quote.out_amount / (10 ** token.decimals)
+            
+                # Sell exactly what the buy quote returns, as the sizing's sell quote did
+                if buy_quote is not None:
+                    token_amount_smallest = buy_quote.out_amount
+                else:
+                    token_amount_smallest = int(token_amount * (10 ** token.decimals))
+            
+                # Build and simulate both legs concurrently
+                legs = {}
+                if buy_dex.name == "Jupiter":
+                    legs["buy"] = self.prepare_swap_leg(
+                        "buy", usdc_token.mint_address, token.mint_address, usdc_amount,
+                        wallet.address, slippage_bps, buy_quote, compute_unit_price
+                    )
+                if sell_dex.name == "Jupiter" and token_amount_smallest > 0:
+                    legs["sell"] = self.prepare_swap_leg(
+                        "sell", token.mint_address, usdc_token.mint_address, token_amount_smallest,
+                        wallet.address, slippage_bps,
+                        self.get_quote_handle(token.mint_address, usdc_token.mint_address, token_amount_smallest, slippage_bps),
+                        compute_unit_price
+                    )
+                leg_results = dict(zip(legs, await asyncio.gather(*legs.values())))
+            
+                for side in ("buy", "sell"):
+                    leg_result = leg_results.get(side)
+                    if leg_result is not None and not leg_result["success"]:
+                        opportunity.status = "failed"
+                        opportunity.error_message = leg_result["message"]
+                        self.db.commit()
+                        return {"success": False, "error": leg_result.get("error")}
+            
+                if "sell" in leg_results:
+                    # Calculate USDC amount received
+                    usdc_amount_received = float(leg_results["sell"].get("outputAmount", 0)) / (10 ** usdc_token.decimals)
                 
-                # Calculate actual profit
-                actual_profit = usdc_amount_received - trade_size_usd
-            else:
-                # For non-Jupiter DEXes or if token_amount is 0
-                actual_profit = 0
-                usdc_amount_received = 0
+                    # Calculate actual profit
+                    actual_profit = usdc_amount_received - trade_size_usd
+                else:
+                    # For non-Jupiter DEXes or if token_amount is 0
+                    actual_profit = 0
+                    usdc_amount_received = 0
             
             # In a real implementation, you would:
             # 1. Sign the transactions with the wallet's private key
@@ -366,9 +747,6 @@ class ArbitrageEngine:
             else:
                 logger.info("No private key available, simulating trade execution")
             
-            # Simulate network delay
-            await asyncio.sleep(2)
-            
             # Create trade record
             trade = models.Trade(
                 opportunity_id=opportunity.id,
@@ -432,3 +810,23 @@ class ArbitrageEngine:
                 self.db.commit()
             
             return {"success": False, "error": str(e)}
+
+# One engine per process: its price feed, account stream listeners, price matrix and
+# scan-time quotes are set up once and shared by the API routes and the bot loop
+_arbitrage_engine: Optional[ArbitrageEngine] = None
+
+def get_arbitrage_engine() -> ArbitrageEngine:
+    """Get the process-wide arbitrage engine, creating it with its own session on first use"""
+    global _arbitrage_engine
+    if _arbitrage_engine is None:
+        _arbitrage_engine = ArbitrageEngine(SessionLocal())
+    return _arbitrage_engine
+
+async def close_arbitrage_engine():
+    """Stop the process-wide engine's price feed and close its session"""
+    global _arbitrage_engine
+    if _arbitrage_engine is None:
+        return
+    _arbitrage_engine.price_feed.stop()
+    _arbitrage_engine.db.close()
+    _arbitrage_engine = None
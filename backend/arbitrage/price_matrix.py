@@ -0,0 +1,130 @@
+import time
+from typing import Dict, List, Optional
+import numpy as np
+
+class ArbitrageCandidate:
+    """A token whose best sell price beats its best buy price by more than the threshold"""
+    __slots__ = ("token", "buy_dex", "buy_price", "sell_dex", "sell_price", "spread_pct")
+
+    def __init__(self, token: str, buy_dex: str, buy_price: float, sell_dex: str, sell_price: float, spread_pct: float):
+        self.token = token
+        self.buy_dex = buy_dex
+        self.buy_price = buy_price
+        self.sell_dex = sell_dex
+        self.sell_price = sell_price
+        self.spread_pct = spread_pct
+
+class PriceMatrix:
+    """
+    Token x DEX price table backed by NumPy arrays.
+    Missing prices are NaN and every cell carries the time it was last set,
+    so best buy/sell, spreads and threshold masks for every token come from
+    one vectorized pass instead of a per-token loop.
+    """
+    def __init__(self, tokens: List[str], dexes: List[str]):
+        self.tokens = list(tokens)
+        self.dexes = list(dexes)
+        self.token_index = {token: i for i, token in enumerate(self.tokens)}
+        self.dex_index = {dex: j for j, dex in enumerate(self.dexes)}
+        self.prices = np.full((len(self.tokens), len(self.dexes)), np.nan)
+        self.updated_at = np.full((len(self.tokens), len(self.dexes)), np.nan)
+
+    def set_price(self, token: str, dex: str, price: float, timestamp: Optional[float] = None):
+        i, j = self.token_index[token], self.dex_index[dex]
+        self.prices[i, j] = price if price > 0 else np.nan
+        self.updated_at[i, j] = time.time() if timestamp is None else timestamp
+
+    def update_dex(self, dex: str, prices: Dict[str, float], timestamp: Optional[float] = None):
+        """Write a whole column of prices for one DEX; unknown tokens are ignored"""
+        j = self.dex_index[dex]
+        rows, values = [], []
+        for token, price in prices.items():
+            i = self.token_index.get(token)
+            if i is not None:
+                rows.append(i)
+                values.append(price)
+        if not rows:
+            return
+        values = np.asarray(values, dtype=float)
+        self.prices[rows, j] = np.where(values > 0, values, np.nan)
+        self.updated_at[rows, j] = time.time() if timestamp is None else timestamp
+
+    def live_prices(self, max_age: Optional[float] = None, now: Optional[float] = None) -> np.ndarray:
+        """Prices with cells older than max_age seconds masked out as NaN"""
+        if max_age is None:
+            return self.prices
+        now = time.time() if now is None else now
+        with np.errstate(invalid="ignore"):
+            stale = ~(now - self.updated_at <= max_age)
+        return np.where(stale, np.nan, self.prices)
+
+    def token_price(self, token: str, max_age: Optional[float] = None) -> Optional[float]:
+        """Median of a token's live prices across DEXes, or None if no DEX prices it"""
+        i = self.token_index.get(token)
+        if i is None:
+            return None
+        prices = self.live_prices(max_age)[i]
+        prices = prices[~np.isnan(prices)]
+        return float(np.median(prices)) if len(prices) else None
+
+    def best_quotes(self, max_age: Optional[float] = None, rows: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Best buy (lowest) and sell (highest) price per token, their DEX columns,
+        the spread in percent and how many DEXes quoted the token.
+        rows restricts the pass to some tokens; results follow the order of rows.
+        """
+        prices = self.live_prices(max_age)
+        if rows is not None:
+            prices = prices[rows]
+        missing = np.isnan(prices)
+        quote_count = (~missing).sum(axis=1)
+
+        if self.dexes:
+            buy_index = np.where(missing, np.inf, prices).argmin(axis=1)
+            sell_index = np.where(missing, -np.inf, prices).argmax(axis=1)
+        else:
+            buy_index = sell_index = np.zeros(len(prices), dtype=int)
+        # All-NaN rows pick column 0 and read back NaN, which fails every mask below
+        positions = np.arange(len(prices))
+        buy_price = prices[positions, buy_index] if self.dexes else np.full(len(prices), np.nan)
+        sell_price = prices[positions, sell_index] if self.dexes else np.full(len(prices), np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            spread_pct = (sell_price - buy_price) / buy_price * 100
+
+        return {
+            "buy_index": buy_index,
+            "buy_price": buy_price,
+            "sell_index": sell_index,
+            "sell_price": sell_price,
+            "spread_pct": spread_pct,
+            "quote_count": quote_count
+        }
+
+    def opportunity_mask(self, quotes: Dict[str, np.ndarray], min_spread_pct: float) -> np.ndarray:
+        """Tokens quoted on at least two DEXes whose spread is above the threshold"""
+        with np.errstate(invalid="ignore"):
+            return (
+                (quotes["quote_count"] >= 2)
+                & (quotes["spread_pct"] > min_spread_pct)
+                & (quotes["buy_index"] != quotes["sell_index"])
+            )
+
+    def find_opportunities(self, min_spread_pct: float, max_age: Optional[float] = None,
+                           tokens: Optional[List[str]] = None) -> List[ArbitrageCandidate]:
+        """Candidates above the spread threshold among tokens, or among every token"""
+        if tokens is None:
+            rows = np.arange(len(self.tokens))
+        else:
+            rows = np.array([self.token_index[token] for token in tokens if token in self.token_index], dtype=int)
+        quotes = self.best_quotes(max_age, rows)
+        candidates = []
+        for i in np.flatnonzero(self.opportunity_mask(quotes, min_spread_pct)):
+            candidates.append(ArbitrageCandidate(
+                self.tokens[rows[i]],
+                self.dexes[quotes["buy_index"][i]],
+                float(quotes["buy_price"][i]),
+                self.dexes[quotes["sell_index"][i]],
+                float(quotes["sell_price"][i]),
+                float(quotes["spread_pct"][i])
+            ))
+        return candidates
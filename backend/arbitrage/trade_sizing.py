@@ -0,0 +1,227 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Callable, Dict, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from ..integrations.dex_client import DexClient
+from ..integrations.jupiter_client import QuoteHandle
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("trade_sizing")
+
+# Load environment variables
+load_dotenv()
+
+SIZING_GRID_POINTS = int(os.getenv("SIZING_GRID_POINTS", 48))  # Trade sizes tried per pass
+SIZING_REFINE_PASSES = int(os.getenv("SIZING_REFINE_PASSES", 2))  # Finer passes around the best size
+QUOTE_LADDER_RUNGS = int(os.getenv("QUOTE_LADDER_RUNGS", 6))  # Quotes per leg for DEXes without local math
+SIZING_MAX_AGE = float(os.getenv("SIZING_MAX_AGE", 10))  # Seconds a scan's sizing is reused when executing
+
+# Output amounts for an array of input amounts, both in UI units
+Curve = Callable[[np.ndarray], np.ndarray]
+
+class SizingResult:
+    """
+    Trade size that maximizes net profit, in quote token units.
+    quotes holds the "buy" and "sell" quotes taken at exactly this size for legs priced
+    by remote quotes, so the swaps can be built from them without quoting again.
+    """
+    __slots__ = ("size", "token_amount", "proceeds", "profit", "quotes", "sized_at")
+
+    def __init__(self, size: float, token_amount: float, proceeds: float, profit: float,
+                 quotes: Optional[Dict[str, QuoteHandle]] = None):
+        self.size = size
+        self.token_amount = token_amount
+        self.proceeds = proceeds
+        self.profit = profit
+        self.quotes = quotes or {}
+        self.sized_at = time.time()
+
+    @property
+    def profit_pct(self) -> float:
+        return self.profit / self.size * 100 if self.size > 0 else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "size": self.size,
+            "token_amount": self.token_amount,
+            "proceeds": self.proceeds,
+            "profit": self.profit,
+            "profit_pct": self.profit_pct
+        }
+
+def ladder_curve(inputs: np.ndarray, outputs: np.ndarray) -> Curve:
+    """Piecewise linear curve through quoted (input, output) points, starting at the origin"""
+    order = np.argsort(inputs)
+    xs = np.concatenate(([0.0], np.asarray(inputs, dtype=float)[order]))
+    ys = np.concatenate(([0.0], np.asarray(outputs, dtype=float)[order]))
+
+    def curve(amounts: np.ndarray) -> np.ndarray:
+        amounts = np.asarray(amounts, dtype=float)
+        out = np.interp(amounts, xs, ys)
+        # Past the last rung, keep the marginal rate of the last segment
+        beyond = amounts > xs[-1]
+        if beyond.any() and len(xs) > 1:
+            slope = (ys[-1] - ys[-2]) / (xs[-1] - xs[-2]) if xs[-1] > xs[-2] else 0.0
+            out = np.where(beyond, ys[-1] + (amounts - xs[-1]) * max(slope, 0.0), out)
+        return out
+    return curve
+
+async def quote_ladder(client, input_mint: str, output_mint: str, max_amount: float,
+                       input_decimals: int, output_decimals: int, rungs: int = QUOTE_LADDER_RUNGS) -> Optional[Curve]:
+    """
+    Curve from a ladder of quotes up to max_amount, for DEXes priced by remote quotes.
+    Quotes go through the client's quote cache, so repeated ladders for a pair are cheap.
+    """
+    amounts = np.geomspace(max_amount / 2 ** (rungs - 1), max_amount, rungs)
+    handles = await asyncio.gather(*[
+        client.get_quote(input_mint, output_mint, int(amount * 10 ** input_decimals))
+        for amount in amounts
+    ])
+    inputs, outputs = [], []
+    for amount, handle in zip(amounts, handles):
+        if handle is not None and handle.out_amount > 0:
+            inputs.append(amount)
+            outputs.append(handle.out_amount / 10 ** output_decimals)
+    if not inputs:
+        return None
+    return ladder_curve(np.array(inputs), np.array(outputs))
+
+def is_quoted(client: DexClient) -> bool:
+    """Whether a DEX's legs are priced by remote quotes rather than local AMM math"""
+    return hasattr(client, "get_quote") and not hasattr(client, "quote_amounts")
+
+async def leg_curve(client: DexClient, input_mint: str, output_mint: str, max_amount: float,
+                    input_decimals: int, output_decimals: int) -> Optional[Curve]:
+    """Output-vs-input curve for one swap leg, from local AMM math when the DEX has it"""
+    if hasattr(client, "quote_amounts"):
+        if client.quote_amounts(input_mint, output_mint, max_amount) is None:
+            return None
+        return lambda amounts: client.quote_amounts(input_mint, output_mint, amounts)
+    if hasattr(client, "get_quote"):
+        return await quote_ladder(client, input_mint, output_mint, max_amount, input_decimals, output_decimals)
+    return None
+
+def optimize_size(buy_curve: Curve, sell_curve: Curve, min_size: float, max_size: float,
+                  fixed_cost: float = 0.0, grid_points: int = SIZING_GRID_POINTS,
+                  refine_passes: int = SIZING_REFINE_PASSES) -> Optional[SizingResult]:
+    """
+    Size in [min_size, max_size] that maximizes sell(buy(size)) - size - fixed_cost.
+    A log-spaced grid finds the best region and finer linear grids around the best point
+    pin it down; every pass is one vectorized evaluation of both curves.
+    """
+    if max_size <= 0 or min_size > max_size:
+        return None
+    low = max(min_size, max_size * 1e-6)
+    sizes = np.geomspace(low, max_size, grid_points) if max_size > low else np.array([max_size])
+
+    best_size, best_profit = None, -np.inf
+    for _ in range(refine_passes + 1):
+        token_amounts = buy_curve(sizes)
+        profits = sell_curve(token_amounts) - sizes - fixed_cost
+        i = int(np.nanargmax(profits)) if not np.all(np.isnan(profits)) else 0
+        if profits[i] > best_profit:
+            best_size, best_profit = float(sizes[i]), float(profits[i])
+        if len(sizes) < 3:
+            break
+        # Zoom in on the neighbours of the best point
+        lo = sizes[max(i - 1, 0)]
+        hi = sizes[min(i + 1, len(sizes) - 1)]
+        sizes = np.linspace(lo, hi, grid_points)
+
+    if best_size is None or not np.isfinite(best_profit):
+        return None
+    token_amount = float(buy_curve(np.array([best_size]))[0])
+    proceeds = float(sell_curve(np.array([token_amount]))[0])
+    return SizingResult(best_size, token_amount, proceeds, proceeds - best_size - fixed_cost)
+
+class TradeSizer:
+    """Sizes a buy-on-one-DEX, sell-on-another trade against both legs' liquidity curves"""
+    def __init__(self, dex_clients: Dict[str, DexClient]):
+        self.dex_clients = dex_clients
+
+    async def quote_legs(self, result: SizingResult, buy_client: DexClient, sell_client: DexClient,
+                         token_mint: str, token_decimals: int, quote_mint: str, quote_decimals: int,
+                         fixed_cost: float, slippage_bps: int) -> SizingResult:
+        """
+        Quote the remotely priced legs at exactly the chosen size and take the result's
+        amounts from those quotes. The sell leg is quoted for what the buy quote returns.
+        """
+        buy_quote = None
+        if is_quoted(buy_client):
+            buy_quote = await buy_client.get_quote(quote_mint, token_mint, int(result.size * 10 ** quote_decimals), slippage_bps)
+            if buy_quote is None:
+                return result
+            result.quotes["buy"] = buy_quote
+            result.token_amount = buy_quote.out_amount / 10 ** token_decimals
+        if is_quoted(sell_client):
+            token_amount = buy_quote.out_amount if buy_quote is not None else int(result.token_amount * 10 ** token_decimals)
+            sell_quote = await sell_client.get_quote(token_mint, quote_mint, token_amount, slippage_bps)
+            if sell_quote is None:
+                return result
+            result.quotes["sell"] = sell_quote
+            result.proceeds = sell_quote.out_amount / 10 ** quote_decimals
+        result.profit = result.proceeds - result.size - fixed_cost
+        return result
+
+    async def size(self, buy_dex: str, sell_dex: str, token_mint: str, token_decimals: int,
+                   quote_mint: str, quote_decimals: int, min_size: float, max_size: float,
+                   fixed_cost: float = 0.0, slippage_bps: int = 50) -> Optional[SizingResult]:
+        buy_client = self.dex_clients.get(buy_dex)
+        sell_client = self.dex_clients.get(sell_dex)
+        if buy_client is None or sell_client is None:
+            return None
+        try:
+            buy_curve = await leg_curve(buy_client, quote_mint, token_mint, max_size, quote_decimals, token_decimals)
+            if buy_curve is None:
+                return None
+            # The sell leg has to cover what the largest buy returns
+            max_tokens = float(buy_curve(np.array([max_size]))[0])
+            if max_tokens <= 0:
+                return None
+            sell_curve = await leg_curve(sell_client, token_mint, quote_mint, max_tokens, token_decimals, quote_decimals)
+            if sell_curve is None:
+                return None
+            result = optimize_size(buy_curve, sell_curve, min_size, max_size, fixed_cost)
+            if result is None:
+                return None
+            return await self.quote_legs(result, buy_client, sell_client, token_mint, token_decimals,
+                                         quote_mint, quote_decimals, fixed_cost, slippage_bps)
+        except Exception as e:
+            logger.error(f"Error sizing {token_mint} trade from {buy_dex} to {sell_dex}: {str(e)}")
+            return None
+
+class SizingCache:
+    """Recent sizings per (token, buy DEX, sell DEX), so executing a scanned spread does not size it again"""
+    def __init__(self, max_age: float = SIZING_MAX_AGE):
+        self.max_age = max_age
+        self.sizings: Dict[Tuple[str, str, str], SizingResult] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def remember(self, token_mint: str, buy_dex: str, sell_dex: str, sizing: Optional[SizingResult]):
+        if sizing is not None:
+            self.sizings[(token_mint, buy_dex, sell_dex)] = sizing
+
+    def get(self, token_mint: str, buy_dex: str, sell_dex: str,
+            min_size: float, max_size: float) -> Optional[SizingResult]:
+        """A fresh sizing of this spread within the trade size limits, or None"""
+        key = (token_mint, buy_dex, sell_dex)
+        sizing = self.sizings.get(key)
+        if sizing is not None and time.time() - sizing.sized_at > self.max_age:
+            del self.sizings[key]
+            sizing = None
+        if sizing is None or not min_size <= sizing.size <= max_size:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return sizing
+
+    def get_stats(self) -> Dict:
+        return {"sizings": len(self.sizings), "hits": self.hits, "misses": self.misses}
+
+# Sizings shared by every engine, so an execution reuses the scan that found the spread
+sizing_cache = SizingCache()
@@ -0,0 +1,115 @@
+"""
+Benchmark pool dump parsing: full response.json() decoding vs. streaming into PoolRecords.
+
+Usage:
+    python -m backend.benchmarks.bench_pool_parsing --fixture raydium_pools.json
+    python -m backend.benchmarks.bench_pool_parsing --fixture raydium_pools.json --record
+    python -m backend.benchmarks.bench_pool_parsing --pools 50000
+
+--record downloads the live Raydium dump into the fixture path first.
+Without a fixture a synthetic dump with --pools entries is generated.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+from typing import AsyncIterator, Callable, Tuple
+from backend.integrations.pool_stream import parse_pool_stream, raydium_pool_record, POOL_STREAM_CHUNK_SIZE
+from backend.integrations.raydium_client import RAYDIUM_API_URL
+
+def write_synthetic_dump(path: str, pool_count: int):
+    """Write a Raydium-shaped pool dump with the extra fields the API returns"""
+    rng = random.Random(42)
+    with open(path, "w") as f:
+        f.write("[")
+        for i in range(pool_count):
+            if i:
+                f.write(",")
+            json.dump({
+                "name": f"TOKEN{i}-USDC",
+                "ammId": f"amm{i:040d}",
+                "lpMint": f"lp{i:042d}",
+                "baseMint": f"base{i:040d}",
+                "quoteMint": "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v",
+                "market": f"mkt{i:041d}",
+                "liquidity": rng.uniform(1e3, 1e8),
+                "volume24h": rng.uniform(0, 1e7),
+                "volume7d": rng.uniform(0, 1e8),
+                "fee7d": rng.uniform(0, 1e5),
+                "apr24h": rng.uniform(0, 100),
+                "price": rng.uniform(1e-6, 1e3),
+                "tokenAmountCoin": rng.uniform(1e3, 1e9),
+                "tokenAmountPc": rng.uniform(1e3, 1e9),
+                "tokenAmountLp": rng.uniform(1e3, 1e9),
+                "official": bool(i % 2)
+            }, f)
+        f.write("]")
+
+async def record_dump(path: str):
+    """Download the live Raydium pool dump into path"""
+    from backend.integrations.http_session import get_session, close_session
+    session = await get_session()
+    async with session.get(f"{RAYDIUM_API_URL}/main/pools") as response:
+        response.raise_for_status()
+        with open(path, "wb") as f:
+            async for chunk in response.content.iter_chunked(POOL_STREAM_CHUNK_SIZE):
+                f.write(chunk)
+    await close_session()
+
+async def file_chunks(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(POOL_STREAM_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+def parse_full(path: str) -> int:
+    # Same as response.json(): the whole body, then the whole object tree
+    with open(path, "rb") as f:
+        body = f.read()
+    pools = json.loads(body)
+    return len([p for p in pools if p.get("baseMint") and p.get("quoteMint")])
+
+def parse_streaming(path: str) -> int:
+    return len(asyncio.run(parse_pool_stream(file_chunks(path), raydium_pool_record)))
+
+def measure(parse: Callable[[str], int], path: str) -> Tuple[int, float, int]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = parse(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixture", help="Path to a recorded pool dump")
+    parser.add_argument("--record", action="store_true", help="Download the live dump into --fixture first")
+    parser.add_argument("--pools", type=int, default=20000, help="Pool count for the synthetic dump")
+    args = parser.parse_args()
+
+    path = args.fixture
+    if args.record:
+        if not path:
+            parser.error("--record needs --fixture")
+        asyncio.run(record_dump(path))
+    if not path:
+        path = os.path.join(tempfile.gettempdir(), f"synthetic_pools_{args.pools}.json")
+        if not os.path.exists(path):
+            write_synthetic_dump(path, args.pools)
+
+    size_mb = os.path.getsize(path) / 1e6
+    print(f"Fixture: {path} ({size_mb:.1f} MB)")
+    print(f"{'method':<12}{'pools':>10}{'seconds':>10}{'MB/s':>10}{'peak MB':>10}")
+    for name, parse in (("json", parse_full), ("streaming", parse_streaming)):
+        count, elapsed, peak = measure(parse, path)
+        print(f"{name:<12}{count:>10}{elapsed:>10.2f}{size_mb / elapsed:>10.1f}{peak / 1e6:>10.1f}")
+
+if __name__ == "__main__":
+    main()
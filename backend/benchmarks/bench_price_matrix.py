@@ -0,0 +1,97 @@
+"""
+Benchmark opportunity detection: per-token Decimal dicts with min/max vs. the vectorized PriceMatrix.
+
+Usage:
+    python -m backend.benchmarks.bench_price_matrix
+    python -m backend.benchmarks.bench_price_matrix --tokens 10 1000 10000 --dexes 4 --missing 0.2
+
+Synthetic prices scatter around a per-token mid price; --missing is the share of token x DEX
+cells without a quote. Both paths start from the same per-DEX {mint: price} results the scan
+collects, so the matrix column includes filling the matrix; the pass column is the vectorized
+best buy/sell, spread and mask computation alone.
+"""
+import time
+import random
+import argparse
+from decimal import Decimal
+from typing import Callable, Dict, List, Tuple
+from backend.arbitrage.price_matrix import PriceMatrix
+
+MIN_SPREAD_PCT = 0.25
+
+def synthetic_prices(token_count: int, dexes: List[str], missing: float) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(42)
+    mids = [rng.uniform(1e-4, 1e3) for _ in range(token_count)]
+    return {
+        dex: {
+            f"mint{i:040d}": mid * rng.uniform(0.998, 1.002)
+            for i, mid in enumerate(mids)
+            if rng.random() >= missing
+        }
+        for dex in dexes
+    }
+
+def loop_scan(tokens: List[str], dexes: List[str], dex_prices: Dict[str, Dict[str, float]]) -> List[Tuple]:
+    """The engine's previous per-token evaluation"""
+    threshold = Decimal(str(MIN_SPREAD_PCT))
+    found = []
+    for token in tokens:
+        prices = {}
+        for dex in dexes:
+            price = dex_prices[dex].get(token)
+            if price and price > 0:
+                prices[dex] = Decimal(str(price))
+        if len(prices) < 2:
+            continue
+        buy_dex, buy_price = min(prices.items(), key=lambda x: x[1])
+        sell_dex, sell_price = max(prices.items(), key=lambda x: x[1])
+        spread = (sell_price - buy_price) / buy_price * 100
+        if spread > threshold and buy_dex != sell_dex:
+            found.append((token, buy_dex, sell_dex))
+    return found
+
+def matrix_scan(tokens: List[str], dexes: List[str], dex_prices: Dict[str, Dict[str, float]]) -> List[Tuple]:
+    matrix = PriceMatrix(tokens, dexes)
+    for dex in dexes:
+        matrix.update_dex(dex, dex_prices[dex])
+    return [(c.token, c.buy_dex, c.sell_dex) for c in matrix.find_opportunities(MIN_SPREAD_PCT)]
+
+def best_time(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--dexes", type=int, default=4)
+    parser.add_argument("--missing", type=float, default=0.2, help="Share of cells without a quote")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    dexes = ["Jupiter", "Raydium", "Orca", "Meteora"][:args.dexes] + [f"Dex{j}" for j in range(4, args.dexes)]
+    print(f"{'tokens':>8} {'loop':>10} {'matrix':>10} {'pass':>10} {'speedup':>8} {'found':>7}")
+    for token_count in args.tokens:
+        tokens = [f"mint{i:040d}" for i in range(token_count)]
+        dex_prices = synthetic_prices(token_count, dexes, args.missing)
+
+        loop_found = loop_scan(tokens, dexes, dex_prices)
+        matrix_found = matrix_scan(tokens, dexes, dex_prices)
+        if {found[0] for found in loop_found} != {found[0] for found in matrix_found}:
+            print(f"warning: loop found {len(loop_found)} opportunities, matrix {len(matrix_found)}")
+
+        loop_time = best_time(lambda: loop_scan(tokens, dexes, dex_prices), args.repeat)
+        matrix_time = best_time(lambda: matrix_scan(tokens, dexes, dex_prices), args.repeat)
+        # The vectorized pass alone, on an already filled matrix
+        matrix = PriceMatrix(tokens, dexes)
+        for dex in dexes:
+            matrix.update_dex(dex, dex_prices[dex])
+        pass_time = best_time(lambda: matrix.opportunity_mask(matrix.best_quotes(), MIN_SPREAD_PCT), args.repeat)
+        print(f"{token_count:>8} {loop_time * 1000:>8.2f}ms {matrix_time * 1000:>8.2f}ms {pass_time * 1000:>8.2f}ms "
+              f"{loop_time / matrix_time:>7.1f}x {len(matrix_found):>7}")
+
+if __name__ == "__main__":
+    main()
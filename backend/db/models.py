@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime, Date, Text, Numeric, JSON, UniqueConstraint
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime, Date, Text, Numeric, JSON, UniqueConstraint, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -87,6 +87,12 @@ class Opportunity(Base):
     sell_dex = relationship("Dex", foreign_keys=[sell_dex_id], back_populates="sell_opportunities")
     trades = relationship("Trade", back_populates="opportunity")
 
+    # One live opportunity per spread; scans update it in place
+    __table_args__ = (
+        Index('_active_opportunity_uc', 'token_id', 'buy_dex_id', 'sell_dex_id', unique=True,
+              sqlite_where=text("status = 'active'"), postgresql_where=text("status = 'active'")),
+    )
+
 class Trade(Base):
     __tablename__ = "trades"
 
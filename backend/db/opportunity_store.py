@@ -0,0 +1,184 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from sqlalchemy import func, insert, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from . import models
+from .database import SessionLocal
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("opportunity_store")
+
+# Load environment variables
+load_dotenv()
+
+# Spreads whose prices did not move are only refreshed by the engine's full scans, so an
+# unrefreshed opportunity stays active for two full scan intervals before it expires
+FULL_SCAN_INTERVAL = float(os.getenv("FULL_SCAN_INTERVAL", 60))
+OPPORTUNITY_TTL = float(os.getenv("OPPORTUNITY_TTL", 2 * FULL_SCAN_INTERVAL))
+if OPPORTUNITY_TTL <= FULL_SCAN_INTERVAL:
+    logger.warning(
+        f"OPPORTUNITY_TTL ({OPPORTUNITY_TTL}s) is not longer than FULL_SCAN_INTERVAL ({FULL_SCAN_INTERVAL}s); "
+        "live spreads will expire between full scans"
+    )
+OPPORTUNITY_SWEEP_INTERVAL = float(os.getenv("OPPORTUNITY_SWEEP_INTERVAL", 10))
+
+OPPORTUNITY_KEY = ("token_id", "buy_dex_id", "sell_dex_id")
+ACTIVE = models.Opportunity.status == "active"
+# Predicate of the partial unique index, which the upsert names as its conflict target
+ACTIVE_INDEX_WHERE = text("status = 'active'")
+
+def insert_opportunities(db: Session, rows: List[Dict]) -> List[models.Opportunity]:
+    """
+    Write a scan's opportunities with one multi-row INSERT ... RETURNING in one transaction.
+    rows are Opportunity column values; the returned objects carry their generated ids
+    in the order of rows. Like any committed object they are expired afterwards.
+    """
+    if not rows:
+        return []
+    try:
+        opportunities = db.scalars(insert(models.Opportunity).returning(models.Opportunity, sort_by_parameter_order=True), rows).all()
+        db.commit()
+        return opportunities
+    except Exception as e:
+        logger.error(f"Error writing {len(rows)} opportunities: {str(e)}")
+        db.rollback()
+        raise
+
+def upsert_opportunities(db: Session, rows: List[Dict]) -> List[models.Opportunity]:
+    """
+    Insert new spreads and refresh the live row of spreads seen before, in one statement.
+    The partial unique index on active (token, buy DEX, sell DEX) is the conflict target,
+    so rows that are executing or finished are never touched.
+    """
+    if not rows:
+        return []
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        dialect_insert = postgresql.insert
+    elif dialect == "sqlite":
+        dialect_insert = sqlite.insert
+    else:
+        return insert_opportunities(db, rows)
+
+    # A statement may update each conflicting row once; keep the last row per key
+    rows = list({tuple(row[column] for column in OPPORTUNITY_KEY): row for row in rows}.values())
+    stmt = dialect_insert(models.Opportunity)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(OPPORTUNITY_KEY),
+        index_where=ACTIVE_INDEX_WHERE,
+        set_={
+            "buy_price": stmt.excluded.buy_price,
+            "sell_price": stmt.excluded.sell_price,
+            "price_diff_percent": stmt.excluded.price_diff_percent,
+            "potential_profit_usd": stmt.excluded.potential_profit_usd,
+            # onupdate defaults do not apply to upserts
+            "updated_at": func.now()
+        }
+    )
+    try:
+        opportunities = db.scalars(
+            stmt.returning(models.Opportunity, sort_by_parameter_order=True),
+            rows,
+            execution_options={"populate_existing": True}
+        ).all()
+        db.commit()
+        return opportunities
+    except Exception as e:
+        logger.error(f"Error upserting {len(rows)} opportunities: {str(e)}")
+        db.rollback()
+        raise
+
+def expire_stale_opportunities(db: Session, ttl: float = OPPORTUNITY_TTL) -> int:
+    """Move active opportunities not refreshed within ttl seconds to expired in one UPDATE"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=ttl)
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite stores CURRENT_TIMESTAMP as naive UTC text
+        cutoff = cutoff.replace(tzinfo=None)
+    result = db.execute(
+        update(models.Opportunity)
+        .where(ACTIVE, models.Opportunity.updated_at < cutoff)
+        .values(status="expired", updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+def ensure_active_opportunity_index(engine: Engine):
+    """
+    Create the partial unique index on databases that predate it.
+    Duplicate active rows left by older versions are expired first, keeping the newest.
+    """
+    index = next(index for index in models.Opportunity.__table__.indexes if index.name == "_active_opportunity_uc")
+    with Session(engine) as db:
+        newest = (
+            select(func.max(models.Opportunity.id))
+            .where(ACTIVE)
+            .group_by(*[getattr(models.Opportunity, column) for column in OPPORTUNITY_KEY])
+        )
+        result = db.execute(
+            update(models.Opportunity)
+            .where(ACTIVE, models.Opportunity.id.not_in(newest))
+            .values(status="expired")
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        if result.rowcount:
+            logger.info(f"Expired {result.rowcount} duplicate active opportunities")
+    index.create(bind=engine, checkfirst=True)
+
+class OpportunitySweeper:
+    """Background task that expires opportunities the scans stopped refreshing"""
+    def __init__(self, session_factory, ttl: float = OPPORTUNITY_TTL, interval: float = OPPORTUNITY_SWEEP_INTERVAL):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.interval = interval
+        self.expired = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def sweep(self) -> int:
+        db = self.session_factory()
+        try:
+            expired = expire_stale_opportunities(db, self.ttl)
+        finally:
+            db.close()
+        self.expired += expired
+        if expired:
+            logger.info(f"Expired {expired} stale opportunities")
+        return expired
+
+    async def run(self):
+        while True:
+            try:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self.sweep)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error sweeping opportunities: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start the sweep task if it is not running"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+            logger.info(f"Started opportunity sweeper with a {self.ttl}s TTL")
+
+    async def stop(self):
+        """Stop the sweep task"""
+        if self.task and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.task = None
+
+# Shared sweeper for the application's database
+opportunity_sweeper = OpportunitySweeper(SessionLocal)
@@ -0,0 +1,140 @@
+import os
+import time
+import logging
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from . import models
+from .database import SessionLocal
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("reference_cache")
+
+# Load environment variables
+load_dotenv()
+
+# Tokens and DEXes can be seeded outside the API, so a snapshot is reloaded at least this often
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", 300))
+
+class TokenRef:
+    """Detached copy of a Token row, safe to share across sessions"""
+    __slots__ = ("id", "symbol", "name", "mint_address", "decimals")
+
+    def __init__(self, token: models.Token):
+        self.id = token.id
+        self.symbol = token.symbol
+        self.name = token.name
+        self.mint_address = token.mint_address
+        self.decimals = token.decimals
+
+class DexRef:
+    """Detached copy of a Dex row, safe to share across sessions"""
+    __slots__ = ("id", "name", "api_url", "is_active")
+
+    def __init__(self, dex: models.Dex):
+        self.id = dex.id
+        self.name = dex.name
+        self.api_url = dex.api_url
+        self.is_active = dex.is_active
+
+class ReferenceData:
+    """Immutable snapshot of the token and DEX tables with lookup indexes"""
+    __slots__ = ("version", "loaded_at", "tokens", "tokens_by_id", "tokens_by_symbol", "tokens_by_mint",
+                 "dexes", "dexes_by_id", "dexes_by_name")
+
+    def __init__(self, version: int, tokens: List[TokenRef], dexes: List[DexRef]):
+        self.version = version
+        self.loaded_at = time.time()
+        self.tokens = tokens
+        self.tokens_by_id = {token.id: token for token in tokens}
+        self.tokens_by_mint = {token.mint_address: token for token in tokens}
+        # Symbols are not unique; the lowest id wins, as with an unordered first()
+        self.tokens_by_symbol: Dict[str, TokenRef] = {}
+        for token in tokens:
+            self.tokens_by_symbol.setdefault(token.symbol, token)
+        self.dexes = dexes
+        self.dexes_by_id = {dex.id: dex for dex in dexes}
+        self.dexes_by_name = {dex.name: dex for dex in dexes}
+
+    @property
+    def usdc(self) -> Optional[TokenRef]:
+        return self.tokens_by_symbol.get("USDC")
+
+class ReferenceCache:
+    """
+    Versioned in-process cache of tokens, DEXes and per-user settings.
+    Readers get the current snapshot without touching the database; writers call
+    invalidate() or invalidate_settings() after committing, and the next read reloads.
+    """
+    def __init__(self, session_factory, ttl: float = REFERENCE_CACHE_TTL):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.version = 0
+        self.snapshot: Optional[ReferenceData] = None
+        # user id -> category -> settings
+        self.settings: Dict[int, Dict[str, Dict]] = {}
+        self.loads = 0
+        self.settings_loads = 0
+
+    def _query(self, db: Optional[Session], load):
+        if db is not None:
+            return load(db)
+        db = self.session_factory()
+        try:
+            return load(db)
+        finally:
+            db.close()
+
+    def get(self, db: Optional[Session] = None) -> ReferenceData:
+        """Current token and DEX snapshot, loaded with db (or a new session) when missing or stale"""
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.version == self.version and time.time() - snapshot.loaded_at < self.ttl:
+            return snapshot
+
+        version = self.version
+        tokens, dexes = self._query(db, lambda session: (
+            [TokenRef(token) for token in session.query(models.Token).order_by(models.Token.id).all()],
+            [DexRef(dex) for dex in session.query(models.Dex).order_by(models.Dex.id).all()]
+        ))
+        snapshot = ReferenceData(version, tokens, dexes)
+        # An invalidation during the load leaves this snapshot stale, so the next read reloads
+        self.snapshot = snapshot
+        self.loads += 1
+        logger.info(f"Loaded reference data v{version}: {len(tokens)} tokens, {len(dexes)} DEXes")
+        return snapshot
+
+    def get_settings(self, user_id: int, category: str, db: Optional[Session] = None) -> Optional[Dict]:
+        """A user's settings for one category, or None when the user has none"""
+        user_settings = self.settings.get(user_id)
+        if user_settings is None:
+            user_settings = self._query(db, lambda session: {
+                setting.category: setting.settings
+                for setting in session.query(models.Setting).filter(models.Setting.user_id == user_id).all()
+            })
+            self.settings[user_id] = user_settings
+            self.settings_loads += 1
+        return user_settings.get(category)
+
+    def invalidate(self):
+        """Drop everything after tokens or DEXes change"""
+        self.version += 1
+        self.settings = {}
+
+    def invalidate_settings(self, user_id: int):
+        """Drop one user's settings after they change"""
+        self.settings.pop(user_id, None)
+
+    def get_stats(self) -> Dict:
+        snapshot = self.snapshot
+        return {
+            "version": self.version,
+            "tokens": len(snapshot.tokens) if snapshot else 0,
+            "dexes": len(snapshot.dexes) if snapshot else 0,
+            "users": len(self.settings),
+            "loads": self.loads,
+            "settings_loads": self.settings_loads
+        }
+
+# Shared cache for the application's database
+reference_cache = ReferenceCache(SessionLocal)
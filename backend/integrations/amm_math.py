@@ -0,0 +1,185 @@
+import numpy as np
+from typing import Optional, Sequence, Tuple, Union
+
+# Offline swap math for the AMM curves used by the supported DEXes.
+# Every function takes scalar or array inputs and broadcasts, so one call can
+# quote many trade sizes against one pool or one size against many pools.
+# Amounts and reserves must be in the same units (raw or UI) on both sides.
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
+def constant_product_out(amount_in: ArrayLike, reserve_in: ArrayLike, reserve_out: ArrayLike,
+                         fee_rate: ArrayLike = 0.0025) -> np.ndarray:
+    """Output amount for an x*y=k pool (Raydium AMM), with the fee taken from the input"""
+    amount_in = np.asarray(amount_in, dtype=float)
+    reserve_in = np.asarray(reserve_in, dtype=float)
+    reserve_out = np.asarray(reserve_out, dtype=float)
+    amount_in_after_fee = amount_in * (1 - np.asarray(fee_rate, dtype=float))
+    return reserve_out * amount_in_after_fee / (reserve_in + amount_in_after_fee)
+
+def _clmm_segments(sqrt_price: float, liquidity: float, a_to_b: bool,
+                   tick_sqrt_prices: Optional[Sequence[float]],
+                   tick_liquidity_net: Optional[Sequence[float]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Split the swap path into constant-liquidity segments
+    Returns the start and end sqrt price and the liquidity of each segment, in swap order
+    """
+    if tick_sqrt_prices is None or len(tick_sqrt_prices) == 0:
+        boundaries = np.empty(0)
+        liquidity_net = np.empty(0)
+    else:
+        boundaries = np.asarray(tick_sqrt_prices, dtype=float)
+        liquidity_net = np.asarray(tick_liquidity_net, dtype=float)
+        order = np.argsort(boundaries)
+        boundaries, liquidity_net = boundaries[order], liquidity_net[order]
+
+    if a_to_b:
+        # Price moves down; crossing a tick downwards removes its net liquidity
+        crossed = boundaries < sqrt_price
+        boundaries, liquidity_net = boundaries[crossed][::-1], liquidity_net[crossed][::-1]
+        ends = np.append(boundaries, 0.0)
+        segment_liquidity = liquidity - np.concatenate(([0.0], np.cumsum(liquidity_net)))
+    else:
+        # Price moves up; crossing a tick upwards adds its net liquidity
+        crossed = boundaries > sqrt_price
+        boundaries, liquidity_net = boundaries[crossed], liquidity_net[crossed]
+        ends = np.append(boundaries, np.inf)
+        segment_liquidity = liquidity + np.concatenate(([0.0], np.cumsum(liquidity_net)))
+
+    starts = np.concatenate(([sqrt_price], ends[:-1]))
+    return starts, ends, np.maximum(segment_liquidity, 0.0)
+
+def clmm_out(amount_in: ArrayLike, sqrt_price: float, liquidity: float, a_to_b: bool,
+             fee_rate: float = 0.003, tick_sqrt_prices: Optional[Sequence[float]] = None,
+             tick_liquidity_net: Optional[Sequence[float]] = None) -> np.ndarray:
+    """
+    Output amount for a concentrated liquidity pool (Orca Whirlpool).
+    sqrt_price is sqrt(token B per token A) in raw units; tick_sqrt_prices and
+    tick_liquidity_net describe the initialized ticks. Without ticks the current
+    liquidity is assumed to extend across the whole price range.
+    Inputs beyond the available liquidity are filled only up to it.
+    """
+    amount_in = np.asarray(amount_in, dtype=float)
+    amount_in_after_fee = amount_in * (1 - fee_rate)
+    starts, ends, segment_liquidity = _clmm_segments(sqrt_price, liquidity, a_to_b,
+                                                     tick_sqrt_prices, tick_liquidity_net)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if a_to_b:
+            capacity_in = segment_liquidity * (1 / ends - 1 / starts)
+            capacity_out = segment_liquidity * (starts - ends)
+        else:
+            capacity_in = segment_liquidity * (ends - starts)
+            capacity_out = segment_liquidity * (1 / starts - 1 / ends)
+    capacity_in = np.where(segment_liquidity > 0, capacity_in, 0.0)
+    capacity_out = np.where(segment_liquidity > 0, capacity_out, 0.0)
+
+    cumulative_in = np.concatenate(([0.0], np.cumsum(capacity_in)))
+    cumulative_out = np.concatenate(([0.0], np.cumsum(capacity_out)))
+    segment = np.clip(np.searchsorted(cumulative_in, amount_in_after_fee, side="right") - 1, 0, len(starts) - 1)
+
+    remaining = np.minimum(amount_in_after_fee - cumulative_in[segment], capacity_in[segment])
+    start = starts[segment]
+    segment_l = segment_liquidity[segment]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if a_to_b:
+            new_sqrt_price = 1 / (1 / start + remaining / segment_l)
+            partial_out = segment_l * (start - new_sqrt_price)
+        else:
+            new_sqrt_price = start + remaining / segment_l
+            partial_out = segment_l * (1 / start - 1 / new_sqrt_price)
+    partial_out = np.where(segment_l > 0, partial_out, 0.0)
+
+    return cumulative_out[segment] + partial_out
+
+def clmm_out_many(amount_in: ArrayLike, sqrt_price: ArrayLike, liquidity: ArrayLike, a_to_b: ArrayLike,
+                  fee_rate: ArrayLike = 0.003) -> np.ndarray:
+    """Output amounts across many CLMM pools, each within its current liquidity range"""
+    amount_in_after_fee = np.asarray(amount_in, dtype=float) * (1 - np.asarray(fee_rate, dtype=float))
+    sqrt_price = np.asarray(sqrt_price, dtype=float)
+    liquidity = np.asarray(liquidity, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out_a_to_b = liquidity * amount_in_after_fee * sqrt_price / (liquidity / sqrt_price + amount_in_after_fee)
+        out_b_to_a = liquidity * amount_in_after_fee / (sqrt_price * (sqrt_price * liquidity + amount_in_after_fee))
+    return np.where(np.asarray(a_to_b), out_a_to_b, out_b_to_a)
+
+def dlmm_out(amount_in: ArrayLike, bin_prices: Sequence[float], bin_reserve_x: Sequence[float],
+             bin_reserve_y: Sequence[float], active_index: int, x_to_y: bool,
+             fee_rate: float = 0.0025) -> np.ndarray:
+    """
+    Output amount for a liquidity book pool (Meteora DLMM).
+    bin_prices are token Y per token X in ascending order, with the active bin at active_index.
+    Each bin trades at its own fixed price until its reserve is used up.
+    Inputs beyond the available liquidity are filled only up to it.
+    """
+    amount_in = np.asarray(amount_in, dtype=float)
+    amount_in_after_fee = amount_in * (1 - fee_rate)
+    prices = np.asarray(bin_prices, dtype=float)
+
+    if x_to_y:
+        # Selling X walks down from the active bin, taking Y
+        prices = prices[:active_index + 1][::-1]
+        capacity_out = np.asarray(bin_reserve_y, dtype=float)[:active_index + 1][::-1]
+        capacity_in = capacity_out / prices
+    else:
+        # Buying X walks up from the active bin, paying Y
+        prices = prices[active_index:]
+        capacity_out = np.asarray(bin_reserve_x, dtype=float)[active_index:]
+        capacity_in = capacity_out * prices
+
+    cumulative_in = np.concatenate(([0.0], np.cumsum(capacity_in)))
+    cumulative_out = np.concatenate(([0.0], np.cumsum(capacity_out)))
+    bin_index = np.clip(np.searchsorted(cumulative_in, amount_in_after_fee, side="right") - 1, 0, len(prices) - 1)
+
+    remaining = np.minimum(amount_in_after_fee - cumulative_in[bin_index], capacity_in[bin_index])
+    partial_out = remaining * prices[bin_index] if x_to_y else remaining / prices[bin_index]
+    return cumulative_out[bin_index] + partial_out
+
+def dlmm_out_many(amount_in: ArrayLike, price: ArrayLike, bin_step_bps: ArrayLike, reserve_x: ArrayLike,
+                  reserve_y: ArrayLike, x_to_y: ArrayLike, fee_rate: ArrayLike = 0.0025,
+                  bins_per_side: int = 35) -> np.ndarray:
+    """
+    Output amounts across many DLMM pools, each with the bin layout dlmm_bins_from_reserves
+    approximates from its active price and total reserves. Matches dlmm_out on that layout.
+    """
+    amount_in_after_fee = np.asarray(amount_in, dtype=float) * (1 - np.asarray(fee_rate, dtype=float))
+    price = np.asarray(price, dtype=float)
+    growth = 1 + np.asarray(bin_step_bps, dtype=float) / 10000
+    x_to_y = np.asarray(x_to_y, dtype=bool)
+    per_side = bins_per_side + 1
+    amount_in_after_fee, price, growth, x_to_y = np.broadcast_arrays(np.atleast_1d(amount_in_after_fee), price, growth, x_to_y)
+
+    # One row per pool: the bins in swap order from the active one, down when selling X, up when buying it
+    steps = np.arange(per_side)
+    prices = price[:, None] * growth[:, None] ** np.where(x_to_y[:, None], -steps, steps)
+    reserve_out = np.where(x_to_y, np.asarray(reserve_y, dtype=float), np.asarray(reserve_x, dtype=float))
+    capacity_out = np.broadcast_to((reserve_out / per_side)[:, None], prices.shape)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        capacity_in = np.where(x_to_y[:, None], capacity_out / prices, capacity_out * prices)
+
+    zeros = np.zeros((len(prices), 1))
+    cumulative_in = np.concatenate((zeros, np.cumsum(capacity_in, axis=1)), axis=1)
+    cumulative_out = np.concatenate((zeros, np.cumsum(capacity_out, axis=1)), axis=1)
+    bin_index = np.clip((cumulative_in <= amount_in_after_fee[:, None]).sum(axis=1) - 1, 0, per_side - 1)
+
+    rows = np.arange(len(prices))
+    remaining = np.minimum(amount_in_after_fee - cumulative_in[rows, bin_index], capacity_in[rows, bin_index])
+    bin_price = prices[rows, bin_index]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        partial_out = np.where(x_to_y, remaining * bin_price, remaining / bin_price)
+    return cumulative_out[rows, bin_index] + partial_out
+
+def dlmm_bins_from_reserves(price: float, bin_step_bps: float, reserve_x: float, reserve_y: float,
+                            bins_per_side: int = 35) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    Approximate a DLMM bin layout from the active price and total reserves.
+    Y is spread evenly over the active bin and the bins below it, X over the active bin and the bins above.
+    Returns bin prices, X reserves, Y reserves and the active bin index.
+    """
+    offsets = np.arange(-bins_per_side, bins_per_side + 1)
+    bin_prices = price * (1 + bin_step_bps / 10000) ** offsets
+    active_index = bins_per_side
+    per_side = bins_per_side + 1
+    bin_reserve_x = np.where(offsets >= 0, reserve_x / per_side, 0.0)
+    bin_reserve_y = np.where(offsets <= 0, reserve_y / per_side, 0.0)
+    return bin_prices, bin_reserve_x, bin_reserve_y, active_index
@@ -0,0 +1,412 @@
+import os
+import base64
+import struct
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+import base58
+from dotenv import load_dotenv
+from .jupiter_client import JupiterClient, QuoteHandle, JUPITER_DEX_LABELS
+from .solana_client import SolanaClient
+from .chain_prefetcher import ChainPrefetcher, chain_prefetcher
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("atomic_transaction")
+
+# Load environment variables
+load_dotenv()
+
+# Compute units budgeted for both swaps when they report no limit of their own
+ATOMIC_COMPUTE_UNIT_LIMIT = int(os.getenv("ATOMIC_COMPUTE_UNIT_LIMIT", 600_000))
+MAX_COMPUTE_UNIT_LIMIT = 1_400_000
+PACKET_DATA_SIZE = 1232  # Largest serialized transaction the network accepts
+
+COMPUTE_BUDGET_PROGRAM_ID = "ComputeBudget111111111111111111111111111111"
+SET_COMPUTE_UNIT_LIMIT = 2
+SET_COMPUTE_UNIT_PRICE = 3
+
+# Address lookup table accounts: a 56-byte header, then the 32-byte addresses
+LOOKUP_TABLE_META_SIZE = 56
+LOOKUP_TABLE_ACTIVE = 2 ** 64 - 1  # Deactivation slot of a table that is not being deactivated
+MESSAGE_VERSION_0 = 0x80
+
+# (pubkey, is_signer, is_writable)
+AccountMeta = Tuple[str, bool, bool]
+
+class Instruction:
+    """A program invocation with its accounts and raw data"""
+    __slots__ = ("program_id", "accounts", "data")
+
+    def __init__(self, program_id: str, accounts: List[AccountMeta], data: bytes):
+        self.program_id = program_id
+        self.accounts = accounts
+        self.data = data
+
+    @classmethod
+    def from_jupiter(cls, instruction: Dict) -> "Instruction":
+        """Instruction from Jupiter's swap-instructions JSON"""
+        return cls(
+            instruction["programId"],
+            [(account["pubkey"], account["isSigner"], account["isWritable"]) for account in instruction["accounts"]],
+            base64.b64decode(instruction["data"])
+        )
+
+    @property
+    def key(self) -> Tuple:
+        return (self.program_id, tuple(self.accounts), self.data)
+
+def compute_unit_limit_instruction(units: int) -> Instruction:
+    return Instruction(COMPUTE_BUDGET_PROGRAM_ID, [], struct.pack("<BI", SET_COMPUTE_UNIT_LIMIT, units))
+
+def compute_unit_price_instruction(micro_lamports: int) -> Instruction:
+    return Instruction(COMPUTE_BUDGET_PROGRAM_ID, [], struct.pack("<BQ", SET_COMPUTE_UNIT_PRICE, micro_lamports))
+
+def compute_unit_limit(instructions: List[Instruction]) -> Optional[int]:
+    """Limit set by a leg's compute budget instructions, if any"""
+    for instruction in instructions:
+        if (instruction.program_id == COMPUTE_BUDGET_PROGRAM_ID and len(instruction.data) >= 5
+                and instruction.data[0] == SET_COMPUTE_UNIT_LIMIT):
+            return struct.unpack_from("<I", instruction.data, 1)[0]
+    return None
+
+def decode_lookup_table(data: bytes) -> Optional[List[str]]:
+    """Addresses of an active lookup table account, or None if it is deactivated or malformed"""
+    if len(data) < LOOKUP_TABLE_META_SIZE or (len(data) - LOOKUP_TABLE_META_SIZE) % 32:
+        return None
+    deactivation_slot = struct.unpack_from("<Q", data, 4)[0]
+    if deactivation_slot != LOOKUP_TABLE_ACTIVE:
+        return None
+    return [
+        base58.b58encode(data[offset:offset + 32]).decode()
+        for offset in range(LOOKUP_TABLE_META_SIZE, len(data), 32)
+    ]
+
+def encode_compact_u16(value: int) -> bytes:
+    """Solana's variable-length array length prefix"""
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def decode_compact_u16(raw: bytes, offset: int) -> Tuple[int, int]:
+    """Value and the offset after it"""
+    value = 0
+    for i in range(3):
+        byte = raw[offset + i]
+        value |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            return value, offset + i + 1
+    raise ValueError("Compact-u16 longer than 3 bytes")
+
+def _pubkey_bytes(pubkey: str) -> bytes:
+    raw = base58.b58decode(pubkey)
+    if len(raw) != 32:
+        raise ValueError(f"Invalid public key {pubkey}")
+    return raw
+
+def compile_v0_message(payer: str, instructions: List[Instruction], recent_blockhash: str,
+                       lookup_tables: Dict[str, List[str]]) -> Tuple[bytes, int]:
+    """
+    Serialize a version 0 message and return it with its number of required signatures.
+    Accounts that are neither signers nor invoked programs are loaded from the lookup
+    tables when a table holds them, which keeps multi-swap transactions under the size limit.
+    """
+    # pubkey -> [is_signer, is_writable], payer first
+    metas: Dict[str, List[bool]] = {payer: [True, True]}
+    program_ids = set()
+    for instruction in instructions:
+        program_ids.add(instruction.program_id)
+        metas.setdefault(instruction.program_id, [False, False])
+        for pubkey, is_signer, is_writable in instruction.accounts:
+            flags = metas.setdefault(pubkey, [False, False])
+            flags[0] = flags[0] or is_signer
+            flags[1] = flags[1] or is_writable
+
+    loadable = {pubkey for pubkey, (is_signer, _) in metas.items() if not is_signer and pubkey not in program_ids}
+    lookups = []  # (table, writable indexes, readonly indexes)
+    loaded_writable, loaded_readonly = [], []
+    for table, addresses in lookup_tables.items():
+        writable_indexes, readonly_indexes = [], []
+        for index, address in enumerate(addresses[:256]):
+            if address not in loadable:
+                continue
+            loadable.discard(address)
+            if metas[address][1]:
+                writable_indexes.append(index)
+                loaded_writable.append(address)
+            else:
+                readonly_indexes.append(index)
+                loaded_readonly.append(address)
+        if writable_indexes or readonly_indexes:
+            lookups.append((table, writable_indexes, readonly_indexes))
+
+    loaded = set(loaded_writable) | set(loaded_readonly)
+    static = [pubkey for pubkey in metas if pubkey not in loaded]
+    static.sort(key=lambda pubkey: (not metas[pubkey][0], not metas[pubkey][1]))  # Stable: payer stays first
+    signers = [pubkey for pubkey in static if metas[pubkey][0]]
+    readonly_signed = sum(1 for pubkey in signers if not metas[pubkey][1])
+    readonly_unsigned = sum(1 for pubkey in static if not metas[pubkey][0] and not metas[pubkey][1])
+
+    account_keys = static + loaded_writable + loaded_readonly
+    if len(account_keys) > 256:
+        raise ValueError(f"Transaction references {len(account_keys)} accounts, more than 256")
+    index_of = {pubkey: index for index, pubkey in enumerate(account_keys)}
+
+    message = bytearray([MESSAGE_VERSION_0, len(signers), readonly_signed, readonly_unsigned])
+    message += encode_compact_u16(len(static))
+    for pubkey in static:
+        message += _pubkey_bytes(pubkey)
+    message += _pubkey_bytes(recent_blockhash)
+    message += encode_compact_u16(len(instructions))
+    for instruction in instructions:
+        message.append(index_of[instruction.program_id])
+        message += encode_compact_u16(len(instruction.accounts))
+        message += bytes(index_of[pubkey] for pubkey, _, _ in instruction.accounts)
+        message += encode_compact_u16(len(instruction.data))
+        message += instruction.data
+    message += encode_compact_u16(len(lookups))
+    for table, writable_indexes, readonly_indexes in lookups:
+        message += _pubkey_bytes(table)
+        message += encode_compact_u16(len(writable_indexes)) + bytes(writable_indexes)
+        message += encode_compact_u16(len(readonly_indexes)) + bytes(readonly_indexes)
+    return bytes(message), len(signers)
+
+def serialize_transaction(message: bytes, signature_count: int) -> str:
+    """Base64 transaction with empty signature slots, ready to be signed or simulated without sigVerify"""
+    return base64.b64encode(encode_compact_u16(signature_count) + bytes(64 * signature_count) + message).decode()
+
+def decode_transaction(transaction_base64: str, lookup_tables: Optional[Dict[str, List[str]]] = None) -> Dict:
+    """
+    Parse a serialized version 0 transaction, resolving its lookups from lookup_tables.
+    Raises ValueError if it is malformed or a lookup cannot be resolved.
+    """
+    raw = base64.b64decode(transaction_base64)
+    try:
+        signature_count, offset = decode_compact_u16(raw, 0)
+        offset += 64 * signature_count
+        if raw[offset] != MESSAGE_VERSION_0:
+            raise ValueError("Not a version 0 message")
+        required_signatures, readonly_signed, readonly_unsigned = raw[offset + 1:offset + 4]
+        offset += 4
+
+        key_count, offset = decode_compact_u16(raw, offset)
+        static = [base58.b58encode(raw[offset + 32 * i:offset + 32 * (i + 1)]).decode() for i in range(key_count)]
+        offset += 32 * key_count
+        blockhash = base58.b58encode(raw[offset:offset + 32]).decode()
+        offset += 32
+
+        compiled = []
+        instruction_count, offset = decode_compact_u16(raw, offset)
+        for _ in range(instruction_count):
+            program_index = raw[offset]
+            account_count, offset = decode_compact_u16(raw, offset + 1)
+            account_indexes = list(raw[offset:offset + account_count])
+            offset += account_count
+            data_length, offset = decode_compact_u16(raw, offset)
+            compiled.append((program_index, account_indexes, raw[offset:offset + data_length]))
+            offset += data_length
+
+        lookups = []
+        loaded_writable, loaded_readonly = [], []
+        lookup_count, offset = decode_compact_u16(raw, offset)
+        for _ in range(lookup_count):
+            table = base58.b58encode(raw[offset:offset + 32]).decode()
+            writable_count, offset = decode_compact_u16(raw, offset + 32)
+            writable_indexes = list(raw[offset:offset + writable_count])
+            readonly_count, offset = decode_compact_u16(raw, offset + writable_count)
+            readonly_indexes = list(raw[offset:offset + readonly_count])
+            offset += readonly_count
+            lookups.append({"table": table, "writable": writable_indexes, "readonly": readonly_indexes})
+            addresses = (lookup_tables or {}).get(table)
+            if addresses is None:
+                raise ValueError(f"Lookup table {table} not found")
+            loaded_writable += [addresses[i] for i in writable_indexes]
+            loaded_readonly += [addresses[i] for i in readonly_indexes]
+    except (IndexError, KeyError) as e:
+        raise ValueError(f"Malformed transaction: {str(e)}")
+    if offset != len(raw):
+        raise ValueError(f"{len(raw) - offset} trailing bytes after the message")
+
+    account_keys = static + loaded_writable + loaded_readonly
+    return {
+        "size": len(raw),
+        "signatures": signature_count,
+        "header": [required_signatures, readonly_signed, readonly_unsigned],
+        "static_keys": static,
+        "account_keys": account_keys,
+        "recent_blockhash": blockhash,
+        "address_table_lookups": lookups,
+        "instructions": [
+            {
+                "program_id": account_keys[program_index],
+                "accounts": [account_keys[i] for i in account_indexes],
+                "data": data
+            }
+            for program_index, account_indexes, data in compiled
+        ]
+    }
+
+def guard_quote(quote_response: Dict, min_out_amount: int) -> Optional[Dict]:
+    """
+    Copy of a quote whose slippage bound makes the swap fail unless it returns at least
+    min_out_amount, or None if even the quoted output falls short.
+    """
+    out_amount = int(quote_response.get("outAmount", 0))
+    if out_amount <= 0 or out_amount < min_out_amount:
+        return None
+    # The swap program enforces out >= outAmount * (10000 - slippageBps) / 10000
+    slippage_bps = (out_amount - min_out_amount) * 10_000 // out_amount
+    slippage_bps = min(slippage_bps, int(quote_response.get("slippageBps", slippage_bps)))
+    guarded = dict(quote_response)
+    guarded["slippageBps"] = slippage_bps
+    guarded["otherAmountThreshold"] = str(out_amount * (10_000 - slippage_bps) // 10_000)
+    return guarded
+
+class AtomicArbitrageBuilder:
+    """
+    Composes the buy and sell swaps of an arbitrage into one version 0 transaction.
+    Both legs come from Jupiter's swap-instructions, kept on each leg's DEX; the sell
+    leg spends the buy leg's guaranteed output and its slippage bound is tightened so
+    the whole transaction reverts unless it returns the input plus the minimum profit.
+    """
+    def __init__(self, jupiter_client: JupiterClient, solana_client: SolanaClient,
+                 prefetcher: Optional[ChainPrefetcher] = None):
+        self.jupiter_client = jupiter_client
+        self.solana_client = solana_client
+        self.prefetcher = prefetcher or chain_prefetcher
+
+    async def fetch_lookup_tables(self, addresses: List[str]) -> Dict[str, List[str]]:
+        """Active lookup tables among addresses, in one getMultipleAccounts round trip"""
+        if not addresses:
+            return {}
+        accounts = await self.solana_client.get_multiple_accounts(addresses)
+        tables = {}
+        for address in addresses:
+            account = accounts.get(address)
+            addresses_in_table = decode_lookup_table(account["data"]) if account and isinstance(account.get("data"), bytes) else None
+            if addresses_in_table is None:
+                logger.warning(f"Skipping unusable address lookup table {address}")
+                continue
+            tables[address] = addresses_in_table
+        return tables
+
+    async def _recent_blockhash(self) -> Optional[str]:
+        blockhash = self.prefetcher.get_blockhash()
+        if blockhash is None:
+            # Only before the prefetcher's first refresh
+            blockhash = await self.prefetcher.refresh_blockhash()
+        return blockhash.blockhash if blockhash else None
+
+    async def build(self, quote_mint: str, token_mint: str, amount: int, user_public_key: str,
+                    slippage_bps: int, min_profit: int, buy_dex: str = "Jupiter", sell_dex: str = "Jupiter",
+                    compute_unit_price: Optional[int] = None, buy_quote: Optional[QuoteHandle] = None) -> Dict:
+        """
+        Build the transaction for buying token_mint with amount of quote_mint on buy_dex
+        and selling it back on sell_dex; amounts are in the smallest units.
+        buy_quote is used for the buy leg when it matches, saving a quote round trip.
+        """
+        try:
+            if buy_quote is None or not buy_quote.matches(quote_mint, token_mint, amount, slippage_bps):
+                buy_quote = await self.jupiter_client.get_quote(
+                    quote_mint, token_mint, amount, slippage_bps, dexes=JUPITER_DEX_LABELS.get(buy_dex)
+                )
+            if buy_quote is None:
+                return {"success": False, "error": "Failed to quote buy leg"}
+
+            # Sell only what the buy leg is guaranteed to deliver, so the sell can never overspend
+            token_amount = int(buy_quote.quote_response.get("otherAmountThreshold", buy_quote.out_amount))
+            if token_amount <= 0:
+                return {"success": False, "error": "Buy leg returns nothing"}
+            sell_quote = await self.jupiter_client.get_quote(
+                token_mint, quote_mint, token_amount, slippage_bps, dexes=JUPITER_DEX_LABELS.get(sell_dex)
+            )
+            if sell_quote is None:
+                return {"success": False, "error": "Failed to quote sell leg"}
+
+            min_out_amount = int(amount) + max(int(min_profit), 0)
+            guarded_sell = guard_quote(sell_quote.quote_response, min_out_amount)
+            if guarded_sell is None:
+                return {
+                    "success": False,
+                    "error": f"Sell leg returns {sell_quote.out_amount}, below the {min_out_amount} needed for the minimum profit"
+                }
+
+            buy_leg, sell_leg, recent_blockhash = await asyncio.gather(
+                # Wrapped SOL stays wrapped between the legs instead of being unwrapped and re-wrapped
+                self.jupiter_client.get_swap_instructions(buy_quote.quote_response, user_public_key, wrap_and_unwrap_sol=False),
+                self.jupiter_client.get_swap_instructions(guarded_sell, user_public_key, wrap_and_unwrap_sol=False),
+                self._recent_blockhash()
+            )
+            for side, leg in (("buy", buy_leg), ("sell", sell_leg)):
+                if not leg["success"]:
+                    return {"success": False, "error": f"Failed to get {side} swap instructions: {leg.get('error')}"}
+            if recent_blockhash is None:
+                return {"success": False, "error": "No recent blockhash"}
+
+            table_addresses = list(dict.fromkeys(
+                (buy_leg.get("addressLookupTableAddresses") or []) + (sell_leg.get("addressLookupTableAddresses") or [])
+            ))
+            lookup_tables = await self.fetch_lookup_tables(table_addresses)
+
+            instructions = self.compose(buy_leg, sell_leg, compute_unit_price)
+            message, signature_count = compile_v0_message(user_public_key, instructions, recent_blockhash, lookup_tables)
+            transaction = serialize_transaction(message, signature_count)
+            size = len(base64.b64decode(transaction))
+            if size > PACKET_DATA_SIZE:
+                return {"success": False, "error": f"Transaction is {size} bytes, over the {PACKET_DATA_SIZE} byte limit"}
+
+            return {
+                "success": True,
+                "transaction": transaction,
+                "size": size,
+                "recentBlockhash": recent_blockhash,
+                "lookupTables": list(lookup_tables),
+                "inputAmount": int(amount),
+                "tokenAmount": token_amount,
+                "outputAmount": sell_quote.out_amount,
+                "minOutputAmount": int(guarded_sell["otherAmountThreshold"])
+            }
+        except Exception as e:
+            logger.error(f"Error building atomic arbitrage transaction: {str(e)}")
+            return {"success": False, "error": str(e)}
+
+    def compose(self, buy_leg: Dict, sell_leg: Dict, compute_unit_price: Optional[int] = None) -> List[Instruction]:
+        """
+        One compute budget for both swaps, then each leg's setup and swap in order and the
+        cleanups last. Setup shared by the legs (e.g. creating the same token account) is kept once.
+        """
+        legs = (buy_leg, sell_leg)
+        units = 0
+        for leg in legs:
+            budget = [Instruction.from_jupiter(instruction) for instruction in leg.get("computeBudgetInstructions") or []]
+            leg_units = compute_unit_limit(budget)
+            units += leg_units if leg_units is not None else ATOMIC_COMPUTE_UNIT_LIMIT // len(legs)
+
+        instructions = [compute_unit_limit_instruction(min(units, MAX_COMPUTE_UNIT_LIMIT))]
+        if compute_unit_price:
+            instructions.append(compute_unit_price_instruction(compute_unit_price))
+
+        seen = set()
+
+        def add(instruction_json: Optional[Dict]):
+            if not instruction_json:
+                return
+            instruction = Instruction.from_jupiter(instruction_json)
+            if instruction.key in seen:
+                return
+            seen.add(instruction.key)
+            instructions.append(instruction)
+
+        for leg in legs:
+            for instruction_json in leg.get("setupInstructions") or []:
+                add(instruction_json)
+            add(leg["swapInstruction"])
+        for leg in legs:
+            add(leg.get("cleanupInstruction"))
+        return instructions
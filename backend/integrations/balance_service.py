@@ -0,0 +1,145 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from .solana_client import SolanaClient
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("balance_service")
+
+# Load environment variables
+load_dotenv()
+
+BALANCE_REFRESH_INTERVAL = float(os.getenv("BALANCE_REFRESH_INTERVAL", 15))  # Seconds between background refreshes
+BALANCE_CACHE_MAX_AGE = float(os.getenv("BALANCE_CACHE_MAX_AGE", 30))  # Seconds before cached balances are stale
+
+# Native SOL balances are reported under the wrapped SOL mint
+NATIVE_SOL_MINT = "So11111111111111111111111111111111111111112"
+
+class WalletBalances:
+    """Balances of one wallet as of an RPC slot"""
+    __slots__ = ("slot", "balances", "fetched_at")
+
+    def __init__(self, slot: int, balances: Dict[str, float]):
+        self.slot = slot
+        self.balances = balances
+        self.fetched_at = time.monotonic()
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+class BalanceService:
+    """
+    Cache of on-chain wallet balances keyed by wallet, then by mint.
+    Balances are fetched for all wallets in one batched round trip and only
+    replace cached balances read at the same or an earlier slot, so a slow
+    response from a lagging node cannot roll balances back.
+    Lookups are dict reads and never touch the network.
+    """
+    def __init__(self, solana_client: Optional[SolanaClient] = None,
+                 refresh_interval: float = BALANCE_REFRESH_INTERVAL,
+                 max_age: float = BALANCE_CACHE_MAX_AGE):
+        self.solana_client = solana_client or SolanaClient()
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.wallets: Dict[str, WalletBalances] = {}
+        # Minimum slot the cached balances must reach after a known balance change
+        self.min_slots: Dict[str, int] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def get_balances(self, wallet_address: str) -> Optional[Dict[str, float]]:
+        """Get the cached balances of a wallet by mint, or None if they are unknown or stale"""
+        entry = self.wallets.get(wallet_address)
+        if entry is None or self.is_stale(wallet_address):
+            return None
+        return entry.balances
+
+    def get_token_balance(self, wallet_address: str, token_mint: str) -> Optional[float]:
+        """Get the cached balance of one mint, or None if the wallet's balances are unknown or stale"""
+        balances = self.get_balances(wallet_address)
+        if balances is None:
+            return None
+        return balances.get(token_mint, 0)
+
+    def get_entry(self, wallet_address: str) -> Optional[WalletBalances]:
+        """Get the cached entry of a wallet even if it is stale"""
+        return self.wallets.get(wallet_address)
+
+    def is_stale(self, wallet_address: str) -> bool:
+        entry = self.wallets.get(wallet_address)
+        if entry is None:
+            return True
+        return entry.age > self.max_age or entry.slot < self.min_slots.get(wallet_address, 0)
+
+    def invalidate(self, wallet_address: str, slot: Optional[int] = None):
+        """
+        Mark a wallet's balances as changed, e.g. after a trade landed.
+        With a slot, cached balances stay valid once they were read at or after it.
+        """
+        if slot is None:
+            self.wallets.pop(wallet_address, None)
+            return
+        self.min_slots[wallet_address] = max(slot, self.min_slots.get(wallet_address, 0))
+
+    async def refresh(self, wallet_addresses: List[str]) -> int:
+        """
+        Fetch token and SOL balances for many wallets
+        Returns the number of wallets whose cached balances were replaced
+        """
+        wallet_addresses = list(dict.fromkeys(wallet_addresses))
+        if not wallet_addresses:
+            return 0
+
+        token_accounts, sol_balances = await asyncio.gather(
+            self.solana_client.get_token_accounts_by_owner(wallet_addresses),
+            self.solana_client.get_balances(wallet_addresses)
+        )
+
+        updated = 0
+        for address, (slot, balances) in token_accounts.items():
+            cached = self.wallets.get(address)
+            if cached is not None and slot < cached.slot:
+                continue
+            if address not in sol_balances:
+                # The SOL balance failed to load; keep the previous entry rather than cache a zero
+                continue
+            balances[NATIVE_SOL_MINT] = balances.get(NATIVE_SOL_MINT, 0) + sol_balances[address]
+            self.wallets[address] = WalletBalances(slot, balances)
+            if slot >= self.min_slots.get(address, 0):
+                self.min_slots.pop(address, None)
+            updated += 1
+        return updated
+
+    async def run(self, addresses_provider: Callable[[], List[str]]):
+        """Refresh balances of the provided wallets until cancelled"""
+        while True:
+            try:
+                await self.refresh(addresses_provider())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error refreshing wallet balances: {str(e)}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self, addresses_provider: Callable[[], List[str]]):
+        """Start the background refresh task if it is not running"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run(addresses_provider))
+            logger.info(f"Started wallet balance refresh every {self.refresh_interval}s")
+
+    async def stop(self):
+        """Stop the background refresh task"""
+        if self.task and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.task = None
+
+# Shared cache used by the risk checks and the wallets API
+balance_service = BalanceService()
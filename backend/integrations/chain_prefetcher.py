@@ -0,0 +1,146 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from .rpc_router import RpcRouter, rpc_router
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("chain_prefetcher")
+
+# Load environment variables
+load_dotenv()
+
+BLOCKHASH_REFRESH_INTERVAL = float(os.getenv("BLOCKHASH_REFRESH_INTERVAL", 2))  # Seconds between blockhash refreshes
+BLOCKHASH_MAX_AGE = float(os.getenv("BLOCKHASH_MAX_AGE", 30))  # Seconds a prefetched blockhash is used for
+PRIORITY_FEE_REFRESH_INTERVAL = float(os.getenv("PRIORITY_FEE_REFRESH_INTERVAL", 5))
+PRIORITY_FEE_WINDOW = int(os.getenv("PRIORITY_FEE_WINDOW", 300))  # Slots of fee samples kept
+PRIORITY_FEE_PERCENTILE = float(os.getenv("PRIORITY_FEE_PERCENTILE", 0.75))
+
+LAMPORTS_PER_SIGNATURE = 5000
+
+class BlockhashInfo:
+    """A recent blockhash and the block height after which it expires"""
+    __slots__ = ("blockhash", "last_valid_block_height", "slot", "fetched_at")
+
+    def __init__(self, blockhash: str, last_valid_block_height: int, slot: int):
+        self.blockhash = blockhash
+        self.last_valid_block_height = last_valid_block_height
+        self.slot = slot
+        self.fetched_at = time.monotonic()
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+class ChainPrefetcher:
+    """
+    Keeps a recent blockhash and the recent prioritization fee distribution in memory.
+    Background tasks refresh both, so the execution path reads them without any I/O.
+    """
+    def __init__(self, router: Optional[RpcRouter] = None,
+                 blockhash_interval: float = BLOCKHASH_REFRESH_INTERVAL,
+                 fee_interval: float = PRIORITY_FEE_REFRESH_INTERVAL):
+        self.router = router or rpc_router
+        self.blockhash_interval = blockhash_interval
+        self.fee_interval = fee_interval
+        self.blockhash: Optional[BlockhashInfo] = None
+        self.fee_samples: Dict[int, int] = {}  # Slot -> prioritization fee in micro-lamports per CU
+        self.fee_accounts: List[str] = []  # Writable accounts to scope fee samples to, if any
+        self.tasks: List[asyncio.Task] = []
+
+    def get_blockhash(self, max_age: float = BLOCKHASH_MAX_AGE) -> Optional[BlockhashInfo]:
+        """The prefetched blockhash, or None if it is missing or too old"""
+        if self.blockhash is None or self.blockhash.age > max_age:
+            return None
+        return self.blockhash
+
+    def get_priority_fee(self, percentile: float = PRIORITY_FEE_PERCENTILE) -> int:
+        """Priority fee in micro-lamports per compute unit at a percentile of recent slots"""
+        if not self.fee_samples:
+            return 0
+        fees = sorted(self.fee_samples.values())
+        return fees[min(int(percentile * len(fees)), len(fees) - 1)]
+
+    def get_fee_distribution(self) -> Dict:
+        return {
+            "samples": len(self.fee_samples),
+            "p50": self.get_priority_fee(0.5),
+            "p75": self.get_priority_fee(0.75),
+            "p90": self.get_priority_fee(0.9),
+            "max": self.get_priority_fee(1.0)
+        }
+
+    async def refresh_blockhash(self) -> Optional[BlockhashInfo]:
+        data = await self.router.call("getLatestBlockhash", [{"commitment": "confirmed"}])
+        if "result" not in data:
+            logger.error(f"Error getting latest blockhash: {data.get('error')}")
+            return None
+        value = data["result"]["value"]
+        self.blockhash = BlockhashInfo(
+            value["blockhash"],
+            value["lastValidBlockHeight"],
+            data["result"].get("context", {}).get("slot", 0)
+        )
+        return self.blockhash
+
+    async def refresh_fees(self) -> int:
+        """Merge the latest per-slot prioritization fees into the rolling window"""
+        params = [self.fee_accounts] if self.fee_accounts else []
+        data = await self.router.call("getRecentPrioritizationFees", params)
+        if "result" not in data:
+            logger.error(f"Error getting prioritization fees: {data.get('error')}")
+            return 0
+        for sample in data["result"]:
+            self.fee_samples[sample["slot"]] = sample["prioritizationFee"]
+        # Keep only the newest slots
+        if len(self.fee_samples) > PRIORITY_FEE_WINDOW:
+            for slot in sorted(self.fee_samples)[:len(self.fee_samples) - PRIORITY_FEE_WINDOW]:
+                del self.fee_samples[slot]
+        return len(data["result"])
+
+    async def _refresh_loop(self, refresh, interval: float, name: str):
+        while True:
+            try:
+                await refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error refreshing {name}: {str(e)}")
+            await asyncio.sleep(interval)
+
+    def start(self):
+        """Start the background refresh tasks if they are not running"""
+        if self.tasks and not all(task.done() for task in self.tasks):
+            return
+        self.tasks = [
+            asyncio.create_task(self._refresh_loop(self.refresh_blockhash, self.blockhash_interval, "blockhash")),
+            asyncio.create_task(self._refresh_loop(self.refresh_fees, self.fee_interval, "prioritization fees"))
+        ]
+        logger.info(
+            f"Started blockhash refresh every {self.blockhash_interval}s and "
+            f"prioritization fee refresh every {self.fee_interval}s"
+        )
+
+    async def stop(self):
+        """Stop the background refresh tasks"""
+        for task in self.tasks:
+            task.cancel()
+        for task in self.tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.tasks = []
+
+    def get_stats(self) -> Dict:
+        return {
+            "blockhash": self.blockhash.blockhash if self.blockhash else None,
+            "blockhash_age": self.blockhash.age if self.blockhash else None,
+            "priority_fees": self.get_fee_distribution()
+        }
+
+# Shared prefetcher for the execution path
+chain_prefetcher = ChainPrefetcher()
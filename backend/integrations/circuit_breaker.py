@@ -0,0 +1,157 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("circuit_breaker")
+
+# Load environment variables
+load_dotenv()
+
+CIRCUIT_WINDOW = int(os.getenv("CIRCUIT_WINDOW", 20))  # Recent calls considered when tripping
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", 5))  # Calls needed before the breaker can trip
+CIRCUIT_FAILURE_THRESHOLD = float(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 0.5))  # Failed or slow share that trips
+CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", 2))  # Slower calls count as failures
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", 30))  # Wait before a trial call without a probe
+CIRCUIT_PROBE_INTERVAL = float(os.getenv("CIRCUIT_PROBE_INTERVAL", 10))  # Seconds between background probes
+CIRCUIT_HALF_OPEN_SUCCESSES = int(os.getenv("CIRCUIT_HALF_OPEN_SUCCESSES", 3))  # Successes that close it again
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker for one upstream.
+    It trips when too many recent calls failed or were slow. While open, callers
+    skip the upstream and a background probe checks it periodically; once a probe
+    succeeds it turns half-open, and a few successful live calls close it again.
+    Without a probe, the first call after CIRCUIT_OPEN_SECONDS is the trial.
+    """
+    def __init__(self, name: str, probe: Optional[Callable[[], Awaitable[bool]]] = None):
+        self.name = name
+        self.probe = probe
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=CIRCUIT_WINDOW)  # True for a failed or slow call
+        self.latency: Optional[float] = None  # EWMA seconds
+        self.opened_at = 0.0
+        self.half_open_successes = 0
+        self.calls = 0
+        self.failures = 0
+        self.trips = 0
+        self.probe_task: Optional[asyncio.Task] = None
+
+    @property
+    def failure_rate(self) -> float:
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    @property
+    def health_score(self) -> float:
+        """1.0 for a fast, error-free upstream, 0.0 for an open breaker"""
+        if self.state == OPEN:
+            return 0.0
+        speed = 1.0 if not self.latency else min(1.0, CIRCUIT_SLOW_CALL_SECONDS / (2 * self.latency))
+        return round((1 - self.failure_rate) * speed, 3)
+
+    def allow_request(self) -> bool:
+        if self.state == OPEN and self.probe is None and time.monotonic() - self.opened_at >= CIRCUIT_OPEN_SECONDS:
+            self._half_open()
+        return self.state != OPEN
+
+    def record(self, latency: float, failed: bool = False):
+        """Record the outcome of a call"""
+        slow = latency > CIRCUIT_SLOW_CALL_SECONDS
+        self.calls += 1
+        self.latency = latency if self.latency is None else 0.2 * latency + 0.8 * self.latency
+        if failed:
+            self.failures += 1
+        self.outcomes.append(failed or slow)
+
+        if self.state == HALF_OPEN:
+            if failed or slow:
+                self.trip()
+            else:
+                self.half_open_successes += 1
+                if self.half_open_successes >= CIRCUIT_HALF_OPEN_SUCCESSES:
+                    self._close()
+        elif self.state == CLOSED:
+            if len(self.outcomes) >= CIRCUIT_MIN_CALLS and self.failure_rate >= CIRCUIT_FAILURE_THRESHOLD:
+                self.trip()
+
+    def trip(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        logger.warning(f"Circuit for {self.name} opened (failure rate {self.failure_rate:.0%})")
+        if self.probe is not None and (self.probe_task is None or self.probe_task.done()):
+            self.probe_task = asyncio.create_task(self._probe_loop())
+
+    def _half_open(self):
+        self.state = HALF_OPEN
+        self.half_open_successes = 0
+        logger.info(f"Circuit for {self.name} half-open")
+
+    def _close(self):
+        self.state = CLOSED
+        self.outcomes.clear()
+        logger.info(f"Circuit for {self.name} closed")
+
+    async def _probe_loop(self):
+        """Probe the upstream until it answers, then let live calls through again"""
+        while self.state == OPEN:
+            await asyncio.sleep(CIRCUIT_PROBE_INTERVAL)
+            start = time.perf_counter()
+            try:
+                healthy = await asyncio.wait_for(self.probe(), timeout=CIRCUIT_SLOW_CALL_SECONDS)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.info(f"Probe of {self.name} failed: {str(e) or type(e).__name__}")
+                healthy = False
+            if healthy and self.state == OPEN:
+                self.latency = time.perf_counter() - start
+                self._half_open()
+
+    def stop(self):
+        if self.probe_task and not self.probe_task.done():
+            self.probe_task.cancel()
+        self.probe_task = None
+
+    def get_stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "health_score": self.health_score,
+            "failure_rate": self.failure_rate,
+            "latency_ms": self.latency * 1000 if self.latency is not None else None,
+            "calls": self.calls,
+            "failures": self.failures,
+            "trips": self.trips,
+            "open_for": time.monotonic() - self.opened_at if self.state == OPEN else None
+        }
+
+class CircuitBreakerRegistry:
+    """Named breakers shared across engine instances"""
+    def __init__(self):
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name)
+            self.breakers[name] = breaker
+        return breaker
+
+    def stop(self):
+        for breaker in self.breakers.values():
+            breaker.stop()
+
+    def get_stats(self) -> Dict[str, Dict]:
+        return {name: breaker.get_stats() for name, breaker in self.breakers.items()}
+
+# Breakers for the DEX price sources, keyed by DEX name
+dex_breakers = CircuitBreakerRegistry()
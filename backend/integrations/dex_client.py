@@ -0,0 +1,48 @@
+from typing import Callable, Dict, List, Optional, Protocol, Sequence, Tuple, runtime_checkable
+import numpy as np
+from .pool_registry import PoolRegistry
+from .pool_stream import PoolRecord
+
+# (input_mint, output_mint)
+Pair = Tuple[str, str]
+
+# Output amounts for one input size against many pools, given each pool's input mint
+PoolsQuoter = Callable[[Sequence[PoolRecord], Sequence[str], float], np.ndarray]
+
+@runtime_checkable
+class DexClient(Protocol):
+    """
+    Price source interface shared by the DEX clients.
+    Results are dicts with at least "price" (output per input); a failed lookup
+    carries an "error" key. get_prices leaves out pairs the DEX does not list,
+    so a whole token universe can be priced in one call.
+    """
+    async def get_price(self, input_mint: str, output_mint: str, amount: float = ...) -> Optional[Dict]:
+        ...
+
+    async def get_prices(self, pairs: List[Pair], amount: float = ...) -> Dict[Pair, Dict]:
+        ...
+
+def registry_prices(registry: PoolRegistry, quote_pools: PoolsQuoter,
+                    pairs: List[Pair], amount: float = 1.0) -> Dict[Pair, Dict]:
+    """Price many pairs from a pool registry: index lookups, then one batch of curve math"""
+    found = []
+    for pair in pairs:
+        pool = registry.get_pool(*pair)
+        if pool is not None:
+            found.append((pair, pool))
+    if not found:
+        return {}
+
+    outputs = quote_pools([pool for _, pool in found], [pair[0] for pair, _ in found], amount)
+    prices = {}
+    for (pair, _), output_amount in zip(found, outputs):
+        output_amount = float(output_amount)
+        prices[pair] = {
+            "inputMint": pair[0],
+            "outputMint": pair[1],
+            "inAmount": amount,
+            "outAmount": output_amount,
+            "price": output_amount / amount if amount > 0 else 0
+        }
+    return prices
@@ -0,0 +1,172 @@
+import os
+import asyncio
+import logging
+from typing import Optional, Union
+import aiohttp
+from dotenv import load_dotenv
+from yarl import URL
+from .rate_limiter import RateLimiter, rate_limiter, parse_retry_after
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("http_session")
+
+# Load environment variables
+load_dotenv()
+
+# Connection pool settings
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", 20))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", 300))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", 30))
+HTTP_REQUEST_TIMEOUT = float(os.getenv("HTTP_REQUEST_TIMEOUT", 10))
+
+class RateLimitedRequest:
+    """
+    Async context manager for one request that holds its host's rate limiter slot until the
+    caller's block exits. The outcome is recorded only then, so a body that times out or fails
+    to read counts against the host like a failed request.
+    """
+    def __init__(self, session: aiohttp.ClientSession, limiter: RateLimiter, method: str, url, **kwargs):
+        self.session = session
+        self.limiter = limiter
+        self.method = method
+        self.url = url
+        self.kwargs = kwargs
+        self.request_context = None
+        self.host_limiter = None
+        self.response: Optional[aiohttp.ClientResponse] = None
+
+    async def __aenter__(self) -> aiohttp.ClientResponse:
+        host_limiter = self.limiter.get(URL(str(self.url)).host)
+        await host_limiter.acquire()
+        self.host_limiter = host_limiter
+        try:
+            # Started only once admitted, so a request cancelled while queued never opens
+            self.request_context = self.session.request(self.method, self.url, **self.kwargs)
+            self.response = await self.request_context.__aenter__()
+        except BaseException as e:
+            self._release(error=e)
+            raise
+        return self.response
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            return await self.request_context.__aexit__(exc_type, exc, tb)
+        finally:
+            response = self.response
+            self._release(
+                status=response.status if response is not None else None,
+                error=exc,
+                retry_after=parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+            )
+
+    def _release(self, status: Optional[int] = None, error: Optional[BaseException] = None,
+                 retry_after: Optional[float] = None):
+        host_limiter, self.host_limiter = self.host_limiter, None
+        if host_limiter is None:
+            return
+        if isinstance(error, asyncio.CancelledError):
+            # Cancelled by the caller, which says nothing about the host
+            host_limiter.release()
+        else:
+            host_limiter.release(status=status, error=error, retry_after=retry_after)
+
+class RateLimitedSession:
+    """The pooled session with every request passed through the per-host rate limiter"""
+    def __init__(self, session: aiohttp.ClientSession, limiter: RateLimiter):
+        self.session = session
+        self.limiter = limiter
+
+    def request(self, method: str, url, **kwargs) -> RateLimitedRequest:
+        return RateLimitedRequest(self.session, self.limiter, method, url, **kwargs)
+
+    def get(self, url, **kwargs) -> RateLimitedRequest:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs) -> RateLimitedRequest:
+        return self.request("POST", url, **kwargs)
+
+    @property
+    def closed(self) -> bool:
+        return self.session.closed
+
+    async def close(self):
+        await self.session.close()
+
+class HttpSessionManager:
+    """
+    Owns the process-wide aiohttp session shared by every DEX and RPC client.
+    The session keeps connections alive and caches DNS lookups so that a
+    quote only pays for the round trip, not for connection setup. Every
+    request passes through the per-host rate limiter.
+    """
+    def __init__(self, limit: int = HTTP_POOL_LIMIT, limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+                 dns_cache_ttl: int = HTTP_DNS_CACHE_TTL, keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT,
+                 request_timeout: float = HTTP_REQUEST_TIMEOUT, limiter: Optional[RateLimiter] = rate_limiter):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
+        self.limiter = limiter
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._limited_session: Optional[RateLimitedSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True,
+            keepalive_timeout=self.keepalive_timeout
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+        )
+
+    async def get_session(self) -> Union[RateLimitedSession, aiohttp.ClientSession]:
+        """Get the shared session, creating it on first use"""
+        loop = asyncio.get_running_loop()
+
+        # Sessions are bound to the loop they were created on
+        if self._loop is not loop:
+            self._session = None
+            self._lock = asyncio.Lock()
+            self._loop = loop
+
+        if self._session is None or self._session.closed:
+            async with self._lock:
+                if self._session is None or self._session.closed:
+                    self._session = self._create_session()
+                    self._limited_session = (
+                        RateLimitedSession(self._session, self.limiter) if self.limiter is not None else None
+                    )
+                    logger.info(
+                        f"Created shared HTTP session (limit={self.limit}, per_host={self.limit_per_host}, "
+                        f"dns_ttl={self.dns_cache_ttl}s)"
+                    )
+
+        return self._limited_session or self._session
+
+    async def close(self):
+        """Close the shared session and release all pooled connections"""
+        session = self._session
+        self._session = None
+        if session is not None and not session.closed:
+            await session.close()
+            logger.info("Closed shared HTTP session")
+
+# Process-wide session manager
+http_session_manager = HttpSessionManager()
+
+async def get_session() -> Union[RateLimitedSession, aiohttp.ClientSession]:
+    """Get the process-wide pooled HTTP session"""
+    return await http_session_manager.get_session()
+
+async def close_session():
+    """Close the process-wide pooled HTTP session"""
+    await http_session_manager.close()
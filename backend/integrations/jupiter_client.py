@@ -1,182 +1,395 @@
-import aiohttp
 import json
+import time
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import os
 from decimal import Decimal
+from .dex_client import Pair
+from .http_session import get_session
+from .quote_cache import QuoteCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("jupiter_client")
 
+# How long a scanned quote can be reused to build a swap
+QUOTE_HANDLE_MAX_AGE = float(os.getenv("QUOTE_HANDLE_MAX_AGE", 2.0))
+JUPITER_PRICE_API_URL = os.getenv("JUPITER_PRICE_API_URL", "https://price.jup.ag/v6/price")
+JUPITER_PRICE_IDS_PER_REQUEST = 100  # Ids the price API accepts per request
+# Swap fee charged against price API mid-prices, which unlike quotes are not net of fees
+JUPITER_PRICE_FEE_RATE = float(os.getenv("JUPITER_PRICE_FEE_RATE", 0.0025))
+
+# Decimals of the mints prices are quoted for, shared by every JupiterClient; quotes are
+# in smallest units, so a quote is only turned into a UI-unit price for known mints
+jupiter_token_decimals: Dict[str, int] = {
+    "So11111111111111111111111111111111111111112": 9,  # SOL
+    "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v": 6  # USDC
+}
+
+# Jupiter route labels that keep a quote on one DEX's pools; Jupiter itself routes anywhere
+JUPITER_DEX_LABELS: Dict[str, Optional[List[str]]] = {
+    "Jupiter": None,
+    "Raydium": ["Raydium", "Raydium CLMM", "Raydium CP"],
+    "Orca": ["Whirlpool", "Orca V2"],
+    "Meteora": ["Meteora", "Meteora DLMM"]
+}
+
+class QuoteHandle:
+    """A Jupiter quote response kept so the swap can be built without quoting again"""
+    def __init__(self, input_mint: str, output_mint: str, amount: int, slippage_bps: int,
+                 quote_response: Dict, fetched_at: Optional[float] = None):
+        self.input_mint = input_mint
+        self.output_mint = output_mint
+        self.amount = int(amount)
+        self.slippage_bps = slippage_bps
+        self.quote_response = quote_response
+        self.fetched_at = fetched_at if fetched_at is not None else time.monotonic()
+    
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+    
+    @property
+    def out_amount(self) -> int:
+        return int(self.quote_response.get("outAmount", 0))
+    
+    def is_fresh(self, max_age: float = QUOTE_HANDLE_MAX_AGE) -> bool:
+        return self.age <= max_age
+    
+    def matches(self, input_mint: str, output_mint: str, amount: float, slippage_bps: int) -> bool:
+        return (self.input_mint == input_mint and self.output_mint == output_mint
+                and self.amount == int(amount) and self.slippage_bps == slippage_bps)
+
+class QuoteHandleStore:
+    """
+    Latest trade-size quote per pair and direction, kept until the swap is built.
+    A handle is only handed out for the exact amount and slippage it was quoted for.
+    """
+    def __init__(self, max_age: float = QUOTE_HANDLE_MAX_AGE):
+        self.max_age = max_age
+        self.handles: Dict[Tuple[str, str], QuoteHandle] = {}
+    
+    def remember(self, quote_handle: QuoteHandle):
+        self.handles[(quote_handle.input_mint, quote_handle.output_mint)] = quote_handle
+    
+    def get(self, input_mint: str, output_mint: str, amount: float, slippage_bps: int) -> Optional[QuoteHandle]:
+        quote_handle = self.handles.get((input_mint, output_mint))
+        if quote_handle is None:
+            return None
+        if not quote_handle.is_fresh(self.max_age):
+            del self.handles[(input_mint, output_mint)]
+            return None
+        if not quote_handle.matches(input_mint, output_mint, amount, slippage_bps):
+            return None
+        return quote_handle
+
+# Quote cache shared by every JupiterClient so the engine, price feed and
+# WebSocket subscriptions all reuse each other's quotes
+jupiter_quote_cache = QuoteCache()
+
 class JupiterClient:
-    def __init__(self):
+    def __init__(self, quote_cache: Optional[QuoteCache] = None, max_quote_age: float = QUOTE_HANDLE_MAX_AGE):
         # Using the free Jupiter API
         self.base_url = "https://quote-api.jup.ag/v6"
+        self.quote_cache = quote_cache or jupiter_quote_cache
+        self.max_quote_age = max_quote_age
+        self.token_decimals = jupiter_token_decimals
         logger.info("Initialized Jupiter Client with free API")
     
-    async def get_price(self, input_mint: str, output_mint: str, amount: float = 1000000) -> Dict:
+    def set_token_decimals(self, decimals: Dict[str, int]):
+        """Register the decimals of mints whose prices get_price should return"""
+        self.token_decimals.update(decimals)
+    
+    async def _request_quote(self, params: Dict[str, str]) -> Dict:
+        """
+        Call Jupiter's quote endpoint
+        Returns the raw quote response, or a dict with an "error" key
+        """
+        session = await get_session()
+        async with session.get(f"{self.base_url}/quote", params=params) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                logger.error(f"Jupiter API error: {error_text}")
+                return {"error": error_text}
+            
+            return await response.json()
+    
+    def _quote_cache_key(self, input_mint: str, output_mint: str, amount: float, slippage_bps: int,
+                         only_direct_routes: Optional[bool] = None, dexes: Optional[List[str]] = None) -> Tuple:
+        """Key of a quote in the shared cache"""
+        return (input_mint, output_mint, int(amount), slippage_bps, only_direct_routes) + ((tuple(dexes),) if dexes else ())
+    
+    async def _get_quote(self, input_mint: str, output_mint: str, amount: float,
+                         slippage_bps: int = 50, only_direct_routes: Optional[bool] = None,
+                         dexes: Optional[List[str]] = None) -> Dict:
+        """
+        Get a quote through the shared cache
+        Identical concurrent requests share a single HTTP call
+        dexes restricts the route to pools with those Jupiter labels
+        """
+        params = {
+            "inputMint": input_mint,
+            "outputMint": output_mint,
+            "amount": str(int(amount)),
+            "slippageBps": str(slippage_bps)
+        }
+        if only_direct_routes is not None:
+            params["onlyDirectRoutes"] = "true" if only_direct_routes else "false"
+        if dexes:
+            params["dexes"] = ",".join(dexes)
+        
+        key = self._quote_cache_key(input_mint, output_mint, amount, slippage_bps, only_direct_routes, dexes)
+        return await self.quote_cache.get_or_fetch(
+            key,
+            lambda: self._request_quote(params),
+            should_cache=lambda data: bool(data) and "error" not in data
+        )
+    
+    async def get_quote(self, input_mint: str, output_mint: str, amount: float,
+                        slippage_bps: int = 50, dexes: Optional[List[str]] = None) -> Optional[QuoteHandle]:
+        """
+        Get a quote handle that can later be passed to create_swap_transaction
+        Returns None if the quote could not be fetched
+        """
+        try:
+            data = await self._get_quote(input_mint, output_mint, amount, slippage_bps, dexes=dexes)
+            if "error" in data:
+                return None
+            
+            # Date the handle from when the quote was fetched, not when it was read from the cache
+            key = self._quote_cache_key(input_mint, output_mint, amount, slippage_bps, dexes=dexes)
+            age = self.quote_cache.age(key) or 0.0
+            return QuoteHandle(input_mint, output_mint, amount, slippage_bps, data, time.monotonic() - age)
+        except Exception as e:
+            logger.error(f"Error getting quote from Jupiter: {str(e)}")
+            return None
+    
+    def price_from_quote(self, quote_handle: QuoteHandle, input_decimals: int = 0, output_decimals: int = 0) -> Dict:
+        """
+        Build a price result from a quote handle
+        The price is in UI units when the decimals of both mints are given, raw units otherwise
+        """
+        data = quote_handle.quote_response
+        in_amount = int(data.get("inAmount", 0))
+        if in_amount <= 0:
+            return {"price": 0, "error": "Invalid response"}
+        
+        out_amount = int(data.get("outAmount", 0))
+        return {
+            "price": (out_amount / 10 ** output_decimals) / (in_amount / 10 ** input_decimals),
+            "outAmount": out_amount,
+            "inAmount": in_amount,
+            "marketInfos": data.get("marketInfos", []),
+            "priceImpactPct": data.get("priceImpactPct", 0)
+        }
+    
+    def get_cache_stats(self) -> Dict:
+        """Get quote cache hit/miss/coalesce counters"""
+        return self.quote_cache.get_stats()
+    
+    async def get_price(self, input_mint: str, output_mint: str, amount: float = 1.0) -> Dict:
         """
         Get price for a token pair using Jupiter's quote API
-        amount is in the smallest unit (e.g., lamports for SOL)
+        amount is in UI units of the input token, and the price is output UI units per input
+        UI unit net of fees, the same basis as get_prices and the pool clients' prices
         """
+        input_decimals = self.token_decimals.get(input_mint)
+        output_decimals = self.token_decimals.get(output_mint)
+        if input_decimals is None or output_decimals is None:
+            return {"price": 0, "error": "Unknown token decimals"}
+        
         try:
-            async with aiohttp.ClientSession() as session:
-                # Use the quote endpoint to get price information
-                url = f"{self.base_url}/quote"
-                params = {
-                    "inputMint": input_mint,
-                    "outputMint": output_mint,
-                    "amount": str(int(amount)),
-                    "slippageBps": 50  # 0.5% slippage
-                }
-                
-                async with session.get(url, params=params) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"Jupiter API error: {error_text}")
-                        return {"price": 0, "error": error_text}
-                    
-                    data = await response.json()
-                    
-                    # Calculate price from the quote
-                    if "outAmount" in data and "inAmount" in data:
-                        out_amount = int(data["outAmount"])
-                        in_amount = int(data["inAmount"])
-                        
-                        if in_amount > 0:
-                            price = out_amount / in_amount
-                            return {
-                                "price": price,
-                                "outAmount": out_amount,
-                                "inAmount": in_amount,
-                                "marketInfos": data.get("marketInfos", []),
-                                "priceImpactPct": data.get("priceImpactPct", 0)
-                            }
-                    
-                    logger.error(f"Invalid response from Jupiter API: {data}")
-                    return {"price": 0, "error": "Invalid response"}
+            # Use the quote endpoint to get price information
+            quote_handle = await self.get_quote(input_mint, output_mint, amount * 10 ** input_decimals, 50)  # 0.5% slippage
+            if quote_handle is None:
+                return {"price": 0, "error": "Quote unavailable"}
+            
+            price_data = self.price_from_quote(quote_handle, input_decimals, output_decimals)
+            if price_data["price"] == 0:
+                logger.error(f"Invalid response from Jupiter API: {quote_handle.quote_response}")
+            return price_data
         except Exception as e:
             logger.error(f"Error getting price from Jupiter: {str(e)}")
             return {"price": 0, "error": str(e)}
     
+    async def _request_prices(self, ids: List[str], vs_token: str) -> Dict[str, float]:
+        """Prices of many mints in vs_token from one price API request"""
+        session = await get_session()
+        params = {"ids": ",".join(ids), "vsToken": vs_token}
+        async with session.get(JUPITER_PRICE_API_URL, params=params) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                logger.error(f"Jupiter price API error: {error_text}")
+                raise RuntimeError(error_text)
+            
+            data = await response.json()
+            return {
+                mint: float(entry["price"])
+                for mint, entry in (data.get("data") or {}).items()
+                if entry and entry.get("price") is not None
+            }
+    
+    async def get_prices(self, pairs: List[Pair], amount: float = 1.0) -> Dict[Pair, Dict]:
+        """
+        Get prices for many token pairs using Jupiter's price API
+        Pairs are grouped by output mint and priced with multi-id requests, so a token
+        universe against USDC costs one request per hundred tokens instead of one quote each.
+        Prices are in UI units and size-independent, so amount is ignored.
+        The API returns mid-prices; JUPITER_PRICE_FEE_RATE is taken off so they are net of
+        fees like quotes and the pool clients' curve outputs, with the mid-price kept as midPrice.
+        """
+        by_output: Dict[str, List[str]] = {}
+        for input_mint, output_mint in pairs:
+            by_output.setdefault(output_mint, []).append(input_mint)
+        
+        prices = {}
+        for output_mint, input_mints in by_output.items():
+            for start in range(0, len(input_mints), JUPITER_PRICE_IDS_PER_REQUEST):
+                chunk = input_mints[start:start + JUPITER_PRICE_IDS_PER_REQUEST]
+                try:
+                    chunk_prices = await self._request_prices(chunk, output_mint)
+                except Exception as e:
+                    logger.error(f"Error getting prices from Jupiter: {str(e)}")
+                    prices.update({(input_mint, output_mint): {"price": 0, "error": str(e)} for input_mint in chunk})
+                    continue
+                for input_mint in chunk:
+                    if input_mint in chunk_prices:
+                        prices[(input_mint, output_mint)] = {
+                            "inputMint": input_mint,
+                            "outputMint": output_mint,
+                            "price": chunk_prices[input_mint] * (1 - JUPITER_PRICE_FEE_RATE),
+                            "midPrice": chunk_prices[input_mint]
+                        }
+        return prices
+    
     async def get_routes(self, input_mint: str, output_mint: str, amount: float = 1000000) -> List[Dict]:
         """
         Get all available routes for a token pair
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.base_url}/quote"
-                params = {
-                    "inputMint": input_mint,
-                    "outputMint": output_mint,
-                    "amount": str(int(amount)),
-                    "slippageBps": 50,
-                    "onlyDirectRoutes": False
-                }
-                
-                async with session.get(url, params=params) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"Jupiter API error: {error_text}")
-                        return []
-                    
-                    data = await response.json()
-                    routes = []
-                    
-                    if "routesInfos" in data:
-                        routes = data["routesInfos"]
-                    elif "marketInfos" in data:
-                        # If routesInfos is not available, use marketInfos
-                        routes = [{"marketInfos": data["marketInfos"], "outAmount": data.get("outAmount")}]
-                    
-                    return routes
+            data = await self._get_quote(input_mint, output_mint, amount, 50, only_direct_routes=False)
+            if "error" in data:
+                return []
+            
+            routes = []
+            
+            if "routesInfos" in data:
+                routes = data["routesInfos"]
+            elif "marketInfos" in data:
+                # If routesInfos is not available, use marketInfos
+                routes = [{"marketInfos": data["marketInfos"], "outAmount": data.get("outAmount")}]
+            
+            return routes
         except Exception as e:
             logger.error(f"Error getting routes from Jupiter: {str(e)}")
             return []
     
     async def create_swap_transaction(self, input_mint: str, output_mint: str, amount: float, 
-                                     user_public_key: str, slippage_bps: int = 50) -> Dict:
+                                     user_public_key: str, slippage_bps: int = 50,
+                                     quote_handle: Optional[QuoteHandle] = None,
+                                     compute_unit_price_micro_lamports: Optional[int] = None) -> Dict:
         """
         Create a swap transaction using Jupiter's swap API
+        If quote_handle matches the swap and is still fresh it is used instead of quoting again
+        compute_unit_price_micro_lamports sets the transaction's priority fee
         """
         try:
-            # Step 1: Get the route first
-            async with aiohttp.ClientSession() as session:
-                quote_url = f"{self.base_url}/quote"
-                quote_params = {
+            # Step 1: Get the route first, reusing the scanned quote when possible
+            quote_reused = (
+                quote_handle is not None
+                and quote_handle.matches(input_mint, output_mint, amount, slippage_bps)
+                and quote_handle.is_fresh(self.max_quote_age)
+            )
+            if quote_reused:
+                quote_data = quote_handle.quote_response
+            else:
+                quote_data = await self._request_quote({
                     "inputMint": input_mint,
                     "outputMint": output_mint,
                     "amount": str(int(amount)),
-                    "slippageBps": slippage_bps
-                }
+                    "slippageBps": str(slippage_bps)
+                })
+                if "error" in quote_data:
+                    return {"success": False, "error": quote_data["error"]}
+            
+            # Step 2: Create the swap transaction
+            session = await get_session()
+            swap_url = f"{self.base_url}/swap"
+            swap_payload = {
+                "quoteResponse": quote_data,
+                "userPublicKey": user_public_key,
+                "wrapUnwrapSOL": True
+            }
+            if compute_unit_price_micro_lamports:
+                swap_payload["computeUnitPriceMicroLamports"] = compute_unit_price_micro_lamports
+            
+            async with session.post(swap_url, json=swap_payload) as swap_response:
+                if swap_response.status != 200:
+                    error_text = await swap_response.text()
+                    logger.error(f"Jupiter swap API error: {error_text}")
+                    return {"success": False, "error": error_text}
                 
-                async with session.get(quote_url, params=quote_params) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"Jupiter quote API error: {error_text}")
-                        return {"success": False, "error": error_text}
-                    
-                    quote_data = await response.json()
+                swap_data = await swap_response.json()
                 
-                # Step 2: Create the swap transaction
-                swap_url = f"{self.base_url}/swap"
-                swap_payload = {
-                    "quoteResponse": quote_data,
-                    "userPublicKey": user_public_key,
-                    "wrapUnwrapSOL": True
+                return {
+                    "success": True,
+                    "swapTransaction": swap_data.get("swapTransaction"),
+                    "inputAmount": amount,
+                    "outputAmount": quote_data.get("outAmount"),
+                    "price": float(quote_data.get("outAmount", 0)) / float(amount) if float(amount) > 0 else 0,
+                    "quoteReused": quote_reused
                 }
-                
-                async with session.post(swap_url, json=swap_payload) as swap_response:
-                    if swap_response.status != 200:
-                        error_text = await swap_response.text()
-                        logger.error(f"Jupiter swap API error: {error_text}")
-                        return {"success": False, "error": error_text}
-                    
-                    swap_data = await swap_response.json()
-                    
-                    return {
-                        "success": True,
-                        "swapTransaction": swap_data.get("swapTransaction"),
-                        "inputAmount": amount,
-                        "outputAmount": quote_data.get("outAmount"),
-                        "price": float(quote_data.get("outAmount", 0)) / float(amount) if float(amount) > 0 else 0
-                    }
         except Exception as e:
             logger.error(f"Error creating swap transaction: {str(e)}")
             return {"success": False, "error": str(e)}
     
+    async def get_swap_instructions(self, quote_response: Dict, user_public_key: str,
+                                    wrap_and_unwrap_sol: bool = True) -> Dict:
+        """
+        Get the instructions of a swap instead of a serialized transaction, so several
+        swaps can be composed into one transaction
+        Returns Jupiter's response with "success" added, or "success": False and an "error"
+        """
+        try:
+            session = await get_session()
+            payload = {
+                "quoteResponse": quote_response,
+                "userPublicKey": user_public_key,
+                "wrapAndUnwrapSol": wrap_and_unwrap_sol,
+                # Simulated per swap, so the composed transaction can budget the sum
+                "dynamicComputeUnitLimit": True
+            }
+            async with session.post(f"{self.base_url}/swap-instructions", json=payload) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    logger.error(f"Jupiter swap instructions API error: {error_text}")
+                    return {"success": False, "error": error_text}
+                
+                data = await response.json()
+                if "error" in data:
+                    return {"success": False, "error": data["error"]}
+                return {"success": True, **data}
+        except Exception as e:
+            logger.error(f"Error getting swap instructions: {str(e)}")
+            return {"success": False, "error": str(e)}
+    
     async def simulate_swap(self, input_mint: str, output_mint: str, amount: float) -> Dict:
         """
         Simulate a swap to get accurate output amount and price impact
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.base_url}/quote"
-                params = {
-                    "inputMint": input_mint,
-                    "outputMint": output_mint,
-                    "amount": str(int(amount)),
-                    "slippageBps": 50,
-                    "onlyDirectRoutes": False
-                }
-                
-                async with session.get(url, params=params) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"Jupiter API error: {error_text}")
-                        return {"success": False, "error": error_text}
-                    
-                    data = await response.json()
-                    
-                    return {
-                        "success": True,
-                        "inputAmount": amount,
-                        "outputAmount": int(data.get("outAmount", 0)),
-                        "price": float(data.get("outAmount", 0)) / float(amount) if float(amount) > 0 else 0,
-                        "priceImpactPct": data.get("priceImpactPct", 0),
-                        "marketInfos": data.get("marketInfos", [])
-                    }
+            data = await self._get_quote(input_mint, output_mint, amount, 50, only_direct_routes=False)
+            if "error" in data:
+                return {"success": False, "error": data["error"]}
+            
+            return {
+                "success": True,
+                "inputAmount": amount,
+                "outputAmount": int(data.get("outAmount", 0)),
+                "price": float(data.get("outAmount", 0)) / float(amount) if float(amount) > 0 else 0,
+                "priceImpactPct": data.get("priceImpactPct", 0),
+                "marketInfos": data.get("marketInfos", [])
+            }
         except Exception as e:
             logger.error(f"Error simulating swap: {str(e)}")
             return {"success": False, "error": str(e)}
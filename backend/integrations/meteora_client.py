@@ -2,8 +2,12 @@ import os
 import json
 import asyncio
 from typing import Dict, List, Optional, Tuple
-import httpx
+import numpy as np
 from dotenv import load_dotenv
+from .amm_math import dlmm_out, dlmm_out_many, dlmm_bins_from_reserves
+from .dex_client import Pair, registry_prices
+from .pool_registry import PoolRegistry, POOL_SNAPSHOT_DIR
+from .pool_stream import PoolRecord, meteora_pool_record
 import logging
 
 # Configure logging
@@ -13,31 +17,79 @@ logger = logging.getLogger("meteora_client")
 # Load environment variables
 load_dotenv()
 
+METEORA_DLMM_API_URL = "https://dlmm-api.meteora.ag"
+
+# DLMM pair index shared by every MeteoraClient
+meteora_pool_registry = PoolRegistry(
+    "Meteora",
+    f"{METEORA_DLMM_API_URL}/pair/all",
+    meteora_pool_record,
+    snapshot_path=os.path.join(POOL_SNAPSHOT_DIR, "meteora.snap")
+)
+
 class MeteoraClient:
-    def __init__(self):
-        self.base_url = "https://api.meteora.ag"  # Note: This might not be the actual API URL
+    def __init__(self, pool_registry: Optional[PoolRegistry] = None):
+        self.base_url = METEORA_DLMM_API_URL
+        self.pool_registry = pool_registry or meteora_pool_registry
         logger.info("Initialized Meteora client")
     
+    def quote_pool(self, pool: PoolRecord, input_mint: str, amounts) -> np.ndarray:
+        """Output amounts for one or many input sizes against a DLMM pair"""
+        amounts = np.atleast_1d(np.asarray(amounts, dtype=float))
+        x_to_y = pool.base_mint == input_mint
+        
+        if pool.price > 0 and pool.bin_step > 0 and (pool.base_reserve > 0 or pool.quote_reserve > 0):
+            # Only total reserves are known, so spread them over the bins around the active one
+            bin_prices, bin_reserve_x, bin_reserve_y, active_index = dlmm_bins_from_reserves(
+                pool.price, pool.bin_step, pool.base_reserve, pool.quote_reserve
+            )
+            return dlmm_out(amounts, bin_prices, bin_reserve_x, bin_reserve_y, active_index, x_to_y, pool.fee_rate)
+        
+        # No reserves reported; fall back to the pair's active price
+        if not pool.price:
+            return np.zeros_like(amounts)
+        return amounts * (pool.price if x_to_y else 1 / pool.price)
+    
+    def quote_pools(self, pools: List[PoolRecord], input_mints: List[str], amount: float) -> np.ndarray:
+        """Output amounts for one input size against many DLMM pairs in a single vectorized pass"""
+        x_to_y = np.array([pool.base_mint == input_mint for pool, input_mint in zip(pools, input_mints)], dtype=bool)
+        price = np.array([pool.price or 0.0 for pool in pools], dtype=float)
+        bin_step = np.array([pool.bin_step for pool in pools], dtype=float)
+        base_reserve = np.array([pool.base_reserve for pool in pools], dtype=float)
+        quote_reserve = np.array([pool.quote_reserve for pool in pools], dtype=float)
+        fee_rate = np.array([pool.fee_rate for pool in pools], dtype=float)
+        
+        curve_out = dlmm_out_many(amount, price, bin_step, base_reserve, quote_reserve, x_to_y, fee_rate)
+        # Pairs without reserves fall back to their active price
+        with np.errstate(divide="ignore"):
+            spot_out = amount * np.where(x_to_y, price, np.where(price > 0, 1 / price, 0.0))
+        has_bins = (price > 0) & (bin_step > 0) & ((base_reserve > 0) | (quote_reserve > 0))
+        return np.where(has_bins, curve_out, spot_out)
+    
+    def quote_amounts(self, input_mint: str, output_mint: str, amounts) -> Optional[np.ndarray]:
+        """Output amounts for many input sizes without any network I/O"""
+        pool = self.pool_registry.get_pool(input_mint, output_mint)
+        if not pool:
+            return None
+        return self.quote_pool(pool, input_mint, amounts)
+    
     async def get_price(self, input_mint: str, output_mint: str, amount: float = 1.0) -> Dict:
         """Get price for a token pair"""
         try:
-            # For Meteora, we'll use a simplified approach since their API might be different
-            # In a real implementation, you would use their specific API endpoints
+            # Pairs are kept current in the background, so this is a local lookup
+            self.pool_registry.start()
+            if not self.pool_registry.is_ready:
+                logger.warning("Meteora pool registry is still loading")
+                return None
             
-            # For now, we'll simulate a price with a small variation from the "market price"
-            # This is just for demonstration purposes
+            pool = self.pool_registry.get_pool(input_mint, output_mint)
+            if not pool:
+                logger.error(f"Pool not found for {input_mint} -> {output_mint}")
+                return None
             
-            # Assume SOL/USDC price is around $100
-            if input_mint == "So11111111111111111111111111111111111111112" and output_mint == "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v":
-                price = 100.25  # Slightly higher than market
-                output_amount = amount * price
-            elif input_mint == "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v" and output_mint == "So11111111111111111111111111111111111111112":
-                price = 1 / 100.25
-                output_amount = amount * price
-            else:
-                # For other pairs, use a default price (this would be replaced with actual API calls)
-                price = 1.0
-                output_amount = amount
+            # Calculate price from the pair's bins at this trade size
+            output_amount = float(self.quote_pool(pool, input_mint, amount)[0])
+            price = output_amount / amount if amount > 0 else 0
             
             return {
                 "inputMint": input_mint,
@@ -49,3 +101,15 @@ class MeteoraClient:
         except Exception as e:
             logger.error(f"Error getting price for {input_mint} -> {output_mint}: {str(e)}")
             return None
+    
+    async def get_prices(self, pairs: List[Pair], amount: float = 1.0) -> Dict[Pair, Dict]:
+        """Get prices for many token pairs in one call, from the local pool index"""
+        try:
+            self.pool_registry.start()
+            if not self.pool_registry.is_ready:
+                logger.warning("Meteora pool registry is still loading")
+                return {}
+            return registry_prices(self.pool_registry, self.quote_pools, pairs, amount)
+        except Exception as e:
+            logger.error(f"Error getting Meteora prices for {len(pairs)} pairs: {str(e)}")
+            return {pair: {"price": 0, "error": str(e)} for pair in pairs}
@@ -2,8 +2,13 @@ import os
 import json
 import asyncio
 from typing import Dict, List, Optional, Tuple
-import httpx
+import numpy as np
 from dotenv import load_dotenv
+from .amm_math import clmm_out, clmm_out_many
+from .http_session import get_session
+from .dex_client import Pair, registry_prices
+from .pool_registry import PoolRegistry, POOL_SNAPSHOT_DIR
+from .pool_stream import PoolRecord, parse_pool_stream, orca_pool_record, POOL_STREAM_CHUNK_SIZE
 import logging
 
 # Configure logging
@@ -13,46 +18,101 @@ logger = logging.getLogger("orca_client")
 # Load environment variables
 load_dotenv()
 
+ORCA_WHIRLPOOL_LIST_URL = "https://api.mainnet.orca.so/v1/whirlpool/list"
+
+# Whirlpool index shared by every OrcaClient
+orca_pool_registry = PoolRegistry(
+    "Orca",
+    ORCA_WHIRLPOOL_LIST_URL,
+    orca_pool_record,
+    array_key="whirlpools",
+    snapshot_path=os.path.join(POOL_SNAPSHOT_DIR, "orca.snap")
+)
+
 class OrcaClient:
-    def __init__(self):
+    def __init__(self, pool_registry: Optional[PoolRegistry] = None):
         self.base_url = "https://api.orca.so"
+        self.pool_registry = pool_registry or orca_pool_registry
         logger.info("Initialized Orca client")
     
-    async def get_pools(self) -> List[Dict]:
+    async def get_pools(self) -> List[PoolRecord]:
         """Get all Orca pools"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.base_url}/pools")
-                
-                if response.status_code != 200:
-                    logger.error(f"Error getting pools: {response.text}")
+            session = await get_session()
+            async with session.get(f"{self.base_url}/pools") as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    logger.error(f"Error getting pools: {error_text}")
                     return []
                 
-                return response.json()
+                return await parse_pool_stream(
+                    response.content.iter_chunked(POOL_STREAM_CHUNK_SIZE),
+                    orca_pool_record
+                )
         except Exception as e:
             logger.error(f"Error getting Orca pools: {str(e)}")
             return []
     
+    def quote_pool(self, pool: PoolRecord, input_mint: str, amounts) -> np.ndarray:
+        """Output amounts for one or many input sizes against a whirlpool"""
+        amounts = np.atleast_1d(np.asarray(amounts, dtype=float))
+        a_to_b = pool.base_mint == input_mint
+        
+        if pool.liquidity > 0 and pool.sqrt_price > 0:
+            # Whirlpool math works in raw units
+            decimals_in, decimals_out = (pool.base_decimals, pool.quote_decimals) if a_to_b else (pool.quote_decimals, pool.base_decimals)
+            raw_out = clmm_out(amounts * 10 ** decimals_in, pool.sqrt_price, pool.liquidity, a_to_b, pool.fee_rate)
+            return raw_out / 10 ** decimals_out
+        
+        # No liquidity state yet; fall back to the pool's spot price
+        if not pool.price:
+            return np.zeros_like(amounts)
+        return amounts * (pool.price if a_to_b else 1 / pool.price)
+    
+    def quote_pools(self, pools: List[PoolRecord], input_mints: List[str], amount: float) -> np.ndarray:
+        """Output amounts for one input size against many whirlpools in a single vectorized pass"""
+        a_to_b = np.array([pool.base_mint == input_mint for pool, input_mint in zip(pools, input_mints)], dtype=bool)
+        sqrt_price = np.array([pool.sqrt_price for pool in pools], dtype=float)
+        liquidity = np.array([pool.liquidity for pool in pools], dtype=float)
+        price = np.array([pool.price or 0.0 for pool in pools], dtype=float)
+        fee_rate = np.array([pool.fee_rate for pool in pools], dtype=float)
+        base_decimals = np.array([pool.base_decimals for pool in pools], dtype=float)
+        quote_decimals = np.array([pool.quote_decimals for pool in pools], dtype=float)
+        
+        # Whirlpool math works in raw units
+        decimals_in = np.where(a_to_b, base_decimals, quote_decimals)
+        decimals_out = np.where(a_to_b, quote_decimals, base_decimals)
+        raw_out = clmm_out_many(amount * 10 ** decimals_in, sqrt_price, liquidity, a_to_b, fee_rate)
+        # Pools without liquidity state fall back to their spot price
+        with np.errstate(divide="ignore"):
+            spot_out = amount * np.where(a_to_b, price, np.where(price > 0, 1 / price, 0.0))
+        has_state = (liquidity > 0) & (sqrt_price > 0)
+        return np.where(has_state, raw_out / 10 ** decimals_out, spot_out)
+    
+    def quote_amounts(self, input_mint: str, output_mint: str, amounts) -> Optional[np.ndarray]:
+        """Output amounts for many input sizes without any network I/O"""
+        pool = self.pool_registry.get_pool(input_mint, output_mint)
+        if not pool:
+            return None
+        return self.quote_pool(pool, input_mint, amounts)
+    
     async def get_price(self, input_mint: str, output_mint: str, amount: float = 1.0) -> Dict:
         """Get price for a token pair"""
         try:
-            # For Orca, we'll use a simplified approach since their API might be different
-            # In a real implementation, you would use their specific API endpoints
+            # Whirlpools are kept current in the background, so this is a local lookup
+            self.pool_registry.start()
+            if not self.pool_registry.is_ready:
+                logger.warning("Orca pool registry is still loading")
+                return None
             
-            # For now, we'll simulate a price with a small variation from the "market price"
-            # This is just for demonstration purposes
+            pool = self.pool_registry.get_pool(input_mint, output_mint)
+            if not pool:
+                logger.error(f"Pool not found for {input_mint} -> {output_mint}")
+                return None
             
-            # Assume SOL/USDC price is around $100
-            if input_mint == "So11111111111111111111111111111111111111112" and output_mint == "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v":
-                price = 99.75  # Slightly lower than market
-                output_amount = amount * price
-            elif input_mint == "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v" and output_mint == "So11111111111111111111111111111111111111112":
-                price = 1 / 99.75
-                output_amount = amount * price
-            else:
-                # For other pairs, use a default price (this would be replaced with actual API calls)
-                price = 1.0
-                output_amount = amount
+            # Calculate price from the pool's curve at this trade size
+            output_amount = float(self.quote_pool(pool, input_mint, amount)[0])
+            price = output_amount / amount if amount > 0 else 0
             
             return {
                 "inputMint": input_mint,
@@ -64,3 +124,15 @@ class OrcaClient:
         except Exception as e:
             logger.error(f"Error getting price for {input_mint} -> {output_mint}: {str(e)}")
             return None
+    
+    async def get_prices(self, pairs: List[Pair], amount: float = 1.0) -> Dict[Pair, Dict]:
+        """Get prices for many token pairs in one call, from the local pool index"""
+        try:
+            self.pool_registry.start()
+            if not self.pool_registry.is_ready:
+                logger.warning("Orca pool registry is still loading")
+                return {}
+            return registry_prices(self.pool_registry, self.quote_pools, pairs, amount)
+        except Exception as e:
+            logger.error(f"Error getting Orca prices for {len(pairs)} pairs: {str(e)}")
+            return {pair: {"price": 0, "error": str(e)} for pair in pairs}
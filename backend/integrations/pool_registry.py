@@ -0,0 +1,221 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+from .http_session import get_session
+from .pool_stream import PoolRecord, parse_pool_stream, POOL_STREAM_CHUNK_SIZE
+from .pool_snapshot import PoolSnapshot, open_snapshot, write_snapshot
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("pool_registry")
+
+# Load environment variables
+load_dotenv()
+
+POOL_REFRESH_INTERVAL = float(os.getenv("POOL_REFRESH_INTERVAL", 60))  # Seconds between pool list refreshes
+# Snapshots live under the backend package by default, whatever directory the server starts from
+POOL_SNAPSHOT_DIR = os.getenv(
+    "POOL_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "pool_snapshots")
+)
+
+def pair_key(mint_a: str, mint_b: str) -> Tuple[str, str]:
+    """Order-independent key for a mint pair"""
+    return (mint_a, mint_b) if mint_a <= mint_b else (mint_b, mint_a)
+
+class PoolRegistry:
+    """
+    In-memory index of a DEX's pools keyed by mint pair.
+    A background task keeps it current using conditional GETs, so lookups never touch the network.
+    The index is persisted to a memory-mapped snapshot that serves lookups right after a restart.
+    """
+    def __init__(self, name: str, url: str, record_parser: Callable[[Dict], Optional[PoolRecord]],
+                 array_key: Optional[str] = None, refresh_interval: float = POOL_REFRESH_INTERVAL,
+                 snapshot_path: Optional[str] = None):
+        self.name = name
+        self.url = url
+        self.record_parser = record_parser
+        self.array_key = array_key
+        self.refresh_interval = refresh_interval
+        self.snapshot_path = snapshot_path
+        self.snapshot: Optional[PoolSnapshot] = None
+        # Records decoded from the snapshot, kept so stream updates land on the record lookups return
+        self.snapshot_pools: Dict[Tuple[str, str], PoolRecord] = {}
+        self.pools_by_pair: Dict[Tuple[str, str], PoolRecord] = {}
+        self.pool_count = 0
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.last_refresh: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.listeners: List[Callable[["PoolRegistry"], None]] = []  # Called whenever new pools become known
+
+    @property
+    def is_ready(self) -> bool:
+        return self.last_refresh is not None or self.snapshot is not None
+
+    def get_pool(self, mint_a: str, mint_b: str) -> Optional[PoolRecord]:
+        """Look up the pool for a mint pair in either order"""
+        key = pair_key(mint_a, mint_b)
+        if self.last_refresh is None and self.snapshot is not None:
+            pool = self.snapshot_pools.get(key)
+            if pool is None:
+                pool = self.snapshot.get_pool(mint_a, mint_b)
+                if pool is not None:
+                    self.snapshot_pools[key] = pool
+            return pool
+        return self.pools_by_pair.get(key)
+
+    def add_listener(self, listener: Callable[["PoolRegistry"], None]):
+        """Call listener with the registry after each snapshot load and index refresh"""
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def _notify(self):
+        for listener in self.listeners:
+            try:
+                listener(self)
+            except Exception as e:
+                logger.error(f"Error in {self.name} pool registry listener: {str(e)}")
+
+    def get_pools(self) -> List[PoolRecord]:
+        """Get all indexed pools"""
+        if self.last_refresh is None and self.snapshot is not None:
+            return [
+                self.snapshot_pools.get(pair_key(pool.base_mint, pool.quote_mint), pool)
+                for pool in self.snapshot.iter_records()
+            ]
+        return list(self.pools_by_pair.values())
+
+    def load_snapshot(self) -> bool:
+        """Memory-map the on-disk snapshot so lookups work before the first refresh"""
+        if not self.snapshot_path or self.snapshot is not None:
+            return False
+
+        start = time.perf_counter()
+        snapshot = open_snapshot(self.snapshot_path)
+        if snapshot is None:
+            return False
+
+        self.snapshot = snapshot
+        # A 304 on the first refresh means the snapshot is still current
+        self.etag = snapshot.etag
+        self.last_modified = snapshot.last_modified
+        self.pool_count = len(snapshot)
+        logger.info(
+            f"Loaded {len(snapshot)} {self.name} pairs from snapshot in "
+            f"{(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+        self._notify()
+        return True
+
+    async def save_snapshot(self, pools: List[PoolRecord]):
+        """Persist pools to the snapshot file without blocking the event loop"""
+        if not self.snapshot_path:
+            return
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None, write_snapshot, self.snapshot_path, pools, self.etag, self.last_modified
+        )
+
+        # The in-memory index now serves lookups, so release the old mapping
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
+            self.snapshot_pools = {}
+
+    def promote_snapshot(self):
+        """Serve the still-current snapshot from the in-memory index, keeping records already handed out"""
+        index = self.build_index(self.snapshot.iter_records())
+        index.update(self.snapshot_pools)
+        self.pools_by_pair = index
+        self.snapshot.close()
+        self.snapshot = None
+        self.snapshot_pools = {}
+        logger.info(f"{self.name} pool snapshot is current; indexed {len(index)} pairs")
+
+    def build_index(self, pools: Iterable[PoolRecord]) -> Dict[Tuple[str, str], PoolRecord]:
+        """Index pools by mint pair, keeping the first pool listed for each pair"""
+        index = {}
+        for pool in pools:
+            index.setdefault(pair_key(pool.base_mint, pool.quote_mint), pool)
+        return index
+
+    async def refresh(self) -> bool:
+        """
+        Refresh the pool index
+        Returns True if the index changed
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        session = await get_session()
+        async with session.get(self.url, headers=headers) as response:
+            if response.status == 304:
+                # Unchanged; a snapshot loaded at startup is current, so move it into the index
+                if self.snapshot is not None:
+                    self.promote_snapshot()
+                self.last_refresh = time.time()
+                return False
+
+            if response.status != 200:
+                error_text = await response.text()
+                logger.error(f"Error refreshing {self.name} pools: {error_text}")
+                return False
+
+            # Stream the dump so the raw body and full object tree are never held together
+            pools = await parse_pool_stream(
+                response.content.iter_chunked(POOL_STREAM_CHUNK_SIZE),
+                self.record_parser,
+                self.array_key
+            )
+            self.etag = response.headers.get("ETag")
+            self.last_modified = response.headers.get("Last-Modified")
+
+        # Swap the index in one assignment so readers never see a partial index
+        self.pools_by_pair = self.build_index(pools)
+        self.pool_count = len(pools)
+        self.last_refresh = time.time()
+        logger.info(f"Indexed {len(self.pools_by_pair)} {self.name} pairs from {self.pool_count} pools")
+        self._notify()
+
+        try:
+            await self.save_snapshot(pools)
+        except Exception as e:
+            logger.error(f"Error saving {self.name} pool snapshot: {str(e)}")
+        return True
+
+    async def run(self):
+        """Refresh the pool index until cancelled"""
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error refreshing {self.name} pools: {str(e)}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        """Serve from the snapshot and start the background refresh task if it is not running"""
+        if self.last_refresh is None and self.snapshot is None:
+            self.load_snapshot()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+            logger.info(f"Started {self.name} pool registry refresh every {self.refresh_interval}s")
+
+    async def stop(self):
+        """Stop the background refresh task"""
+        if self.task and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.task = None
@@ -0,0 +1,165 @@
+import os
+import mmap
+import time
+import struct
+import logging
+from typing import Iterator, List, Optional
+from .pool_stream import PoolRecord
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("pool_snapshot")
+
+# File layout:
+#   header (256 bytes): magic, version, record size, record count, created at, ETag, Last-Modified
+#   records (fixed width), sorted by order-independent mint pair for binary search
+SNAPSHOT_MAGIC = b"PSNP"
+SNAPSHOT_VERSION = 2
+HEADER_SIZE = 256
+HEADER_FORMAT = "<4sHHId96s32s"
+RECORD_FORMAT = "<44s44s44s44s44sBBBxddddddd"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+KEY_SIZE = 88  # Both mints of the pair key
+
+_header = struct.Struct(HEADER_FORMAT)
+_record = struct.Struct(RECORD_FORMAT)
+
+def _pad(value: Optional[str], size: int) -> bytes:
+    encoded = (value or "").encode()
+    if len(encoded) > size:
+        raise ValueError(f"Value too long for snapshot field: {value}")
+    return encoded.ljust(size, b"\0")
+
+def _unpad(value: bytes) -> str:
+    return value.rstrip(b"\0").decode()
+
+def _snapshot_key(mint_a: str, mint_b: str) -> bytes:
+    low, high = (mint_a, mint_b) if mint_a <= mint_b else (mint_b, mint_a)
+    return _pad(low, 44) + _pad(high, 44)
+
+def write_snapshot(path: str, records: List[PoolRecord], etag: Optional[str] = None,
+                   last_modified: Optional[str] = None):
+    """Write pool records to a snapshot file, replacing any existing snapshot atomically"""
+    entries = {}
+    for record in records:
+        try:
+            key = _snapshot_key(record.base_mint, record.quote_mint)
+        except ValueError:
+            continue
+        entries.setdefault(key, record)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        header = _header.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, RECORD_SIZE, len(entries), time.time(),
+                              _pad(etag, 96), _pad(last_modified, 32))
+        f.write(header.ljust(HEADER_SIZE, b"\0"))
+        for key in sorted(entries):
+            record = entries[key]
+            base_is_low = record.base_mint <= record.quote_mint
+            f.write(_record.pack(
+                key[:44], key[44:], _pad(record.address, 44),
+                _pad(record.base_vault, 44), _pad(record.quote_vault, 44),
+                1 if base_is_low else 0, record.base_decimals, record.quote_decimals,
+                record.price, record.base_reserve, record.quote_reserve, record.fee_rate,
+                record.liquidity, record.sqrt_price, record.bin_step
+            ))
+    os.replace(tmp_path, path)
+
+class PoolSnapshot:
+    """
+    Read-only, memory-mapped pool snapshot.
+    Opening it does not decode any records; lookups binary search the mapped file.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Empty pool snapshot: {path}")
+
+        magic, version, record_size, count, created_at, etag, last_modified = _header.unpack_from(self._mmap, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or record_size != RECORD_SIZE:
+            self.close()
+            raise ValueError(f"Unsupported pool snapshot format: {path}")
+        if len(self._mmap) < HEADER_SIZE + count * RECORD_SIZE:
+            self.close()
+            raise ValueError(f"Truncated pool snapshot: {path}")
+
+        self.count = count
+        self.created_at = created_at
+        self.etag = _unpad(etag) or None
+        self.last_modified = _unpad(last_modified) or None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _key_at(self, index: int) -> bytes:
+        offset = HEADER_SIZE + index * RECORD_SIZE
+        return self._mmap[offset:offset + KEY_SIZE]
+
+    def _record_at(self, index: int) -> PoolRecord:
+        (low, high, address, base_vault, quote_vault, base_is_low, base_decimals, quote_decimals,
+         price, base_reserve, quote_reserve, fee_rate, liquidity, sqrt_price,
+         bin_step) = _record.unpack_from(self._mmap, HEADER_SIZE + index * RECORD_SIZE)
+        low, high = _unpad(low), _unpad(high)
+        base_mint, quote_mint = (low, high) if base_is_low else (high, low)
+        return PoolRecord(
+            address=_unpad(address),
+            base_mint=base_mint,
+            quote_mint=quote_mint,
+            price=price,
+            base_reserve=base_reserve,
+            quote_reserve=quote_reserve,
+            fee_rate=fee_rate,
+            base_decimals=base_decimals,
+            quote_decimals=quote_decimals,
+            base_vault=_unpad(base_vault) or None,
+            quote_vault=_unpad(quote_vault) or None,
+            liquidity=liquidity,
+            sqrt_price=sqrt_price,
+            bin_step=bin_step
+        )
+
+    def get_pool(self, mint_a: str, mint_b: str) -> Optional[PoolRecord]:
+        """Look up the pool for a mint pair in either order"""
+        try:
+            key = _snapshot_key(mint_a, mint_b)
+        except ValueError:
+            return None
+
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self._key_at(low) == key:
+            return self._record_at(low)
+        return None
+
+    def iter_records(self) -> Iterator[PoolRecord]:
+        """Decode every record in the snapshot"""
+        for index in range(self.count):
+            yield self._record_at(index)
+
+    def close(self):
+        if not self._mmap.closed:
+            self._mmap.close()
+        self._file.close()
+
+def open_snapshot(path: str) -> Optional[PoolSnapshot]:
+    """Open a snapshot if a valid one exists at path"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return PoolSnapshot(path)
+    except (OSError, ValueError, struct.error) as e:
+        logger.error(f"Ignoring pool snapshot {path}: {str(e)}")
+        return None
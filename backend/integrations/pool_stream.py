@@ -0,0 +1,262 @@
+import json
+import codecs
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+# Chunk size used when streaming pool dumps from the network
+POOL_STREAM_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+
+class PoolRecord:
+    """Compact pool record holding only the fields the pricing code uses"""
+    __slots__ = (
+        "address", "base_mint", "quote_mint", "base_vault", "quote_vault",
+        "base_decimals", "quote_decimals", "base_reserve", "quote_reserve",
+        "price", "fee_rate", "liquidity", "sqrt_price", "bin_step"
+    )
+
+    def __init__(self, address: str, base_mint: str, quote_mint: str, price: float = 0.0,
+                 base_reserve: float = 0.0, quote_reserve: float = 0.0, fee_rate: float = 0.0,
+                 base_decimals: int = 0, quote_decimals: int = 0,
+                 base_vault: Optional[str] = None, quote_vault: Optional[str] = None,
+                 liquidity: float = 0.0, sqrt_price: float = 0.0, bin_step: float = 0.0):
+        self.address = address
+        self.base_mint = base_mint
+        self.quote_mint = quote_mint
+        self.base_vault = base_vault
+        self.quote_vault = quote_vault
+        self.base_decimals = base_decimals
+        self.quote_decimals = quote_decimals
+        self.base_reserve = base_reserve
+        self.quote_reserve = quote_reserve
+        self.price = price
+        self.fee_rate = fee_rate
+        self.liquidity = liquidity  # Concentrated liquidity pools, raw units
+        self.sqrt_price = sqrt_price  # sqrt(raw quote per raw base)
+        self.bin_step = bin_step  # Liquidity book pools, basis points between bins
+
+    def __repr__(self) -> str:
+        return f"PoolRecord({self.address}, {self.base_mint}/{self.quote_mint}, price={self.price})"
+
+def _float(value: Any, default: float = 0.0) -> float:
+    try:
+        return float(value) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+def raydium_pool_record(item: Dict) -> Optional[PoolRecord]:
+    """Extract a PoolRecord from a Raydium pool entry"""
+    base_mint = item.get("baseMint")
+    quote_mint = item.get("quoteMint")
+    if not base_mint or not quote_mint:
+        return None
+
+    return PoolRecord(
+        address=item.get("id") or item.get("ammId") or "",
+        base_mint=base_mint,
+        quote_mint=quote_mint,
+        price=_float(item.get("price")),
+        base_reserve=_float(item.get("tokenAmountCoin", item.get("baseReserve"))),
+        quote_reserve=_float(item.get("tokenAmountPc", item.get("quoteReserve"))),
+        fee_rate=_float(item.get("feeRate"), 0.0025),  # Raydium AMM v4 charges 0.25%
+        base_decimals=int(item.get("baseDecimals", 0) or 0),
+        quote_decimals=int(item.get("quoteDecimals", 0) or 0),
+        base_vault=item.get("baseVault"),
+        quote_vault=item.get("quoteVault")
+    )
+
+def orca_pool_record(item: Dict) -> Optional[PoolRecord]:
+    """Extract a PoolRecord from an Orca pool entry"""
+    token_a = item.get("tokenA") or {}
+    token_b = item.get("tokenB") or {}
+    base_mint = token_a.get("mint") or item.get("tokenAMint")
+    quote_mint = token_b.get("mint") or item.get("tokenBMint")
+    if not base_mint or not quote_mint:
+        return None
+
+    # Whirlpool sqrtPrice is a Q64.64 fixed-point number
+    sqrt_price = _float(item.get("sqrtPrice")) / 2 ** 64
+
+    return PoolRecord(
+        address=item.get("address") or item.get("account") or "",
+        base_mint=base_mint,
+        quote_mint=quote_mint,
+        price=_float(item.get("price")),
+        base_reserve=_float(item.get("tokenAAmount")),
+        quote_reserve=_float(item.get("tokenBAmount")),
+        fee_rate=_float(item.get("lpFeeRate"), 0.003),
+        base_decimals=int(token_a.get("decimals", 0) or 0),
+        quote_decimals=int(token_b.get("decimals", 0) or 0),
+        base_vault=item.get("tokenVaultA"),
+        quote_vault=item.get("tokenVaultB"),
+        liquidity=_float(item.get("liquidity")),
+        sqrt_price=sqrt_price
+    )
+
+def meteora_pool_record(item: Dict) -> Optional[PoolRecord]:
+    """Extract a PoolRecord from a Meteora DLMM pair entry"""
+    base_mint = item.get("mint_x")
+    quote_mint = item.get("mint_y")
+    if not base_mint or not quote_mint:
+        return None
+
+    # Reserves are reported in raw units; keep them only when they can be scaled to the UI price
+    base_decimals = item.get("mint_x_decimals", item.get("decimals_x"))
+    quote_decimals = item.get("mint_y_decimals", item.get("decimals_y"))
+    base_reserve = quote_reserve = 0.0
+    if base_decimals is not None and quote_decimals is not None:
+        base_reserve = _float(item.get("reserve_x_amount")) / 10 ** int(base_decimals)
+        quote_reserve = _float(item.get("reserve_y_amount")) / 10 ** int(quote_decimals)
+
+    return PoolRecord(
+        address=item.get("address") or "",
+        base_mint=base_mint,
+        quote_mint=quote_mint,
+        price=_float(item.get("current_price")),
+        base_reserve=base_reserve,
+        quote_reserve=quote_reserve,
+        fee_rate=_float(item.get("base_fee_percentage"), 0.25) / 100,
+        base_decimals=int(base_decimals or 0),
+        quote_decimals=int(quote_decimals or 0),
+        base_vault=item.get("reserve_x"),
+        quote_vault=item.get("reserve_y"),
+        bin_step=_float(item.get("bin_step"))
+    )
+
+async def iter_json_array(chunks: AsyncIterator[bytes], array_key: Optional[str] = None) -> AsyncIterator[Any]:
+    """
+    Incrementally decode the items of a JSON array from a stream of byte chunks.
+    The array is either the top-level value or the value of array_key in the top-level object.
+    Only one item is held in decoded form at a time.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    pos = 0
+    exhausted = False
+    stream = chunks.__aiter__()
+
+    async def read_more() -> bool:
+        nonlocal buffer, pos, exhausted
+        try:
+            chunk = await stream.__anext__()
+        except StopAsyncIteration:
+            buffer = buffer[pos:] + text_decoder.decode(b"", final=True)
+            pos = 0
+            exhausted = True
+            return False
+        # Drop consumed text so the buffer only holds the unparsed tail
+        buffer = buffer[pos:] + text_decoder.decode(chunk)
+        pos = 0
+        return True
+
+    async def skip_whitespace() -> bool:
+        """Advance to the next significant character; False at the end of the stream"""
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or not await read_more():
+                return pos < len(buffer)
+
+    async def expect(char: str):
+        nonlocal pos
+        if not await skip_whitespace() or buffer[pos] != char:
+            raise ValueError(f"JSON array {array_key or ''} not found in stream")
+        pos += 1
+
+    async def read_key() -> Any:
+        nonlocal pos
+        while True:
+            try:
+                key, pos = decoder.raw_decode(buffer, pos)
+                return key
+            except json.JSONDecodeError:
+                if exhausted or not await read_more():
+                    raise
+
+    async def skip_value():
+        """Advance past one value without decoding it, stopping at the separator that follows it"""
+        nonlocal pos
+        depth = 0
+        in_string = escaped = False
+        while True:
+            while pos < len(buffer):
+                char = buffer[pos]
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif char == "\\":
+                        escaped = True
+                    elif char == '"':
+                        in_string = False
+                        if depth == 0:
+                            pos += 1
+                            return
+                elif char == '"':
+                    in_string = True
+                elif char in "[{":
+                    depth += 1
+                elif char in "]}":
+                    if depth == 0:
+                        return
+                    depth -= 1
+                    if depth == 0:
+                        pos += 1
+                        return
+                elif char == "," and depth == 0:
+                    return
+                pos += 1
+            if not await read_more():
+                return
+
+    # Find the opening bracket of the array; a key only counts at the top level of the document
+    if array_key is not None:
+        await expect("{")
+        while True:
+            if not await skip_whitespace() or buffer[pos] == "}":
+                raise ValueError(f"JSON array {array_key} not found in stream")
+            if buffer[pos] == ",":
+                pos += 1
+                continue
+            key = await read_key()
+            await expect(":")
+            if key == array_key:
+                break
+            await skip_value()
+    await expect("[")
+
+    while True:
+        # Skip separators between items
+        while True:
+            while pos < len(buffer) and (buffer[pos] in _WHITESPACE or buffer[pos] == ","):
+                pos += 1
+            if pos < len(buffer) or not await read_more():
+                break
+
+        if pos >= len(buffer):
+            raise ValueError("Unexpected end of JSON stream")
+        if buffer[pos] == "]":
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # The item is incomplete; read more and try again
+            if exhausted or not await read_more():
+                raise
+            continue
+
+        pos = end
+        yield item
+
+async def parse_pool_stream(chunks: AsyncIterator[bytes], record_parser: Callable[[Dict], Optional[PoolRecord]],
+                            array_key: Optional[str] = None) -> List[PoolRecord]:
+    """Stream pool entries into compact records, discarding unused fields as it goes"""
+    records = []
+    async for item in iter_json_array(chunks, array_key):
+        if isinstance(item, dict):
+            record = record_parser(item)
+            if record is not None:
+                records.append(record)
+    return records
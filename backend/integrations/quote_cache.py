@@ -0,0 +1,112 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("quote_cache")
+
+# Load environment variables
+load_dotenv()
+
+QUOTE_CACHE_TTL = float(os.getenv("QUOTE_CACHE_TTL", 2.0))  # Seconds a quote stays fresh
+QUOTE_CACHE_MAX_ENTRIES = int(os.getenv("QUOTE_CACHE_MAX_ENTRIES", 4096))
+
+class QuoteCache:
+    """
+    TTL cache with LRU eviction and single-flight request coalescing.
+    Concurrent lookups for the same key share one in-flight fetch.
+    """
+    def __init__(self, ttl: float = QUOTE_CACHE_TTL, max_entries: int = QUOTE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a fresh cached value without fetching"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def age(self, key: Hashable) -> Optional[float]:
+        """Get the age in seconds of a cached value, or None if it is not cached"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return time.monotonic() - entry[0]
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value and evict the least recently used entries"""
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]],
+                           should_cache: Callable[[Any], bool] = lambda value: value is not None) -> Any:
+        """
+        Return the cached value for key, or fetch it.
+        If a fetch for the same key is already running, wait for it instead of starting another.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(in_flight)
+
+        self.misses += 1
+        task = asyncio.ensure_future(fetch())
+        self._in_flight[key] = task
+
+        def _on_done(done: asyncio.Future):
+            self._in_flight.pop(key, None)
+            if not done.cancelled() and done.exception() is None and should_cache(done.result()):
+                self.set(key, done.result())
+
+        task.add_done_callback(_on_done)
+        # Shield so a cancelled caller does not cancel the fetch for the other waiters
+        return await asyncio.shield(task)
+
+    def invalidate(self, key: Hashable):
+        """Drop a cached value"""
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop all cached values"""
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache counters"""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "upstream_calls_saved": self.hits + self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0
+        }
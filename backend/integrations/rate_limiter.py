@@ -0,0 +1,180 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("rate_limiter")
+
+# Load environment variables
+load_dotenv()
+
+RATE_LIMIT_INITIAL_RATE = float(os.getenv("RATE_LIMIT_INITIAL_RATE", 10))  # Requests per second per host
+RATE_LIMIT_MIN_RATE = float(os.getenv("RATE_LIMIT_MIN_RATE", 1))
+RATE_LIMIT_MAX_RATE = float(os.getenv("RATE_LIMIT_MAX_RATE", 200))
+RATE_LIMIT_RATE_STEP = float(os.getenv("RATE_LIMIT_RATE_STEP", 1))  # Requests per second added per second of healthy traffic
+RATE_LIMIT_INITIAL_CONCURRENCY = float(os.getenv("RATE_LIMIT_INITIAL_CONCURRENCY", 4))
+RATE_LIMIT_MAX_CONCURRENCY = float(os.getenv("RATE_LIMIT_MAX_CONCURRENCY", os.getenv("HTTP_POOL_LIMIT_PER_HOST", 20)))
+RATE_LIMIT_BACKOFF_FACTOR = float(os.getenv("RATE_LIMIT_BACKOFF_FACTOR", 0.5))
+RATE_LIMIT_BACKOFF_INTERVAL = float(os.getenv("RATE_LIMIT_BACKOFF_INTERVAL", 1))  # Seconds between two back-offs
+
+# Optional per-host starting rates, e.g. "quote-api.jup.ag=10,api.raydium.io=5"
+RATE_LIMIT_HOST_RATES = {
+    host.strip(): float(rate)
+    for host, _, rate in (
+        entry.partition("=") for entry in os.getenv("RATE_LIMIT_HOST_RATES", "").split(",") if "=" in entry
+    )
+}
+
+# Responses that mean the upstream wants us to slow down
+THROTTLE_STATUSES = {429, 503}
+
+class HostLimiter:
+    """
+    Token bucket plus AIMD concurrency limit for one upstream host.
+    Healthy responses raise the request rate and the concurrency limit additively;
+    a throttling response or a timeout halves both, at most once per back-off interval
+    so a burst of 429s from one window counts as one signal.
+    """
+    def __init__(self, host: str, rate: float = RATE_LIMIT_INITIAL_RATE,
+                 concurrency: float = RATE_LIMIT_INITIAL_CONCURRENCY):
+        self.host = host
+        self.rate = rate
+        self.concurrency = concurrency
+        self.tokens = 1.0
+        self.last_refill = time.monotonic()
+        self.paused_until = 0.0
+        self.last_backoff = 0.0
+        self.in_flight = 0
+        self.queued = 0
+        self.waiters = deque()
+        self.requests = 0
+        self.throttled = 0
+        self.timeouts = 0
+
+    def _take_token(self) -> float:
+        """Take a token if one is available; otherwise return the seconds until one will be"""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        # Allow bursts of up to one second of traffic
+        self.tokens = min(max(self.rate, 1.0), self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def _wake_waiters(self):
+        while self.waiters and self.in_flight < int(self.concurrency):
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def acquire(self):
+        """Wait for a concurrency slot and a token"""
+        self.queued += 1
+        try:
+            if self.in_flight < int(self.concurrency) and not self.waiters:
+                self.in_flight += 1
+            else:
+                waiter = asyncio.get_running_loop().create_future()
+                self.waiters.append(waiter)
+                try:
+                    await waiter
+                except asyncio.CancelledError:
+                    # The slot may have been handed over just before the cancellation
+                    if waiter.done() and not waiter.cancelled():
+                        self.release_slot()
+                    raise
+
+            try:
+                while True:
+                    delay = self._take_token()
+                    if delay == 0:
+                        break
+                    await asyncio.sleep(delay)
+            except BaseException:
+                self.release_slot()
+                raise
+        finally:
+            self.queued -= 1
+        self.requests += 1
+
+    def release_slot(self):
+        self.in_flight -= 1
+        self._wake_waiters()
+
+    def on_success(self):
+        # Additive increase: about one step per second of traffic, and one slot per window of requests
+        self.rate = min(RATE_LIMIT_MAX_RATE, self.rate + RATE_LIMIT_RATE_STEP / max(self.rate, 1.0))
+        self.concurrency = min(RATE_LIMIT_MAX_CONCURRENCY, self.concurrency + 1 / self.concurrency)
+
+    def on_backoff(self, retry_after: Optional[float] = None):
+        now = time.monotonic()
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+        if now - self.last_backoff < RATE_LIMIT_BACKOFF_INTERVAL:
+            return
+        self.last_backoff = now
+        self.rate = max(RATE_LIMIT_MIN_RATE, self.rate * RATE_LIMIT_BACKOFF_FACTOR)
+        self.concurrency = max(1.0, self.concurrency * RATE_LIMIT_BACKOFF_FACTOR)
+        self.tokens = min(self.tokens, 0.0)
+        logger.warning(
+            f"Backing off {self.host}: rate={self.rate:.1f}/s, concurrency={int(self.concurrency)}"
+        )
+
+    def release(self, status: Optional[int] = None, error: Optional[BaseException] = None,
+                retry_after: Optional[float] = None):
+        """Return the slot and adapt the limits to the outcome"""
+        self.release_slot()
+        if status in THROTTLE_STATUSES:
+            self.throttled += 1
+            self.on_backoff(retry_after)
+        elif isinstance(error, asyncio.TimeoutError):
+            self.timeouts += 1
+            self.on_backoff()
+        elif status is not None and status < 500:
+            self.on_success()
+
+    def get_stats(self) -> Dict:
+        return {
+            "rate": self.rate,
+            "concurrency": int(self.concurrency),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "timeouts": self.timeouts,
+            "paused_for": max(0.0, self.paused_until - time.monotonic())
+        }
+
+class RateLimiter:
+    """Per-host limiters shared by every client using the pooled HTTP session"""
+    def __init__(self):
+        self.hosts: Dict[str, HostLimiter] = {}
+
+    def get(self, host: str) -> HostLimiter:
+        limiter = self.hosts.get(host)
+        if limiter is None:
+            limiter = HostLimiter(host, rate=RATE_LIMIT_HOST_RATES.get(host, RATE_LIMIT_INITIAL_RATE))
+            self.hosts[host] = limiter
+        return limiter
+
+    def get_stats(self) -> Dict[str, Dict]:
+        return {host: limiter.get_stats() for host, limiter in self.hosts.items()}
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After in seconds; HTTP-date values are ignored"""
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+# Process-wide limiter
+rate_limiter = RateLimiter()
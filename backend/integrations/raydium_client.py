@@ -2,8 +2,13 @@ import os
 import json
 import asyncio
 from typing import Dict, List, Optional, Tuple
-import httpx
+import numpy as np
 from dotenv import load_dotenv
+from .amm_math import constant_product_out
+from .http_session import get_session
+from .dex_client import Pair, registry_prices
+from .pool_registry import PoolRegistry, POOL_SNAPSHOT_DIR
+from .pool_stream import PoolRecord, parse_pool_stream, raydium_pool_record, POOL_STREAM_CHUNK_SIZE
 import logging
 
 # Configure logging
@@ -13,51 +18,100 @@ logger = logging.getLogger("raydium_client")
 # Load environment variables
 load_dotenv()
 
+RAYDIUM_API_URL = "https://api.raydium.io/v2"
+
+# Pool index shared by every RaydiumClient
+raydium_pool_registry = PoolRegistry(
+    "Raydium",
+    f"{RAYDIUM_API_URL}/main/pools",
+    raydium_pool_record,
+    snapshot_path=os.path.join(POOL_SNAPSHOT_DIR, "raydium.snap")
+)
+
 class RaydiumClient:
-    def __init__(self):
-        self.base_url = "https://api.raydium.io/v2"
+    def __init__(self, pool_registry: Optional[PoolRegistry] = None):
+        self.base_url = RAYDIUM_API_URL
+        self.pool_registry = pool_registry or raydium_pool_registry
         logger.info("Initialized Raydium client")
     
-    async def get_pools(self) -> List[Dict]:
+    async def get_pools(self) -> List[PoolRecord]:
         """Get all Raydium pools"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.base_url}/main/pools")
-                
-                if response.status_code != 200:
-                    logger.error(f"Error getting pools: {response.text}")
+            session = await get_session()
+            async with session.get(f"{self.base_url}/main/pools") as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    logger.error(f"Error getting pools: {error_text}")
                     return []
                 
-                return response.json()
+                return await parse_pool_stream(
+                    response.content.iter_chunked(POOL_STREAM_CHUNK_SIZE),
+                    raydium_pool_record
+                )
         except Exception as e:
             logger.error(f"Error getting Raydium pools: {str(e)}")
             return []
     
+    def quote_pool(self, pool: PoolRecord, input_mint: str, amounts) -> np.ndarray:
+        """Output amounts for one or many input sizes against a pool"""
+        amounts = np.atleast_1d(np.asarray(amounts, dtype=float))
+        base_in = pool.base_mint == input_mint
+        
+        if pool.base_reserve > 0 and pool.quote_reserve > 0:
+            reserve_in, reserve_out = (pool.base_reserve, pool.quote_reserve) if base_in else (pool.quote_reserve, pool.base_reserve)
+            return constant_product_out(amounts, reserve_in, reserve_out, pool.fee_rate)
+        
+        # No reserves reported; fall back to the pool's spot price
+        if not pool.price:
+            return np.zeros_like(amounts)
+        return amounts * (pool.price if base_in else 1 / pool.price)
+    
+    def quote_pools(self, pools: List[PoolRecord], input_mints: List[str], amount: float) -> np.ndarray:
+        """Output amounts for one input size against many pools in a single vectorized pass"""
+        base_in = np.array([pool.base_mint == input_mint for pool, input_mint in zip(pools, input_mints)], dtype=bool)
+        base_reserve = np.array([pool.base_reserve for pool in pools], dtype=float)
+        quote_reserve = np.array([pool.quote_reserve for pool in pools], dtype=float)
+        price = np.array([pool.price or 0.0 for pool in pools], dtype=float)
+        fee_rate = np.array([pool.fee_rate for pool in pools], dtype=float)
+    
+        curve_out = constant_product_out(
+            amount,
+            np.where(base_in, base_reserve, quote_reserve),
+            np.where(base_in, quote_reserve, base_reserve),
+            fee_rate
+        )
+        # Pools without reserves fall back to their spot price
+        with np.errstate(divide="ignore"):
+            spot_out = amount * np.where(base_in, price, np.where(price > 0, 1 / price, 0.0))
+        has_reserves = (base_reserve > 0) & (quote_reserve > 0)
+        return np.where(has_reserves, curve_out, spot_out)
+    
+    def quote_amounts(self, input_mint: str, output_mint: str, amounts) -> Optional[np.ndarray]:
+        """Output amounts for many input sizes without any network I/O"""
+        pool = self.pool_registry.get_pool(input_mint, output_mint)
+        if not pool:
+            return None
+        return self.quote_pool(pool, input_mint, amounts)
+    
     async def get_price(self, input_mint: str, output_mint: str, amount: float = 1.0) -> Dict:
         """Get price for a token pair"""
         try:
-            # First, get all pools
-            pools = await self.get_pools()
+            # Pools are kept current in the background, so this is a local lookup
+            self.pool_registry.start()
+            if not self.pool_registry.is_ready:
+                logger.warning("Raydium pool registry is still loading")
+                return None
             
             # Find the pool for the token pair
-            pool = None
-            for p in pools:
-                if (p.get("baseMint") == input_mint and p.get("quoteMint") == output_mint) or \
-                   (p.get("baseMint") == output_mint and p.get("quoteMint") == input_mint):
-                    pool = p
-                    break
+            pool = self.pool_registry.get_pool(input_mint, output_mint)
             
             if not pool:
                 logger.error(f"Pool not found for {input_mint} -> {output_mint}")
                 return None
             
-            # Calculate price based on pool data
-            if pool.get("baseMint") == input_mint:
-                price = float(pool.get("price", 0))
-                output_amount = amount * price
-            else:
-                price = 1 / float(pool.get("price", 1))
-                output_amount = amount * price
+            # Calculate price from the pool's curve at this trade size
+            output_amount = float(self.quote_pool(pool, input_mint, amount)[0])
+            price = output_amount / amount if amount > 0 else 0
             
             return {
                 "inputMint": input_mint,
@@ -69,3 +123,15 @@ class RaydiumClient:
         except Exception as e:
             logger.error(f"Error getting price for {input_mint} -> {output_mint}: {str(e)}")
             return None
+    
+    async def get_prices(self, pairs: List[Pair], amount: float = 1.0) -> Dict[Pair, Dict]:
+        """Get prices for many token pairs in one call, from the local pool index"""
+        try:
+            self.pool_registry.start()
+            if not self.pool_registry.is_ready:
+                logger.warning("Raydium pool registry is still loading")
+                return {}
+            return registry_prices(self.pool_registry, self.quote_pools, pairs, amount)
+        except Exception as e:
+            logger.error(f"Error getting Raydium prices for {len(pairs)} pairs: {str(e)}")
+            return {pair: {"price": 0, "error": str(e)} for pair in pairs}
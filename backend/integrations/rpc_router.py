@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from .http_session import get_session
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("rpc_router")
+
+# Load environment variables
+load_dotenv()
+
+# Comma-separated endpoint pool; SOLANA_RPC_URL alone still works
+SOLANA_RPC_URLS = [
+    url.strip()
+    for url in os.getenv("SOLANA_RPC_URLS", os.getenv("SOLANA_RPC_URL", "https://api.mainnet-beta.solana.com")).split(",")
+    if url.strip()
+]
+
+RPC_LATENCY_ALPHA = float(os.getenv("RPC_LATENCY_ALPHA", 0.2))  # EWMA weight of the newest sample
+RPC_MAX_ERROR_RATE = float(os.getenv("RPC_MAX_ERROR_RATE", 0.5))  # Endpoints above this are unhealthy
+RPC_ERROR_COOLDOWN = float(os.getenv("RPC_ERROR_COOLDOWN", 10))  # Seconds an unhealthy endpoint sits out
+RPC_HEDGE_PERCENTILE = float(os.getenv("RPC_HEDGE_PERCENTILE", 0.9))  # Latency percentile that triggers a hedge
+RPC_DEFAULT_HEDGE_DELAY = float(os.getenv("RPC_DEFAULT_HEDGE_DELAY", 0.25))  # Seconds, until samples exist
+
+# Responses larger than this are decoded in a worker thread instead of on the event loop
+RPC_OFFLOAD_DECODE_BYTES = int(os.getenv("RPC_OFFLOAD_DECODE_BYTES", 256 * 1024))
+
+# Latency samples kept per endpoint for percentiles
+LATENCY_WINDOW = 200
+
+class RpcError(Exception):
+    """Raised when no endpoint returned a usable response"""
+
+class RpcEndpoint:
+    """Rolling latency and error statistics of one RPC endpoint"""
+    def __init__(self, url: str):
+        self.url = url
+        self.latency: Optional[float] = None  # EWMA seconds
+        self.error_rate = 0.0  # EWMA of failures
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.errors = 0
+        self.cooldown_until = 0.0
+
+    @property
+    def is_healthy(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def record_success(self, latency: float):
+        self.requests += 1
+        self.latencies.append(latency)
+        self.latency = latency if self.latency is None else (
+            RPC_LATENCY_ALPHA * latency + (1 - RPC_LATENCY_ALPHA) * self.latency
+        )
+        self.error_rate *= 1 - RPC_LATENCY_ALPHA
+
+    def record_error(self):
+        self.requests += 1
+        self.errors += 1
+        self.error_rate = RPC_LATENCY_ALPHA + (1 - RPC_LATENCY_ALPHA) * self.error_rate
+        if self.error_rate > RPC_MAX_ERROR_RATE:
+            self.cooldown_until = time.monotonic() + RPC_ERROR_COOLDOWN
+            # Start afresh once the cooldown is over so one good response restores it
+            self.error_rate = RPC_MAX_ERROR_RATE
+            logger.warning(f"RPC endpoint {self.url} unhealthy, cooling down for {RPC_ERROR_COOLDOWN}s")
+
+    def score(self) -> float:
+        """Expected cost of a request; lower is better. Unmeasured endpoints go first."""
+        if self.latency is None:
+            return 0.0
+        return self.latency / max(1 - self.error_rate, 0.05)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def get_stats(self) -> Dict:
+        return {
+            "url": self.url,
+            "healthy": self.is_healthy,
+            "latency_ms": self.latency * 1000 if self.latency is not None else None,
+            "p90_ms": self.percentile(0.9) * 1000 if self.latencies else None,
+            "error_rate": self.error_rate,
+            "requests": self.requests,
+            "errors": self.errors
+        }
+
+class RpcRouter:
+    """
+    Sends JSON-RPC payloads to the fastest healthy endpoint of a pool.
+    Each endpoint tracks EWMA latency and error rate; failing endpoints are
+    cooled down and the request fails over to the next one. Latency-critical
+    calls can be hedged: if the first endpoint has not answered within its
+    own latency percentile, the same payload goes to the runner-up and the
+    first response wins.
+    """
+    def __init__(self, urls: Optional[List[str]] = None, hedge_percentile: float = RPC_HEDGE_PERCENTILE):
+        self.endpoints = [RpcEndpoint(url) for url in (urls or SOLANA_RPC_URLS)]
+        if not self.endpoints:
+            raise ValueError("RpcRouter needs at least one endpoint")
+        self.hedge_percentile = hedge_percentile
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @property
+    def urls(self) -> List[str]:
+        return [endpoint.url for endpoint in self.endpoints]
+
+    def ranked(self) -> List[RpcEndpoint]:
+        """Endpoints in the order requests should try them"""
+        healthy = [endpoint for endpoint in self.endpoints if endpoint.is_healthy]
+        if not healthy:
+            # Everything is cooling down; try whichever recovers first
+            return sorted(self.endpoints, key=lambda endpoint: endpoint.cooldown_until)
+        return sorted(healthy, key=lambda endpoint: endpoint.score())
+
+    def hedge_delay(self, endpoint: RpcEndpoint) -> float:
+        return endpoint.percentile(self.hedge_percentile) or RPC_DEFAULT_HEDGE_DELAY
+
+    async def _decode_json(self, body: bytes) -> Any:
+        """Decode a JSON body, off the event loop when it is large"""
+        if len(body) < RPC_OFFLOAD_DECODE_BYTES:
+            return json.loads(body)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, json.loads, body)
+
+    async def _post(self, endpoint: RpcEndpoint, payload: Any) -> Any:
+        """Send a payload to one endpoint and record the outcome"""
+        start = time.perf_counter()
+        try:
+            session = await get_session()
+            async with session.post(endpoint.url, json=payload) as response:
+                body = await response.read()
+                if response.status != 200:
+                    raise RpcError(f"HTTP {response.status} from {endpoint.url}: {body.decode(errors='replace')}")
+            data = await self._decode_json(body)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            endpoint.record_error()
+            raise
+        endpoint.record_success(time.perf_counter() - start)
+        return data
+
+    async def _hedged(self, primary: RpcEndpoint, secondary: RpcEndpoint, payload: Any) -> Any:
+        """Race the primary against a delayed duplicate request to the secondary"""
+        first = asyncio.create_task(self._post(primary, payload))
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_delay(primary))
+        if first in done and first.exception() is None:
+            return first.result()
+
+        # Slow or already failed; either way the secondary gets the request now
+        if first not in done:
+            self.hedges += 1
+        second = asyncio.create_task(self._post(secondary, payload))
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def request(self, payload: Any, hedge: bool = False) -> Any:
+        """
+        Send a JSON-RPC payload (single call or batch array) and return the decoded response.
+        Falls back through the pool on transport or HTTP errors; raises RpcError if every endpoint failed.
+        """
+        endpoints = self.ranked()
+        errors = []
+        while endpoints:
+            endpoint = endpoints.pop(0)
+            try:
+                if hedge and endpoints:
+                    secondary = endpoints.pop(0)
+                    return await self._hedged(endpoint, secondary, payload)
+                return await self._post(endpoint, payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                errors.append(str(e) or type(e).__name__)
+        raise RpcError("; ".join(errors))
+
+    async def call(self, method: str, params: Optional[List] = None, hedge: bool = False) -> Dict:
+        """Send one JSON-RPC call and return its response object"""
+        return await self.request(
+            {"jsonrpc": "2.0", "id": 1, "method": method, "params": params or []},
+            hedge=hedge
+        )
+
+    def get_stats(self) -> Dict:
+        return {
+            "endpoints": [endpoint.get_stats() for endpoint in self.endpoints],
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins
+        }
+
+# Shared router so every client sees the same endpoint statistics
+rpc_router = RpcRouter()
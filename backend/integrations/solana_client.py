@@ -1,10 +1,10 @@
 import os
 import base58
-import json
+import base64
 import asyncio
 from typing import Dict, List, Optional, Tuple
-import httpx
 from dotenv import load_dotenv
+from .rpc_router import RpcRouter, rpc_router
 import logging
 
 # Configure logging
@@ -14,67 +14,183 @@ logger = logging.getLogger("solana_client")
 # Load environment variables
 load_dotenv()
 
-# Get Solana RPC URL from environment variable
-SOLANA_RPC_URL = os.getenv("SOLANA_RPC_URL", "https://api.mainnet-beta.solana.com")
+SPL_TOKEN_PROGRAM_ID = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+
+# RPC limits: requests per JSON-RPC batch and keys per getMultipleAccounts call
+RPC_BATCH_SIZE = int(os.getenv("RPC_BATCH_SIZE", 100))
+MULTIPLE_ACCOUNTS_LIMIT = 100
+
+def _chunks(items: List, size: int) -> List[List]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def _decode_account(account: Optional[Dict]) -> Optional[Dict]:
+    """Decode the base64 data of an account returned by the RPC"""
+    if account is None:
+        return None
+    data = account.get("data")
+    if isinstance(data, list) and len(data) == 2 and data[1] == "base64":
+        account = dict(account)
+        account["data"] = base64.b64decode(data[0])
+    return account
 
 class SolanaClient:
-    def __init__(self, rpc_url: str = None):
-        self.rpc_url = rpc_url or SOLANA_RPC_URL
+    def __init__(self, rpc_url: str = None, router: Optional[RpcRouter] = None):
+        # A single URL pins the client to that endpoint; otherwise the shared endpoint pool is used
+        self.router = router or (RpcRouter([rpc_url]) if rpc_url else rpc_router)
         # We'll use direct RPC calls instead of the solana-py library
-        logger.info(f"Initialized Solana client with RPC URL: {self.rpc_url}")
+        logger.info(f"Initialized Solana client with RPC URLs: {', '.join(self.router.urls)}")
+    
+    async def _post_batch(self, batch: List[Dict]) -> List[Dict]:
+        """Send one JSON-RPC batch array"""
+        try:
+            data = await self.router.request(batch)
+        except Exception as e:
+            logger.error(f"RPC batch error: {str(e)}")
+            return [{"id": request["id"], "error": str(e)} for request in batch]
+        
+        if isinstance(data, dict):
+            # Some nodes answer a rejected batch with a single error object
+            return [{"id": request["id"], "error": data.get("error", data)} for request in batch]
+        return data
+    
+    async def rpc_batch(self, requests: List[Tuple[str, List]]) -> List[Dict]:
+        """
+        Send many JSON-RPC calls as batch arrays, chunked to RPC_BATCH_SIZE.
+        Chunks are sent concurrently, so the whole call costs about one round trip.
+        Returns one response ({"result": ...} or {"error": ...}) per request, in order.
+        """
+        if not requests:
+            return []
+        
+        batch = [
+            {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+            for request_id, (method, params) in enumerate(requests)
+        ]
+        chunk_responses = await asyncio.gather(
+            *[self._post_batch(chunk) for chunk in _chunks(batch, RPC_BATCH_SIZE)]
+        )
+        
+        # Batch responses may come back in any order
+        responses_by_id = {}
+        for responses in chunk_responses:
+            for response in responses:
+                responses_by_id[response.get("id")] = response
+        return [
+            responses_by_id.get(request_id, {"error": "Missing response"})
+            for request_id in range(len(requests))
+        ]
+    
+    async def get_balances(self, wallet_addresses: List[str]) -> Dict[str, float]:
+        """
+        Get SOL balances for many wallets in one batched round trip
+        Wallets whose balance could not be read are left out rather than reported as empty.
+        """
+        try:
+            responses = await self.rpc_batch([("getBalance", [address]) for address in wallet_addresses])
+            balances = {}
+            for address, response in zip(wallet_addresses, responses):
+                if "result" in response and "value" in response["result"]:
+                    balances[address] = response["result"]["value"] / 10**9  # Convert lamports to SOL
+                else:
+                    logger.error(f"Error getting balance for {address}: {response.get('error')}")
+            return balances
+        except Exception as e:
+            logger.error(f"Error getting balances: {str(e)}")
+            return {}
+    
+    async def get_multiple_accounts(self, pubkeys: List[str], commitment: str = "confirmed") -> Dict[str, Optional[Dict]]:
+        """
+        Get account info for many accounts, chunked into getMultipleAccounts calls
+        sent as one batch. Account data is returned as bytes; missing accounts map to None.
+        """
+        try:
+            key_chunks = _chunks(list(pubkeys), MULTIPLE_ACCOUNTS_LIMIT)
+            responses = await self.rpc_batch([
+                ("getMultipleAccounts", [chunk, {"encoding": "base64", "commitment": commitment}])
+                for chunk in key_chunks
+            ])
+            
+            accounts = {}
+            for chunk, response in zip(key_chunks, responses):
+                if "result" not in response:
+                    logger.error(f"Error getting accounts: {response.get('error')}")
+                    accounts.update({pubkey: None for pubkey in chunk})
+                    continue
+                for pubkey, account in zip(chunk, response["result"].get("value", [])):
+                    accounts[pubkey] = account
+            
+            # base64-decoding hundreds of accounts can block the loop for a while
+            if len(accounts) > MULTIPLE_ACCOUNTS_LIMIT:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    None, lambda: {pubkey: _decode_account(account) for pubkey, account in accounts.items()}
+                )
+            return {pubkey: _decode_account(account) for pubkey, account in accounts.items()}
+        except Exception as e:
+            logger.error(f"Error getting multiple accounts: {str(e)}")
+            return {pubkey: None for pubkey in pubkeys}
     
     async def get_balance(self, wallet_address: str) -> float:
         """Get SOL balance for a wallet"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.rpc_url,
-                    json={
-                        "jsonrpc": "2.0",
-                        "id": 1,
-                        "method": "getBalance",
-                        "params": [wallet_address]
-                    }
-                )
-                
-                if response.status_code != 200:
-                    logger.error(f"Error getting balance: {response.text}")
-                    return 0
-                
-                data = response.json()
-                if "result" in data and "value" in data["result"]:
-                    balance_lamports = data["result"]["value"]
-                    balance_sol = balance_lamports / 10**9  # Convert lamports to SOL
-                    return balance_sol
-                
-                logger.error(f"Invalid response format: {data}")
-                return 0
+            data = await self.router.call("getBalance", [wallet_address])
+            if "result" in data and "value" in data["result"]:
+                balance_lamports = data["result"]["value"]
+                balance_sol = balance_lamports / 10**9  # Convert lamports to SOL
+                return balance_sol
+            
+            logger.error(f"Invalid response format: {data}")
+            return 0
         except Exception as e:
             logger.error(f"Error getting balance for {wallet_address}: {str(e)}")
             return 0
     
-    async def get_token_balance(self, wallet_address: str, token_mint: str) -> float:
-        """Get token balance for a wallet"""
+    async def get_token_accounts_by_owner(self, wallet_addresses: List[str]) -> Dict[str, Tuple[int, Dict[str, float]]]:
+        """
+        Get SPL token balances for many wallets with one batched getTokenAccountsByOwner round trip.
+        Returns {wallet: (slot, {mint: ui_amount})}; wallets whose lookup failed are left out.
+        """
         try:
-            # Use a public API to get token balances
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"https://public-api.solscan.io/account/tokens",
-                    params={"account": wallet_address}
-                )
+            responses = await self.rpc_batch([
+                ("getTokenAccountsByOwner", [
+                    address,
+                    {"programId": SPL_TOKEN_PROGRAM_ID},
+                    {"encoding": "jsonParsed", "commitment": "confirmed"}
+                ])
+                for address in wallet_addresses
+            ])
+            
+            results = {}
+            for address, response in zip(wallet_addresses, responses):
+                if "result" not in response:
+                    logger.error(f"Error getting token accounts for {address}: {response.get('error')}")
+                    continue
                 
-                if response.status_code != 200:
-                    logger.error(f"Error getting token balance: {response.text}")
-                    return 0
-                
-                tokens = response.json()
-                for token in tokens:
-                    if token.get("tokenAddress") == token_mint:
-                        decimals = int(token.get("decimals", 0))
-                        balance = float(token.get("tokenAmount", {}).get("uiAmount", 0))
-                        return balance
+                balances: Dict[str, float] = {}
+                for token_account in response["result"].get("value", []):
+                    info = token_account.get("account", {}).get("data", {}).get("parsed", {}).get("info", {})
+                    mint = info.get("mint")
+                    if not mint:
+                        continue
+                    ui_amount = info.get("tokenAmount", {}).get("uiAmount") or 0
+                    # A wallet can hold several accounts for the same mint
+                    balances[mint] = balances.get(mint, 0) + float(ui_amount)
                 
+                results[address] = (response["result"].get("context", {}).get("slot", 0), balances)
+            return results
+        except Exception as e:
+            logger.error(f"Error getting token accounts: {str(e)}")
+            return {}
+    
+    async def get_token_balance(self, wallet_address: str, token_mint: str) -> float:
+        """Get token balance for a wallet"""
+        try:
+            token_accounts = await self.get_token_accounts_by_owner([wallet_address])
+            if wallet_address not in token_accounts:
                 return 0
+            
+            _, balances = token_accounts[wallet_address]
+            return balances.get(token_mint, 0)
         except Exception as e:
             logger.error(f"Error getting token balance for {wallet_address}, token {token_mint}: {str(e)}")
             return 0
@@ -82,30 +198,17 @@ class SolanaClient:
     async def send_transaction(self, transaction_base64: str) -> Dict:
         """Send a transaction to the Solana blockchain"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.rpc_url,
-                    json={
-                        "jsonrpc": "2.0",
-                        "id": 1,
-                        "method": "sendTransaction",
-                        "params": [
-                            transaction_base64,
-                            {"encoding": "base64", "preflightCommitment": "confirmed"}
-                        ]
-                    }
-                )
-                
-                if response.status_code != 200:
-                    logger.error(f"Error sending transaction: {response.text}")
-                    return {"success": False, "error": response.text}
-                
-                data = response.json()
-                if "error" in data:
-                    logger.error(f"Transaction error: {data['error']}")
-                    return {"success": False, "error": data["error"]}
-                
-                return {"success": True, "signature": data.get("result")}
+            # Hedge the send: a duplicate of the same signed transaction is harmless
+            data = await self.router.call(
+                "sendTransaction",
+                [transaction_base64, {"encoding": "base64", "preflightCommitment": "confirmed"}],
+                hedge=True
+            )
+            if "error" in data:
+                logger.error(f"Transaction error: {data['error']}")
+                return {"success": False, "error": data["error"]}
+            
+            return {"success": True, "signature": data.get("result")}
         except Exception as e:
             logger.error(f"Error sending transaction: {str(e)}")
             return {"success": False, "error": str(e)}
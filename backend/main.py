@@ -1,9 +1,20 @@
 from fastapi import FastAPI, Depends, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from backend.routers import auth, wallets, opportunities, trades, settings, dashboard, bot_status, risk
-from backend.db.database import get_db, Base, engine
+from backend.db.database import get_db, Base, engine, SessionLocal
+from backend.db import models
 from sqlalchemy.orm import Session
 from backend.realtime.websocket_server import WebSocketServer
+from backend.integrations.http_session import http_session_manager
+from backend.integrations.raydium_client import raydium_pool_registry
+from backend.integrations.orca_client import orca_pool_registry
+from backend.integrations.meteora_client import meteora_pool_registry
+from backend.integrations.balance_service import balance_service
+from backend.integrations.circuit_breaker import dex_breakers
+from backend.realtime.account_stream import account_stream
+from backend.integrations.chain_prefetcher import chain_prefetcher
+from backend.db.opportunity_store import ensure_active_opportunity_index, opportunity_sweeper
+from backend.arbitrage.engine import close_arbitrage_engine
 import logging
 import os
 import asyncio
@@ -26,6 +37,7 @@ logger = logging.getLogger("arbitrage_bot")
 # Create database tables
 try:
     Base.metadata.create_all(bind=engine)
+    ensure_active_opportunity_index(engine)
     logger.info("Database tables created successfully")
 except Exception as e:
     logger.error(f"Error creating database tables: {str(e)}")
@@ -69,8 +81,32 @@ async def health_check(db: Session = Depends(get_db)):
         logger.error(f"Health check failed: {str(e)}")
         return {"status": "unhealthy", "error": str(e)}
 
+def active_wallet_addresses():
+    db = SessionLocal()
+    try:
+        return [address for (address,) in db.query(models.Wallet.address).filter(models.Wallet.is_active == True)]
+    finally:
+        db.close()
+
 @app.on_event("startup")
 async def startup_event():
+    # Open the shared HTTP connection pool
+    await http_session_manager.get_session()
+    
+    # Serve DEX pools from their snapshots and keep them current in the background
+    raydium_pool_registry.start()
+    orca_pool_registry.start()
+    meteora_pool_registry.start()
+    
+    # Keep on-chain wallet balances cached for risk checks and the wallets API
+    balance_service.start(active_wallet_addresses)
+    
+    # Keep a recent blockhash and priority fees ready for the execution path
+    chain_prefetcher.start()
+    
+    # Expire opportunities the scans stopped refreshing
+    opportunity_sweeper.start()
+    
     # Start WebSocket server
     try:
         websocket_port = int(os.getenv("WEBSOCKET_PORT", 8765))
@@ -79,6 +115,20 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Failed to start WebSocket server: {str(e)}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Stop background refreshes before closing pooled HTTP connections
+    await raydium_pool_registry.stop()
+    await orca_pool_registry.stop()
+    await meteora_pool_registry.stop()
+    await balance_service.stop()
+    dex_breakers.stop()
+    await account_stream.stop()
+    await chain_prefetcher.stop()
+    await opportunity_sweeper.stop()
+    await close_arbitrage_engine()
+    await http_session_manager.close()
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
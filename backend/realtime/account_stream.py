@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import base64
+import struct
+import asyncio
+import logging
+import websockets
+from typing import Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from ..integrations.pool_registry import PoolRegistry
+from ..integrations.pool_stream import PoolRecord
+from ..integrations.rpc_router import SOLANA_RPC_URLS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("account_stream")
+
+# Load environment variables
+load_dotenv()
+
+# WebSocket endpoint of the RPC node; defaults to the first RPC endpoint with a ws scheme
+SOLANA_WS_URL = os.getenv("SOLANA_WS_URL", SOLANA_RPC_URLS[0].replace("https://", "wss://").replace("http://", "ws://"))
+ACCOUNT_STREAM_COMMITMENT = os.getenv("ACCOUNT_STREAM_COMMITMENT", "processed")
+ACCOUNT_STREAM_RECONNECT_DELAY = float(os.getenv("ACCOUNT_STREAM_RECONNECT_DELAY", 1))
+ACCOUNT_STREAM_MAX_RECONNECT_DELAY = float(os.getenv("ACCOUNT_STREAM_MAX_RECONNECT_DELAY", 30))
+
+WHIRLPOOL_PROGRAM_ID = "whirLbMiicVdio4qvUfM5KAg6Ct8VwpYzGff3uctyCc"
+
+# SPL token account: mint (32), owner (32), amount (u64)
+TOKEN_ACCOUNT_AMOUNT_OFFSET = 64
+# Whirlpool account: discriminator (8), config (32), bump (1), tick spacing (2), seed (2),
+# fee rate (2), protocol fee rate (2), liquidity (u128), sqrt price (u128, Q64.64)
+WHIRLPOOL_LIQUIDITY_OFFSET = 49
+WHIRLPOOL_SQRT_PRICE_OFFSET = 65
+
+# Called with the DEX name, the updated pool and the slot of the change
+PoolListener = Callable[[str, PoolRecord, int], None]
+
+def decode_token_amount(data: bytes) -> int:
+    """Raw token amount held by an SPL token account"""
+    return struct.unpack_from("<Q", data, TOKEN_ACCOUNT_AMOUNT_OFFSET)[0]
+
+def _u128(data: bytes, offset: int) -> int:
+    low, high = struct.unpack_from("<QQ", data, offset)
+    return low | (high << 64)
+
+def decode_whirlpool(data: bytes) -> Tuple[int, int]:
+    """Liquidity and Q64.64 sqrt price of a whirlpool account"""
+    return _u128(data, WHIRLPOOL_LIQUIDITY_OFFSET), _u128(data, WHIRLPOOL_SQRT_PRICE_OFFSET)
+
+def _account_data(account: Dict) -> Optional[bytes]:
+    data = account.get("data")
+    if isinstance(data, list) and len(data) == 2 and data[1] == "base64":
+        return base64.b64decode(data[0])
+    return None
+
+class AccountStream:
+    """
+    Keeps pool state current from accountSubscribe / programSubscribe notifications.
+    Vault balances of constant product pools and whirlpool liquidity/price are decoded
+    as they arrive and written into the pool registries' records, so the DEX clients
+    price from on-chain state without polling. Listeners are told about every change.
+    """
+    def __init__(self, ws_url: str = SOLANA_WS_URL, commitment: str = ACCOUNT_STREAM_COMMITMENT,
+                 record_path: Optional[str] = None):
+        self.ws_url = ws_url
+        self.commitment = commitment
+        self.record_path = record_path
+        # Decoders for each watched account
+        self.account_handlers: Dict[str, Callable[[bytes, int], None]] = {}
+        self.programs: Dict[str, Optional[List[Dict]]] = {}
+        self.listeners: List[PoolListener] = []
+        self.subscriptions: Dict[int, str] = {}  # Subscription id -> pubkey or program id
+        self.pending: Dict[int, str] = {}  # Request id -> pubkey or program id
+        self.next_request_id = 1
+        self.websocket = None
+        self.task: Optional[asyncio.Task] = None
+        self.notifications = 0
+        self.last_notification_at: Optional[float] = None
+        self._record_file = None
+
+    def add_listener(self, listener: PoolListener):
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def _notify(self, dex_name: str, pool: PoolRecord, slot: int):
+        for listener in self.listeners:
+            try:
+                listener(dex_name, pool, slot)
+            except Exception as e:
+                logger.error(f"Error in pool update listener: {str(e)}")
+
+    def watch_vault_pool(self, dex_name: str, registry: PoolRegistry, pool: PoolRecord):
+        """Follow a constant product pool through the token accounts holding its reserves"""
+        if not pool.base_vault or not pool.quote_vault:
+            return
+        base_mint, quote_mint = pool.base_mint, pool.quote_mint
+
+        def handler(is_base: bool, decimals: int):
+            def handle(data: bytes, slot: int):
+                # Look the pool up each time; the registry swaps in new records on refresh
+                current = registry.get_pool(base_mint, quote_mint)
+                if current is None:
+                    return
+                reserve = decode_token_amount(data) / 10 ** decimals
+                if is_base:
+                    current.base_reserve = reserve
+                else:
+                    current.quote_reserve = reserve
+                if current.base_reserve > 0:
+                    current.price = current.quote_reserve / current.base_reserve
+                self._notify(dex_name, current, slot)
+            return handle
+
+        self._watch_account(pool.base_vault, handler(True, pool.base_decimals))
+        self._watch_account(pool.quote_vault, handler(False, pool.quote_decimals))
+
+    def watch_whirlpool(self, dex_name: str, registry: PoolRegistry, pool: PoolRecord):
+        """Follow a concentrated liquidity pool through its whirlpool account"""
+        if not pool.address:
+            return
+        base_mint, quote_mint = pool.base_mint, pool.quote_mint
+
+        def handle(data: bytes, slot: int):
+            current = registry.get_pool(base_mint, quote_mint)
+            if current is None:
+                return
+            liquidity, sqrt_price_x64 = decode_whirlpool(data)
+            current.liquidity = float(liquidity)
+            current.sqrt_price = sqrt_price_x64 / 2 ** 64
+            current.price = current.sqrt_price ** 2 * 10 ** (current.base_decimals - current.quote_decimals)
+            self._notify(dex_name, current, slot)
+
+        self._watch_account(pool.address, handle)
+
+    def watch_program(self, program_id: str, filters: Optional[List[Dict]] = None):
+        """
+        Subscribe to every account of a program matching the filters.
+        Notifications are decoded for watched accounts only, so one program
+        subscription can replace many account subscriptions.
+        """
+        self.programs[program_id] = filters
+        if self.websocket is not None:
+            asyncio.create_task(self._subscribe_program(program_id))
+
+    def _watch_account(self, pubkey: str, handler: Callable[[bytes, int], None]):
+        new = pubkey not in self.account_handlers
+        self.account_handlers[pubkey] = handler
+        if new and self.websocket is not None:
+            asyncio.create_task(self._subscribe_account(pubkey))
+
+    async def _send(self, method: str, params: List, key: str):
+        request_id = self.next_request_id
+        self.next_request_id += 1
+        self.pending[request_id] = key
+        await self.websocket.send(json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}))
+
+    async def _subscribe_account(self, pubkey: str):
+        await self._send("accountSubscribe", [pubkey, {"encoding": "base64", "commitment": self.commitment}], pubkey)
+
+    async def _subscribe_program(self, program_id: str):
+        config = {"encoding": "base64", "commitment": self.commitment}
+        if self.programs.get(program_id):
+            config["filters"] = self.programs[program_id]
+        await self._send("programSubscribe", [program_id, config], program_id)
+
+    def _dispatch(self, pubkey: str, account: Dict, slot: int):
+        handler = self.account_handlers.get(pubkey)
+        if handler is None:
+            return
+        data = _account_data(account)
+        if data is None:
+            return
+        if self._record_file is not None:
+            self._record_file.write(json.dumps({
+                "t": time.time(), "pubkey": pubkey, "slot": slot, "data": account["data"][0], "owner": account.get("owner")
+            }) + "\n")
+        handler(data, slot)
+
+    def handle_message(self, message: Dict):
+        """Route one message from the node"""
+        if "id" in message and message["id"] in self.pending:
+            key = self.pending.pop(message["id"])
+            if "result" in message:
+                self.subscriptions[message["result"]] = key
+            else:
+                logger.error(f"Subscription to {key} failed: {message.get('error')}")
+            return
+
+        method = message.get("method")
+        params = message.get("params", {})
+        result = params.get("result", {})
+        slot = result.get("context", {}).get("slot", 0)
+        try:
+            if method == "accountNotification":
+                pubkey = self.subscriptions.get(params.get("subscription"))
+                if pubkey is not None:
+                    self._dispatch(pubkey, result.get("value") or {}, slot)
+            elif method == "programNotification":
+                value = result.get("value") or {}
+                self._dispatch(value.get("pubkey"), value.get("account") or {}, slot)
+            else:
+                return
+        except (struct.error, ValueError) as e:
+            logger.error(f"Error decoding account update: {str(e)}")
+            return
+        self.notifications += 1
+        self.last_notification_at = time.time()
+
+    async def run(self):
+        """Stay subscribed until cancelled, reconnecting with backoff"""
+        delay = ACCOUNT_STREAM_RECONNECT_DELAY
+        while True:
+            try:
+                async with websockets.connect(self.ws_url, max_size=None) as websocket:
+                    self.websocket = websocket
+                    self.subscriptions.clear()
+                    self.pending.clear()
+                    for pubkey in list(self.account_handlers):
+                        await self._subscribe_account(pubkey)
+                    for program_id in list(self.programs):
+                        await self._subscribe_program(program_id)
+                    logger.info(
+                        f"Account stream connected to {self.ws_url}: "
+                        f"{len(self.account_handlers)} accounts, {len(self.programs)} programs"
+                    )
+                    delay = ACCOUNT_STREAM_RECONNECT_DELAY
+
+                    async for raw in websocket:
+                        self.handle_message(json.loads(raw))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Account stream disconnected: {str(e)}")
+            finally:
+                self.websocket = None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, ACCOUNT_STREAM_MAX_RECONNECT_DELAY)
+
+    def start(self):
+        """Start the subscription task if it is not running"""
+        if self.record_path and self._record_file is None:
+            self._record_file = open(self.record_path, "a")
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+            logger.info(f"Started account stream on {self.ws_url}")
+
+    async def stop(self):
+        """Stop the subscription task"""
+        if self.task and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.task = None
+        if self._record_file is not None:
+            self._record_file.close()
+            self._record_file = None
+
+    def get_stats(self) -> Dict:
+        return {
+            "connected": self.websocket is not None,
+            "accounts": len(self.account_handlers),
+            "programs": len(self.programs),
+            "subscriptions": len(self.subscriptions),
+            "notifications": self.notifications,
+            "last_notification_at": self.last_notification_at
+        }
+
+# Shared stream; pools are added as the price feed learns which pairs to follow
+account_stream = AccountStream()
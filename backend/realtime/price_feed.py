@@ -1,26 +1,39 @@
+import os
 import asyncio
 import json
 import logging
 import websockets
-from typing import Dict, List, Set, Callable, Any
+from typing import Dict, List, Optional, Set, Callable, Any
 import time
 from decimal import Decimal
 from sqlalchemy.orm import Session
-from ..db import models
+from ..db.reference_cache import reference_cache
 from ..integrations.jupiter_client import JupiterClient
+from ..integrations.pool_registry import PoolRegistry, pair_key
+from ..integrations.pool_stream import PoolRecord
+from .account_stream import AccountStream
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("price_feed")
 
+# "poll" quotes every pair from Jupiter; "push" follows pool accounts on-chain where a pool is known
+PRICE_FEED_MODE = os.getenv("PRICE_FEED_MODE", "poll")
+
 class PriceFeed:
     def __init__(self, db: Session):
         self.db = db
         self.jupiter_client = JupiterClient()
         self.token_pairs: Set[tuple] = set()  # Set of (input_mint, output_mint) pairs to monitor
         self.price_subscribers: Dict[tuple, List[Callable]] = {}  # Callbacks for price updates
+        self.global_subscribers: List[Callable] = []  # Callbacks for updates of every pair
         self.prices: Dict[tuple, Dict] = {}  # Latest prices for each pair
+        self.source_prices: Dict[tuple, Dict[str, float]] = {}  # Latest price of each pair per source
         self.update_interval = 5  # Seconds between price updates
+        self.pushed_at: Dict[tuple, float] = {}  # When each pair last got an on-chain update
+        self.stream: Optional[AccountStream] = None
+        self.registries: Dict[str, PoolRegistry] = {}
+        self.watched_pairs: Set[tuple] = set()  # Pair keys whose pool is followed on-chain
         self.is_running = False
         self.task = None
         logger.info("Initialized Price Feed")
@@ -32,6 +45,8 @@ class PriceFeed:
         if pair not in self.price_subscribers:
             self.price_subscribers[pair] = []
         logger.info(f"Added token pair to monitor: {input_mint} -> {output_mint}")
+        if self.stream is not None:
+            self.watch_known_pools()
     
     def remove_token_pair(self, input_mint: str, output_mint: str):
         """Remove a token pair from monitoring"""
@@ -42,6 +57,7 @@ class PriceFeed:
             del self.price_subscribers[pair]
         if pair in self.prices:
             del self.prices[pair]
+        self.source_prices.pop(pair, None)
         logger.info(f"Removed token pair from monitoring: {input_mint} -> {output_mint}")
     
     def subscribe(self, input_mint: str, output_mint: str, callback: Callable):
@@ -56,6 +72,11 @@ class PriceFeed:
         self.price_subscribers[pair].append(callback)
         logger.info(f"Added subscriber for {input_mint} -> {output_mint}")
     
+    def subscribe_all(self, callback: Callable):
+        """Subscribe to price updates of every pair; callbacks get the pair and its price data"""
+        if callback not in self.global_subscribers:
+            self.global_subscribers.append(callback)
+    
     def unsubscribe(self, input_mint: str, output_mint: str, callback: Callable):
         """Unsubscribe from price updates for a token pair"""
         pair = (input_mint, output_mint)
@@ -63,29 +84,111 @@ class PriceFeed:
             self.price_subscribers[pair].remove(callback)
             logger.info(f"Removed subscriber for {input_mint} -> {output_mint}")
     
+    def update_price(self, pair: tuple, price_data: Dict):
+        """Store a new price for a pair and notify its subscribers"""
+        # Pool spot prices and Jupiter quotes differ by fees and routing, so a price
+        # only moves relative to the last one from the same source
+        source = price_data.get("source", "Jupiter")
+        source_prices = self.source_prices.setdefault(pair, {})
+        old_price = source_prices.get(source, 0)
+        source_prices[source] = price_data["price"]
+        self.prices[pair] = price_data
+        
+        # Calculate price change percentage
+        if old_price > 0:
+            price_change_pct = (price_data["price"] - old_price) / old_price * 100
+            self.prices[pair]["price_change_pct"] = price_change_pct
+        
+        # Notify subscribers
+        callbacks = [(callback, (self.prices[pair],)) for callback in self.price_subscribers.get(pair, [])]
+        callbacks += [(callback, (pair, self.prices[pair])) for callback in self.global_subscribers]
+        for callback, args in callbacks:
+            try:
+                result = callback(*args)
+                # Async subscribers (e.g. the WebSocket server) get their own task
+                if asyncio.iscoroutine(result):
+                    asyncio.create_task(result)
+            except Exception as e:
+                logger.error(f"Error in price subscriber callback: {str(e)}")
+    
+    def on_pool_update(self, dex_name: str, pool: PoolRecord, slot: int):
+        """Push the spot price of an updated pool, in UI units, to both directions of its pair"""
+        if pool.price <= 0:
+            return
+        now = time.monotonic()
+        for input_mint, output_mint, price in (
+            (pool.base_mint, pool.quote_mint, pool.price),
+            (pool.quote_mint, pool.base_mint, 1 / pool.price)
+        ):
+            pair = (input_mint, output_mint)
+            if pair not in self.token_pairs:
+                continue
+            self.pushed_at[pair] = now
+            self.update_price(pair, {
+                "inputMint": input_mint,
+                "outputMint": output_mint,
+                "price": price,
+                "source": dex_name,
+                "slot": slot,
+                "timestamp": time.time()
+            })
+    
+    def watch_pools(self, stream: AccountStream, registries: Dict[str, PoolRegistry]):
+        """
+        Follow the pools of the monitored pairs through account subscriptions.
+        Pairs without a known pool keep being polled until a registry refresh turns one up.
+        """
+        self.stream = stream
+        self.registries = registries
+        stream.add_listener(self.on_pool_update)
+        for registry in registries.values():
+            registry.add_listener(self.on_registry_refresh)
+        self.watch_known_pools()
+        stream.start()
+    
+    def on_registry_refresh(self, registry: PoolRegistry):
+        """Subscribe pools that a snapshot load or index refresh made known"""
+        self.watch_known_pools()
+    
+    def watch_known_pools(self) -> int:
+        """
+        Subscribe the pool of every monitored pair that is not followed yet
+        Returns the number of pools subscribed
+        """
+        watched = 0
+        for input_mint, output_mint in list(self.token_pairs):
+            key = pair_key(input_mint, output_mint)
+            if key in self.watched_pairs:
+                continue
+            for dex_name, registry in self.registries.items():
+                pool = registry.get_pool(input_mint, output_mint)
+                if pool is None:
+                    continue
+                if pool.sqrt_price > 0:
+                    self.stream.watch_whirlpool(dex_name, registry, pool)
+                else:
+                    self.stream.watch_vault_pool(dex_name, registry, pool)
+                self.watched_pairs.add(key)
+                watched += 1
+                break
+        if watched:
+            logger.info(f"Following {watched} more pools on-chain ({len(self.watched_pairs)} pairs in total)")
+        return watched
+    
     async def fetch_prices(self):
         """Fetch prices for all monitored token pairs"""
+        now = time.monotonic()
         for input_mint, output_mint in self.token_pairs:
+            # Pairs followed on-chain only fall back to polling when their updates stop
+            pushed_at = self.pushed_at.get((input_mint, output_mint))
+            if pushed_at is not None and now - pushed_at < self.update_interval * 2:
+                continue
             try:
                 price_data = await self.jupiter_client.get_price(input_mint, output_mint)
                 
                 if "price" in price_data and price_data["price"] > 0:
-                    pair = (input_mint, output_mint)
-                    old_price = self.prices.get(pair, {}).get("price", 0)
-                    self.prices[pair] = price_data
-                    
-                    # Calculate price change percentage
-                    if old_price > 0:
-                        price_change_pct = (price_data["price"] - old_price) / old_price * 100
-                        self.prices[pair]["price_change_pct"] = price_change_pct
-                    
-                    # Notify subscribers
-                    if pair in self.price_subscribers:
-                        for callback in self.price_subscribers[pair]:
-                            try:
-                                callback(self.prices[pair])
-                            except Exception as e:
-                                logger.error(f"Error in price subscriber callback: {str(e)}")
+                    price_data["source"] = "Jupiter"
+                    self.update_price((input_mint, output_mint), price_data)
             except Exception as e:
                 logger.error(f"Error fetching price for {input_mint} -> {output_mint}: {str(e)}")
     
@@ -122,15 +225,22 @@ class PriceFeed:
     async def initialize_from_db(self):
         """Initialize token pairs to monitor from the database"""
         try:
+            reference = reference_cache.get(self.db)
+            
             # Get all tokens
-            tokens = self.db.query(models.Token).all()
+            tokens = reference.tokens
             
             # Get USDC token for price comparison
-            usdc_token = self.db.query(models.Token).filter(models.Token.symbol == "USDC").first()
+            usdc_token = reference.usdc
             if not usdc_token:
                 logger.error("USDC token not found in database")
                 return
             
+            # Quotes come in smallest units; the decimals turn them into UI-unit prices
+            self.jupiter_client.set_token_decimals({
+                token.mint_address: token.decimals for token in tokens if token.decimals is not None
+            })
+            
             # Add all token/USDC pairs to monitor
             for token in tokens:
                 if token.symbol != "USDC":  # Skip USDC/USDC pair
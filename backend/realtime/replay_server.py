@@ -0,0 +1,175 @@
+"""
+Local stand-in for the Solana WebSocket API that replays recorded account updates.
+
+Usage:
+    python -m backend.realtime.replay_server --recording account_updates.jsonl --port 8900
+    python -m backend.realtime.replay_server --recording account_updates.jsonl --speed 0 --loop
+
+Recordings are JSON lines of {"t", "pubkey", "slot", "data" (base64), "owner"}, as written by
+AccountStream(record_path=...). Point the bot at the server with SOLANA_WS_URL=ws://127.0.0.1:8900.
+"""
+import json
+import time
+import base64
+import struct
+import asyncio
+import argparse
+import logging
+import websockets
+from typing import Callable, Dict, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("replay_server")
+
+def load_recording(path: str) -> List[Dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def token_account_data(amount: int, mint: bytes = b"\0" * 32, owner: bytes = b"\0" * 32) -> str:
+    """Base64 SPL token account data holding amount, for synthetic recordings"""
+    return base64.b64encode(mint + owner + struct.pack("<Q", amount) + b"\0" * 93).decode()
+
+class ReplayServer:
+    """
+    Answers accountSubscribe/programSubscribe like an RPC node and sends the recorded
+    updates of subscribed accounts as notifications, keeping the recorded spacing
+    scaled by speed (0 sends as fast as possible).
+    """
+    def __init__(self, records: List[Dict], speed: float = 1.0,
+                 on_send: Optional[Callable[[Dict], None]] = None):
+        self.records = records
+        self.speed = speed
+        self.on_send = on_send
+        self.clients: Dict[object, Dict[str, Dict[str, int]]] = {}
+        self.next_subscription = 1
+        self.sent = 0
+        self.server = None
+        self.url: Optional[str] = None
+        self.subscribed = asyncio.Event()
+
+    async def handle(self, websocket, path: Optional[str] = None):
+        state = {"accounts": {}, "programs": {}}
+        self.clients[websocket] = state
+        try:
+            async for raw in websocket:
+                request = json.loads(raw)
+                method = request.get("method")
+                params = request.get("params", [])
+                response = {"jsonrpc": "2.0", "id": request.get("id")}
+                if method in ("accountSubscribe", "programSubscribe"):
+                    subscription = self.next_subscription
+                    self.next_subscription += 1
+                    kind = "accounts" if method == "accountSubscribe" else "programs"
+                    state[kind][params[0]] = subscription
+                    response["result"] = subscription
+                    self.subscribed.set()
+                elif method in ("accountUnsubscribe", "programUnsubscribe"):
+                    for subscriptions in state.values():
+                        for key, subscription in list(subscriptions.items()):
+                            if subscription == params[0]:
+                                del subscriptions[key]
+                    response["result"] = True
+                else:
+                    response["error"] = {"code": -32601, "message": "Method not found"}
+                await websocket.send(json.dumps(response))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self.clients.pop(websocket, None)
+
+    def _notification(self, record: Dict, state: Dict[str, Dict[str, int]]) -> Optional[str]:
+        account = {
+            "data": [record["data"], "base64"],
+            "executable": False,
+            "lamports": 2039280,
+            "owner": record.get("owner"),
+            "rentEpoch": 0
+        }
+        context = {"slot": record.get("slot", 0)}
+        if record["pubkey"] in state["accounts"]:
+            return json.dumps({
+                "jsonrpc": "2.0",
+                "method": "accountNotification",
+                "params": {
+                    "result": {"context": context, "value": account},
+                    "subscription": state["accounts"][record["pubkey"]]
+                }
+            })
+        if record.get("owner") in state["programs"]:
+            return json.dumps({
+                "jsonrpc": "2.0",
+                "method": "programNotification",
+                "params": {
+                    "result": {"context": context, "value": {"pubkey": record["pubkey"], "account": account}},
+                    "subscription": state["programs"][record["owner"]]
+                }
+            })
+        return None
+
+    async def replay(self):
+        """Send every recorded update once to the clients subscribed to it"""
+        start = time.monotonic()
+        first_t = self.records[0].get("t", 0) if self.records else 0
+        for record in self.records:
+            if self.speed > 0:
+                delay = (record.get("t", first_t) - first_t) / self.speed - (time.monotonic() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            for websocket, state in list(self.clients.items()):
+                message = self._notification(record, state)
+                if message is None:
+                    continue
+                if self.on_send is not None:
+                    self.on_send(record)
+                try:
+                    await websocket.send(message)
+                    self.sent += 1
+                except websockets.exceptions.ConnectionClosed:
+                    pass
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving; port 0 picks a free port. Returns the WebSocket URL."""
+        self.server = await websockets.serve(self.handle, host, port, max_size=None)
+        bound_port = list(self.server.sockets)[0].getsockname()[1]
+        self.url = f"ws://{host}:{bound_port}"
+        logger.info(f"Replay server listening on {self.url} with {len(self.records)} updates")
+        return self.url
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+async def serve(args: argparse.Namespace):
+    server = ReplayServer(load_recording(args.recording), speed=args.speed)
+    await server.start(args.host, args.port)
+    try:
+        while True:
+            # Give the client a moment to send all of its subscriptions
+            await server.subscribed.wait()
+            await asyncio.sleep(args.start_delay)
+            await server.replay()
+            logger.info(f"Replayed {server.sent} notifications")
+            if not args.loop:
+                server.subscribed.clear()
+    finally:
+        await server.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recording", required=True, help="JSON lines of recorded account updates")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier; 0 for no delays")
+    parser.add_argument("--start-delay", type=float, default=0.5, help="Seconds between the first subscription and the replay")
+    parser.add_argument("--loop", action="store_true", help="Replay the recording repeatedly")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
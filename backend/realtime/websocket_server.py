@@ -5,7 +5,10 @@ import websockets
 from typing import Dict, Set, Any
 from sqlalchemy.orm import Session
 from ..db.database import get_db
-from ..realtime.price_feed import PriceFeed
+from ..realtime.price_feed import PriceFeed, PRICE_FEED_MODE
+from ..realtime.account_stream import account_stream
+from ..integrations.raydium_client import raydium_pool_registry
+from ..integrations.orca_client import orca_pool_registry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -131,6 +134,11 @@ class WebSocketServer:
         # Initialize price feed
         self.price_feed = PriceFeed(self.db)
         await self.price_feed.initialize_from_db()
+        if PRICE_FEED_MODE == "push":
+            self.price_feed.watch_pools(account_stream, {
+                "Raydium": raydium_pool_registry,
+                "Orca": orca_pool_registry
+            })
         self.price_feed.start_background_task()
         
         # Start WebSocket server
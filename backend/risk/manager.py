@@ -3,6 +3,8 @@ from decimal import Decimal
 from typing import Dict, Optional
 from sqlalchemy.orm import Session
 from ..db import models
+from ..db.reference_cache import reference_cache
+from ..integrations.balance_service import balance_service
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -33,12 +35,9 @@ class RiskManager:
                 }
             
             # Get user settings
-            trading_settings = self.db.query(models.Setting).filter(
-                models.Setting.user_id == user_id,
-                models.Setting.category == "trading"
-            ).first()
+            settings = reference_cache.get_settings(user_id, "trading", self.db)
             
-            if not trading_settings:
+            if settings is None:
                 logger.error(f"Trading settings not found for user {user_id}")
                 return {
                     "risk_score": 8,
@@ -46,7 +45,6 @@ class RiskManager:
                     "can_execute": False
                 }
             
-            settings = trading_settings.settings
             user_risk_level = int(settings.get("risk_level", 5))  # 1-10 scale
             min_profit_threshold = Decimal(settings.get("min_profit_threshold", 0.25))
             
@@ -63,7 +61,8 @@ class RiskManager:
             
             # Factor 2: Token liquidity (mock implementation)
             # In a real system, you would check actual liquidity on DEXes
-            token = self.db.query(models.Token).filter(models.Token.id == opportunity.token_id).first()
+            reference = reference_cache.get(self.db)
+            token = reference.tokens_by_id.get(opportunity.token_id)
             if token:
                 if token.symbol == "SOL":
                     risk_score -= 1  # SOL is highly liquid
@@ -74,8 +73,8 @@ class RiskManager:
             
             # Factor 3: DEX reliability (mock implementation)
             # In a real system, you would check DEX reliability metrics
-            buy_dex = self.db.query(models.Dex).filter(models.Dex.id == opportunity.buy_dex_id).first()
-            sell_dex = self.db.query(models.Dex).filter(models.Dex.id == opportunity.sell_dex_id).first()
+            buy_dex = reference.dexes_by_id.get(opportunity.buy_dex_id)
+            sell_dex = reference.dexes_by_id.get(opportunity.sell_dex_id)
             
             if buy_dex and buy_dex.name == "Jupiter":
                 risk_score -= 1  # Jupiter is reliable
@@ -135,12 +134,34 @@ class RiskManager:
                     "diversification_score": 0
                 }
             
-            # Get token balances
-            token_balances = self.db.query(models.TokenBalance).filter(
-                models.TokenBalance.wallet_id.in_(wallet_ids)
-            ).all()
-            
-            if not token_balances:
+            # Prefer cached on-chain balances; fall back to stored balances for wallets not cached yet
+            onchain_balances = {}
+            uncached_wallet_ids = []
+            for wallet in wallets:
+                balances = balance_service.get_balances(wallet.address)
+                if balances is None:
+                    uncached_wallet_ids.append(wallet.id)
+                    continue
+                for mint, amount in balances.items():
+                    onchain_balances[mint] = onchain_balances.get(mint, 0) + amount
+            
+            reference = reference_cache.get(self.db)
+            token_amounts = []
+            for mint, amount in onchain_balances.items():
+                token = reference.tokens_by_mint.get(mint)
+                if token:
+                    token_amounts.append((token, Decimal(str(amount))))
+            
+            if uncached_wallet_ids:
+                token_balances = self.db.query(models.TokenBalance).filter(
+                    models.TokenBalance.wallet_id.in_(uncached_wallet_ids)
+                ).all()
+                for balance in token_balances:
+                    token = reference.tokens_by_id.get(balance.token_id)
+                    if token:
+                        token_amounts.append((token, balance.balance))
+            
+            if not token_amounts:
                 return {
                     "risk_level": "Unknown",
                     "recommendation": "No token balances found",
@@ -151,26 +172,24 @@ class RiskManager:
             total_value_usd = Decimal("0")
             token_values = {}
             
-            for balance in token_balances:
-                token = self.db.query(models.Token).filter(models.Token.id == balance.token_id).first()
-                if token:
-                    # In a real implementation, you would get current token prices
-                    # For now, we'll use mock prices
-                    price_usd = Decimal("0")
-                    if token.symbol == "SOL":
-                        price_usd = Decimal("100")
-                    elif token.symbol == "USDC":
-                        price_usd = Decimal("1")
-                    elif token.symbol == "BONK":
-                        price_usd = Decimal("0.00000125")
-                    elif token.symbol == "RAY":
-                        price_usd = Decimal("0.78")
-                    elif token.symbol == "JTO":
-                        price_usd = Decimal("2.34")
-                    
-                    value_usd = balance.balance * price_usd
-                    token_values[token.symbol] = value_usd
-                    total_value_usd += value_usd
+            for token, amount in token_amounts:
+                # In a real implementation, you would get current token prices
+                # For now, we'll use mock prices
+                price_usd = Decimal("0")
+                if token.symbol == "SOL":
+                    price_usd = Decimal("100")
+                elif token.symbol == "USDC":
+                    price_usd = Decimal("1")
+                elif token.symbol == "BONK":
+                    price_usd = Decimal("0.00000125")
+                elif token.symbol == "RAY":
+                    price_usd = Decimal("0.78")
+                elif token.symbol == "JTO":
+                    price_usd = Decimal("2.34")
+                
+                value_usd = amount * price_usd
+                token_values[token.symbol] = token_values.get(token.symbol, Decimal("0")) + value_usd
+                total_value_usd += value_usd
             
             # Calculate concentration risk
             max_concentration = Decimal("0")
@@ -3,9 +3,14 @@ from sqlalchemy.orm import Session
 from datetime import datetime
 from ..db.database import get_db
 from ..db import models
+from ..db.reference_cache import reference_cache
 from ..schemas import BotStatusUpdate, BotStatusResponse
 from ..auth import get_current_active_user
-from ..arbitrage.engine import ArbitrageEngine
+from ..arbitrage.engine import get_arbitrage_engine
+from ..integrations.rate_limiter import rate_limiter
+from ..integrations.circuit_breaker import dex_breakers
+from ..integrations.rpc_router import rpc_router
+from ..integrations.chain_prefetcher import chain_prefetcher
 import asyncio
 import logging
 
@@ -23,7 +28,7 @@ bot_status = {
 
 # Background task for continuous arbitrage scanning
 async def continuous_scan(user_id: int, db: Session):
-    engine = ArbitrageEngine(db)
+    engine = get_arbitrage_engine()
     
     while bot_status["active"]:
         try:
@@ -31,12 +36,9 @@ async def continuous_scan(user_id: int, db: Session):
             await engine.find_arbitrage_opportunities(user_id)
             
             # Get trading settings
-            trading_settings = db.query(models.Setting).filter(
-                models.Setting.user_id == user_id,
-                models.Setting.category == "trading"
-            ).first()
+            trading_settings = reference_cache.get_settings(user_id, "trading", db)
             
-            if trading_settings and trading_settings.settings.get("auto_execute", False):
+            if trading_settings and trading_settings.get("auto_execute", False):
                 # Get active opportunities
                 opportunities = db.query(models.Opportunity).filter(
                     models.Opportunity.status == "active"
@@ -90,3 +92,23 @@ async def update_bot_status(
         active=bot_status["active"],
         last_updated=bot_status["last_updated"]
     )
+
+@router.get("/rate-limits")
+async def get_rate_limits(
+    current_user: models.User = Depends(get_current_active_user)
+):
+    # Current per-host request rate, concurrency limit and queue depth
+    return rate_limiter.get_stats()
+
+@router.get("/health")
+async def get_bot_health(
+    current_user: models.User = Depends(get_current_active_user)
+):
+    # Circuit state of each DEX the scanner has used, the RPC endpoint pool, prefetched chain state
+    # and the reference data cache
+    return {
+        "dexes": dex_breakers.get_stats(),
+        "rpc": rpc_router.get_stats(),
+        "chain": chain_prefetcher.get_stats(),
+        "reference_data": reference_cache.get_stats()
+    }
@@ -5,7 +5,8 @@ from ..db.database import get_db
 from ..db import models
 from ..schemas import OpportunityResponse, TradeExecution
 from ..auth import get_current_active_user
-from ..arbitrage.engine import ArbitrageEngine
+from ..arbitrage.engine import get_arbitrage_engine
+from ..arbitrage.cycle_detector import cycle_detector
 
 router = APIRouter(prefix="/opportunities", tags=["Opportunities"])
 
@@ -21,14 +22,25 @@ async def get_opportunities(
     
     return opportunities
 
+@router.get("/cycles")
+async def get_cycles(
+    limit: int = 50,
+    current_user: models.User = Depends(get_current_active_user)
+):
+    # Profitable multi-hop cycles currently in the rate graph
+    return {
+        "cycles": [cycle.to_dict() for cycle in cycle_detector.get_cycles(limit)],
+        "stats": cycle_detector.get_stats()
+    }
+
 @router.post("/scan", response_model=List[OpportunityResponse])
 async def scan_opportunities(
     background_tasks: BackgroundTasks,
     current_user: models.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    # Create arbitrage engine
-    engine = ArbitrageEngine(db)
+    # The shared engine keeps its price feed and scan state between requests
+    engine = get_arbitrage_engine()
     
     # Scan for opportunities in the background
     background_tasks.add_task(engine.find_arbitrage_opportunities, current_user.id)
@@ -67,8 +79,8 @@ async def execute_opportunity(
     if not wallet:
         raise HTTPException(status_code=404, detail="No active wallet found")
     
-    # Create arbitrage engine
-    engine = ArbitrageEngine(db)
+    # The shared engine holds the quotes its scans took, so the swaps can reuse them
+    engine = get_arbitrage_engine()
     
     # Execute arbitrage in the background
     background_tasks.add_task(engine.execute_arbitrage, int(trade_execution.opportunity_id), wallet.id)
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List, Dict, Any
 from ..db.database import get_db
 from ..db import models
+from ..db.reference_cache import reference_cache
 from ..schemas import SettingResponse, SettingUpdate
 from ..auth import get_current_active_user
 
@@ -67,5 +68,6 @@ async def update_category_settings(
     
     db.commit()
     db.refresh(setting)
+    reference_cache.invalidate_settings(current_user.id)
     
     return setting.settings
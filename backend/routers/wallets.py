@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List
 from ..db.database import get_db
 from ..db import models
 from ..schemas import WalletCreate, WalletResponse, TokenBalanceResponse
 from ..auth import get_current_active_user
 from ..utils.encryption import encrypt_data
+from ..integrations.balance_service import balance_service
 
 router = APIRouter(prefix="/wallets", tags=["Wallets"])
 
@@ -86,3 +87,33 @@ async def get_wallet_balances(
     ).all()
     
     return balances
+
+@router.get("/{wallet_id}/onchain-balances")
+async def get_wallet_onchain_balances(
+    wallet_id: int,
+    background_tasks: BackgroundTasks,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> Dict:
+    wallet = db.query(models.Wallet).filter(
+        models.Wallet.id == wallet_id,
+        models.Wallet.user_id == current_user.id
+    ).first()
+    
+    if not wallet:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+    
+    # Answer from the cache; stale balances are refreshed after the response is sent
+    stale = balance_service.is_stale(wallet.address)
+    if stale:
+        background_tasks.add_task(balance_service.refresh, [wallet.address])
+    
+    entry = balance_service.get_entry(wallet.address)
+    return {
+        "wallet_id": wallet.id,
+        "address": wallet.address,
+        "slot": entry.slot if entry else None,
+        "age": entry.age if entry else None,
+        "stale": stale,
+        "balances": dict(entry.balances) if entry else {}
+    }
@@ -0,0 +1,166 @@
+"""
+Local stand-in for a Solana JSON-RPC node, for exercising the RPC router and clients offline.
+
+Usage:
+    python -m backend.simulation.stub_rpc_server --port 8899 --latency 0.05
+    python -m backend.simulation.stub_rpc_server --port 8900 --latency 0.4 --jitter 0.2 --error-rate 0.1
+
+Then point the bot at the stubs with SOLANA_RPC_URLS=http://127.0.0.1:8899,http://127.0.0.1:8900.
+
+Accounts given to the server (e.g. address lookup tables) are served by getMultipleAccounts,
+and simulateTransaction decodes version 0 transactions against them, so a malformed
+transaction or an unknown lookup table fails simulation like it would on a real node.
+"""
+import base64
+import random
+import asyncio
+import argparse
+import logging
+from typing import Any, Callable, Dict, List, Optional, Union
+from aiohttp import web
+from ..integrations.atomic_transaction import (
+    PACKET_DATA_SIZE, decode_compact_u16, decode_lookup_table, decode_transaction
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("stub_rpc_server")
+
+# Canned results for the methods the bot calls; a callable receives the params
+DEFAULT_RESULTS: Dict[str, Any] = {
+    "getBalance": {"context": {"slot": 1}, "value": 1_000_000_000},
+    "getTokenAccountsByOwner": {"context": {"slot": 1}, "value": []},
+    "getLatestBlockhash": {
+        "context": {"slot": 1},
+        "value": {"blockhash": "11111111111111111111111111111111", "lastValidBlockHeight": 150}
+    },
+    "getRecentPrioritizationFees": [{"slot": 1, "prioritizationFee": 1000}],
+    "sendTransaction": "1111111111111111111111111111111111111111111111111111111111111111"
+}
+
+class StubRpcServer:
+    """
+    JSON-RPC server with configurable latency, jitter and failure rate.
+    Handles single calls and batch arrays, and records every call it receives.
+    accounts maps pubkeys to account data served by getMultipleAccounts; unless results
+    overrides them, that method and simulateTransaction are answered from these accounts.
+    """
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 429, results: Optional[Dict[str, Union[Any, Callable[[List], Any]]]] = None,
+                 seed: Optional[int] = None, accounts: Optional[Dict[str, bytes]] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.accounts = dict(accounts or {})
+        self.results = dict(DEFAULT_RESULTS)
+        self.results["getMultipleAccounts"] = self.get_multiple_accounts
+        self.results["simulateTransaction"] = self.simulate_transaction
+        self.results.update(results or {})
+        self.calls: List[Dict] = []
+        self.simulated: List[Dict] = []  # Decoded transactions that simulated successfully
+        self.rng = random.Random(seed)
+        self.runner: Optional[web.AppRunner] = None
+        self.url: Optional[str] = None
+
+    def get_multiple_accounts(self, params: List) -> Dict:
+        return {
+            "context": {"slot": 1},
+            "value": [
+                {
+                    "data": [base64.b64encode(self.accounts[pubkey]).decode(), "base64"],
+                    "executable": False,
+                    "lamports": 1_000_000,
+                    "owner": "AddressLookupTab1e1111111111111111111111111",
+                    "rentEpoch": 0
+                } if pubkey in self.accounts else None
+                for pubkey in params[0]
+            ]
+        }
+
+    def simulate_transaction(self, params: List) -> Dict:
+        """Decode a version 0 transaction and resolve its lookups; the programs themselves are not run"""
+        lookup_tables = {}
+        for pubkey, data in self.accounts.items():
+            addresses = decode_lookup_table(data)
+            if addresses is not None:
+                lookup_tables[pubkey] = addresses
+        value = {"err": None, "logs": [], "accounts": None, "unitsConsumed": 150000}
+        try:
+            raw = base64.b64decode(params[0])
+            signature_count, offset = decode_compact_u16(raw, 0)
+            if not raw[offset + 64 * signature_count] & 0x80:
+                # Legacy transactions are accepted as they are
+                return {"context": {"slot": 1}, "value": value}
+            decoded = decode_transaction(params[0], lookup_tables)
+        except (ValueError, IndexError) as e:
+            return {"context": {"slot": 1}, "value": dict(value, err="InvalidTransaction", logs=[str(e)])}
+        if decoded["size"] > PACKET_DATA_SIZE:
+            return {"context": {"slot": 1}, "value": dict(value, err="TransactionTooLarge")}
+        self.simulated.append(decoded)
+        value["logs"] = [f"Program {instruction['program_id']} invoke [1]" for instruction in decoded["instructions"]]
+        return {"context": {"slot": 1}, "value": value}
+
+    def _respond(self, call: Dict) -> Dict:
+        self.calls.append(call)
+        method = call.get("method")
+        if method not in self.results:
+            return {"jsonrpc": "2.0", "id": call.get("id"), "error": {"code": -32601, "message": "Method not found"}}
+        result = self.results[method]
+        if callable(result):
+            result = result(call.get("params", []))
+        return {"jsonrpc": "2.0", "id": call.get("id"), "result": result}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        delay = self.latency + self.rng.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.rng.random() < self.error_rate:
+            return web.Response(status=self.error_status, text="Stub RPC error")
+
+        if isinstance(payload, list):
+            return web.json_response([self._respond(call) for call in payload])
+        return web.json_response(self._respond(payload))
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving; port 0 picks a free port. Returns the endpoint URL."""
+        app = web.Application()
+        app.router.add_post("/", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        bound_port = self.runner.addresses[0][1]
+        self.url = f"http://{host}:{bound_port}"
+        logger.info(f"Stub RPC server listening on {self.url}")
+        return self.url
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+async def serve(args: argparse.Namespace):
+    server = StubRpcServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    await server.start(args.host, args.port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds, uniformly random")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 429")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
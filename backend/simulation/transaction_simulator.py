@@ -1,74 +1,77 @@
 import logging
-import aiohttp
 import json
 import base64
 from typing import Dict, Any, Optional
 import os
+from ..integrations.rpc_router import RpcRouter, rpc_router
+from ..integrations.chain_prefetcher import ChainPrefetcher, chain_prefetcher, LAMPORTS_PER_SIGNATURE
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("transaction_simulator")
 
+def signature_count(transaction_base64: str) -> int:
+    """Number of signatures a serialized transaction carries (compact-u16 length prefix)"""
+    raw = base64.b64decode(transaction_base64)
+    count = 0
+    for i in range(min(3, len(raw))):
+        count |= (raw[i] & 0x7F) << (7 * i)
+        if not raw[i] & 0x80:
+            break
+    return max(count, 1)
+
 class TransactionSimulator:
-    def __init__(self):
-        # Use a public RPC endpoint for Solana
-        self.rpc_url = os.getenv("SOLANA_RPC_URL", "https://api.mainnet-beta.solana.com")
-        logger.info(f"Initialized Transaction Simulator with RPC: {self.rpc_url}")
+    def __init__(self, router: Optional[RpcRouter] = None, prefetcher: Optional[ChainPrefetcher] = None):
+        # Share the endpoint pool (SOLANA_RPC_URLS) and its latency statistics with the Solana client
+        self.router = router or rpc_router
+        self.prefetcher = prefetcher or chain_prefetcher
+        logger.info(f"Initialized Transaction Simulator with RPC: {', '.join(self.router.urls)}")
     
     async def simulate_transaction(self, transaction_base64: str) -> Dict[str, Any]:
         """
         Simulate a transaction using Solana's simulateTransaction RPC method
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "jsonrpc": "2.0",
-                    "id": 1,
-                    "method": "simulateTransaction",
-                    "params": [
-                        transaction_base64,
-                        {
-                            "encoding": "base64",
-                            "commitment": "confirmed",
-                            "accounts": {
-                                "encoding": "base64",
-                                "addresses": []
-                            },
-                            "sigVerify": False
-                        }
-                    ]
+            params = [
+                transaction_base64,
+                {
+                    "encoding": "base64",
+                    "commitment": "confirmed",
+                    "accounts": {
+                        "encoding": "base64",
+                        "addresses": []
+                    },
+                    "sigVerify": False
                 }
-                
-                async with session.post(self.rpc_url, json=payload) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"RPC error: {error_text}")
-                        return {"success": False, "error": error_text}
-                    
-                    data = await response.json()
-                    
-                    if "error" in data:
-                        logger.error(f"Simulation error: {data['error']}")
-                        return {"success": False, "error": data["error"]}
-                    
-                    result = data.get("result", {})
-                    
-                    # Check for errors in the simulation
-                    if "err" in result and result["err"] is not None:
-                        logger.error(f"Transaction would fail: {result['err']}")
-                        return {
-                            "success": False,
-                            "error": f"Transaction would fail: {result['err']}",
-                            "logs": result.get("logs", [])
-                        }
-                    
-                    # Extract useful information from the simulation
-                    return {
-                        "success": True,
-                        "logs": result.get("logs", []),
-                        "accounts": result.get("accounts", []),
-                        "unitsConsumed": result.get("unitsConsumed", 0)
-                    }
+            ]
+            
+            # Simulation sits on the execution path, so hedge against a slow node
+            data = await self.router.call("simulateTransaction", params, hedge=True)
+            
+            if "error" in data:
+                logger.error(f"Simulation error: {data['error']}")
+                return {"success": False, "error": data["error"]}
+            
+            # The simulation outcome is wrapped in an RpcResponse context
+            result = data.get("result", {})
+            result = result.get("value", result)
+            
+            # Check for errors in the simulation
+            if "err" in result and result["err"] is not None:
+                logger.error(f"Transaction would fail: {result['err']}")
+                return {
+                    "success": False,
+                    "error": f"Transaction would fail: {result['err']}",
+                    "logs": result.get("logs", [])
+                }
+            
+            # Extract useful information from the simulation
+            return {
+                "success": True,
+                "logs": result.get("logs", []),
+                "accounts": result.get("accounts", []),
+                "unitsConsumed": result.get("unitsConsumed", 0)
+            }
         except Exception as e:
             logger.error(f"Error simulating transaction: {str(e)}")
             return {"success": False, "error": str(e)}
@@ -83,40 +86,25 @@ class TransactionSimulator:
             if not simulation_result["success"]:
                 return simulation_result
             
-            # Get the latest fee schedule
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "jsonrpc": "2.0",
-                    "id": 1,
-                    "method": "getFees",
-                    "params": []
-                }
-                
-                async with session.post(self.rpc_url, json=payload) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"RPC error: {error_text}")
-                        return {"success": False, "error": error_text}
-                    
-                    data = await response.json()
-                    
-                    if "error" in data:
-                        logger.error(f"Fee estimation error: {data['error']}")
-                        return {"success": False, "error": data["error"]}
-                    
-                    result = data.get("result", {})
-                    
-                    # Calculate fee based on units consumed
-                    units_consumed = simulation_result.get("unitsConsumed", 0)
-                    lamports_per_cu = result.get("feeCalculator", {}).get("lamportsPerSignature", 5000) / 100000
-                    estimated_fee = int(units_consumed * lamports_per_cu)
-                    
-                    return {
-                        "success": True,
-                        "estimated_fee_lamports": estimated_fee,
-                        "estimated_fee_sol": estimated_fee / 1_000_000_000,  # Convert to SOL
-                        "units_consumed": units_consumed
-                    }
+            # Base fee per signature plus the priority fee for the compute units used
+            if not self.prefetcher.fee_samples:
+                # Only before the prefetcher's first refresh
+                await self.prefetcher.refresh_fees()
+            compute_unit_price = self.prefetcher.get_priority_fee()
+            units_consumed = simulation_result.get("unitsConsumed", 0)
+            base_fee = signature_count(transaction_base64) * LAMPORTS_PER_SIGNATURE
+            priority_fee = -(-units_consumed * compute_unit_price // 1_000_000)  # Micro-lamports, rounded up
+            estimated_fee = base_fee + priority_fee
+            
+            return {
+                "success": True,
+                "estimated_fee_lamports": estimated_fee,
+                "estimated_fee_sol": estimated_fee / 1_000_000_000,  # Convert to SOL
+                "base_fee_lamports": base_fee,
+                "priority_fee_lamports": priority_fee,
+                "compute_unit_price_micro_lamports": compute_unit_price,
+                "units_consumed": units_consumed
+            }
         except Exception as e:
             logger.error(f"Error estimating transaction fee: {str(e)}")
             return {"success": False, "error": str(e)}
@@ -0,0 +1,146 @@
+"""
+Check that push pricing picks up pools the registry only learns about after the feed started.
+
+Usage:
+    python -m backend.simulation.verify_account_stream
+    python -m backend.simulation.verify_account_stream --pools 20
+
+The feed starts against an empty registry, as on a cold start without a snapshot. A stub pool
+API then serves the pool list on the registry's first refresh, and a replay server sends vault
+updates for those pools. The checks cover that nothing is subscribed before the refresh, that the
+refresh subscribes every pool's vaults once, and that the replayed updates reach the subscribers
+in the same units as polled quotes, with price moves measured against the same source.
+"""
+import sys
+import asyncio
+import argparse
+import logging
+from typing import Dict, List, Optional
+from aiohttp import web
+from ..integrations.http_session import close_session
+from ..integrations.pool_registry import PoolRegistry
+from ..integrations.pool_stream import raydium_pool_record
+from ..realtime.account_stream import AccountStream
+from ..realtime.price_feed import PriceFeed
+from ..realtime.replay_server import ReplayServer, token_account_data
+from .verify_atomic_arbitrage import USDC_MINT, check, random_pubkey
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("verify_account_stream")
+
+class StubPoolApi:
+    """Serves a fixed Raydium-style pool list"""
+    def __init__(self, pools: List[Dict]):
+        self.pools = pools
+        self.requests = 0
+        self.runner: Optional[web.AppRunner] = None
+
+    async def pools_handler(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        return web.json_response(self.pools)
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get("/pools", self.pools_handler)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        return f"http://127.0.0.1:{self.runner.addresses[0][1]}/pools"
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+async def wait_until(condition, timeout: float = 10) -> bool:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+async def verify(args: argparse.Namespace) -> List[str]:
+    pools = [
+        {
+            "id": random_pubkey(),
+            "baseMint": random_pubkey(),
+            "quoteMint": USDC_MINT,
+            "baseDecimals": 9,
+            "quoteDecimals": 6,
+            "baseVault": random_pubkey(),
+            "quoteVault": random_pubkey()
+        }
+        for _ in range(args.pools)
+    ]
+    # Each pool's reserves price its token at i + 1 USDC
+    records = []
+    for i, pool in enumerate(pools):
+        records.append({"t": 0, "pubkey": pool["baseVault"], "slot": 2 * i + 1, "data": token_account_data(1000 * 10 ** 9)})
+        records.append({"t": 0, "pubkey": pool["quoteVault"], "slot": 2 * i + 2,
+                        "data": token_account_data(1000 * (i + 1) * 10 ** 6)})
+
+    pool_api = StubPoolApi(pools)
+    pool_url = await pool_api.start()
+    server = ReplayServer(records, speed=0)
+    ws_url = await server.start()
+    failures: List[str] = []
+    stream = AccountStream(ws_url=ws_url)
+    try:
+        registry = PoolRegistry("Raydium", pool_url, raydium_pool_record)
+        feed = PriceFeed(None)
+        pushed: Dict[tuple, float] = {}
+        for pool in pools:
+            feed.add_token_pair(pool["baseMint"], USDC_MINT)
+            feed.add_token_pair(USDC_MINT, pool["baseMint"])
+        feed.subscribe_all(lambda pair, price_data: pushed.__setitem__(pair, price_data["price"]))
+
+        feed.watch_pools(stream, {"Raydium": registry})
+        check(failures, not stream.account_handlers,
+              f"nothing is subscribed while the registry is empty ({len(stream.account_handlers)} accounts)")
+
+        await registry.refresh()
+        check(failures, len(stream.account_handlers) == 2 * len(pools),
+              f"the first refresh subscribes every pool's vaults ({len(stream.account_handlers)} of {2 * len(pools)})")
+        await registry.refresh()
+        check(failures, len(stream.account_handlers) == 2 * len(pools) and pool_api.requests == 2,
+              "a second refresh subscribes nothing again")
+
+        subscribed = await wait_until(lambda: len(stream.subscriptions) == len(stream.account_handlers))
+        check(failures, subscribed, "the stream confirms every subscription")
+        await server.replay()
+        await wait_until(lambda: stream.notifications >= len(records))
+
+        prices_ok = all(
+            abs(pushed.get((pool["baseMint"], USDC_MINT), 0) - (i + 1)) < 1e-9
+            and abs(pushed.get((USDC_MINT, pool["baseMint"]), 0) - 1 / (i + 1)) < 1e-9
+            for i, pool in enumerate(pools)
+        )
+        check(failures, prices_ok, "replayed vault updates push both directions of every pair in USDC per token")
+        check(failures, len(feed.pushed_at) == 2 * len(pools), "pushed pairs are no longer polled")
+
+        # A polled quote in between must not register as a move of the pushed price
+        pair = (pools[0]["baseMint"], USDC_MINT)
+        feed.update_price(pair, {"inputMint": pair[0], "outputMint": pair[1], "price": 0.99, "source": "Jupiter"})
+        feed.on_pool_update("Raydium", registry.get_pool(*pair), len(records) + 1)
+        change = feed.get_latest_price(*pair).get("price_change_pct")
+        check(failures, change is not None and abs(change) < 1e-9,
+              f"pushed prices only move relative to earlier pushes ({change}%)")
+    finally:
+        await stream.stop()
+        await server.stop()
+        await pool_api.stop()
+        await close_session()
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pools", type=int, default=5, help="Pools the stub API lists")
+    args = parser.parse_args()
+    failures = asyncio.run(verify(args))
+    print(f"{len(failures)} check(s) failed" if failures else "All checks passed")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Build an atomic two-leg arbitrage transaction against local stand-ins and check it end to end.
+
+Usage:
+    python -m backend.simulation.verify_atomic_arbitrage
+    python -m backend.simulation.verify_atomic_arbitrage --buy-rate 1.0 --sell-rate 1.01 --min-profit-pct 0.25
+
+A stub Jupiter API serves quotes at fixed rates and swap instructions whose accounts sit in an
+address lookup table; the stub RPC server serves that table and simulates the composed
+transaction by decoding it. The checks cover the instruction order, the accounts resolved
+through the table, the size limit and the minimum-profit bound sent with the sell leg, and
+that a spread too thin for the minimum profit is refused before any transaction is built.
+"""
+import os
+import sys
+import base64
+import struct
+import asyncio
+import argparse
+import logging
+from typing import Dict, List, Optional
+import base58
+from aiohttp import web
+from ..integrations.atomic_transaction import (
+    AtomicArbitrageBuilder, COMPUTE_BUDGET_PROGRAM_ID, LOOKUP_TABLE_ACTIVE, LOOKUP_TABLE_META_SIZE, PACKET_DATA_SIZE
+)
+from ..integrations.chain_prefetcher import ChainPrefetcher
+from ..integrations.http_session import close_session
+from ..integrations.jupiter_client import JupiterClient, JUPITER_DEX_LABELS
+from ..integrations.quote_cache import QuoteCache
+from ..integrations.rpc_router import RpcRouter
+from ..integrations.solana_client import SolanaClient
+from .transaction_simulator import TransactionSimulator
+from .stub_rpc_server import StubRpcServer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("verify_atomic_arbitrage")
+
+USDC_MINT = "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"
+TOKEN_MINT = "So11111111111111111111111111111111111111112"
+SWAP_PROGRAM_ID = "JUP6LkbZbjS1jKKwapdHNy74zcZ3tLUZoi5QNyVTaV4"
+TOKEN_PROGRAM_ID = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+ATA_PROGRAM_ID = "ATokenGPvbdGVxr1b2hvZbsiqW5xqHgu6zqqbBVsgFW"
+
+def random_pubkey() -> str:
+    return base58.b58encode(os.urandom(32)).decode()
+
+def lookup_table_data(addresses: List[str]) -> bytes:
+    """An active lookup table account holding addresses"""
+    header = struct.pack("<IQQB", 1, LOOKUP_TABLE_ACTIVE, 1, 0) + b"\0" * 33
+    header += b"\0" * (LOOKUP_TABLE_META_SIZE - len(header))
+    return header + b"".join(base58.b58decode(address) for address in addresses)
+
+class StubJupiter:
+    """Quote, swap and swap-instructions endpoints pricing each DEX at a fixed rate per direction"""
+    def __init__(self, rates: Dict[str, Dict[str, float]]):
+        self.rates = rates  # dex -> "buy"/"sell" -> output per input, in smallest units
+        self.pool_accounts = {dex: [random_pubkey() for _ in range(12)] for dex in rates}
+        self.table = random_pubkey()
+        self.quote_requests: List[Dict] = []
+        self.swap_requests: List[Dict] = []
+        self.runner: Optional[web.AppRunner] = None
+
+    @property
+    def table_addresses(self) -> List[str]:
+        return [address for accounts in self.pool_accounts.values() for address in accounts]
+
+    def _dex(self, labels: Optional[str]) -> str:
+        for dex, dex_labels in JUPITER_DEX_LABELS.items():
+            if dex in self.rates and labels and dex_labels and labels == ",".join(dex_labels):
+                return dex
+        return "Jupiter"
+
+    async def quote(self, request: web.Request) -> web.Response:
+        params = request.query
+        self.quote_requests.append(dict(params))
+        dex = self._dex(params.get("dexes"))
+        side = "buy" if params["inputMint"] == USDC_MINT else "sell"
+        amount = int(params["amount"])
+        slippage_bps = int(params["slippageBps"])
+        out_amount = int(amount * self.rates[dex][side])
+        return web.json_response({
+            "inputMint": params["inputMint"],
+            "outputMint": params["outputMint"],
+            "inAmount": str(amount),
+            "outAmount": str(out_amount),
+            "otherAmountThreshold": str(out_amount * (10_000 - slippage_bps) // 10_000),
+            "slippageBps": slippage_bps,
+            "swapMode": "ExactIn",
+            "routePlan": [{"swapInfo": {"label": dex}}]
+        })
+
+    async def swap_instructions(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        self.swap_requests.append(payload)
+        quote = payload["quoteResponse"]
+        dex = quote["routePlan"][0]["swapInfo"]["label"]
+
+        def instruction(program_id: str, accounts: List[Dict], data: bytes) -> Dict:
+            return {"programId": program_id, "accounts": accounts, "data": base64.b64encode(data).decode()}
+
+        user = {"pubkey": payload["userPublicKey"], "isSigner": True, "isWritable": True}
+        pool_accounts = [
+            {"pubkey": address, "isSigner": False, "isWritable": i % 3 != 0}
+            for i, address in enumerate(self.pool_accounts[dex])
+        ]
+        output_ata = {"pubkey": quote["outputMint"], "isSigner": False, "isWritable": False}
+        return web.json_response({
+            "computeBudgetInstructions": [
+                instruction(COMPUTE_BUDGET_PROGRAM_ID, [], struct.pack("<BI", 2, 200_000))
+            ],
+            "setupInstructions": [
+                # Creating the token account the buy fills and the sell drains, once per leg
+                instruction(ATA_PROGRAM_ID, [user, {"pubkey": TOKEN_MINT, "isSigner": False, "isWritable": False}], b"\x01")
+            ],
+            # The swap data carries the amounts the program enforces
+            "swapInstruction": instruction(
+                SWAP_PROGRAM_ID,
+                [user, {"pubkey": TOKEN_PROGRAM_ID, "isSigner": False, "isWritable": False}, output_ata] + pool_accounts,
+                struct.pack("<QQH", int(quote["inAmount"]), int(quote["otherAmountThreshold"]), int(quote["slippageBps"]))
+            ),
+            "cleanupInstruction": None,
+            "addressLookupTableAddresses": [self.table]
+        })
+
+    async def swap(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        self.swap_requests.append(payload)
+        return web.json_response({"swapTransaction": base64.b64encode(bytes(128)).decode()})
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get("/quote", self.quote)
+        app.router.add_post("/swap", self.swap)
+        app.router.add_post("/swap-instructions", self.swap_instructions)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        return f"http://127.0.0.1:{self.runner.addresses[0][1]}"
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+def check(failures: List[str], ok: bool, label: str):
+    print(f"{'PASS' if ok else 'FAIL'}: {label}")
+    if not ok:
+        failures.append(label)
+
+async def verify(args: argparse.Namespace) -> List[str]:
+    user = random_pubkey()
+    jupiter = StubJupiter({
+        "Raydium": {"buy": args.buy_rate, "sell": 1 / args.buy_rate},
+        "Orca": {"buy": 1 / args.sell_rate, "sell": args.sell_rate},
+        "Jupiter": {"buy": args.buy_rate, "sell": 1 / args.buy_rate}
+    })
+    jupiter_url = await jupiter.start()
+    rpc = StubRpcServer(accounts={jupiter.table: lookup_table_data(jupiter.table_addresses)})
+    rpc_url = await rpc.start()
+    failures: List[str] = []
+    try:
+        router = RpcRouter([rpc_url])
+        jupiter_client = JupiterClient(quote_cache=QuoteCache())
+        jupiter_client.base_url = jupiter_url
+        prefetcher = ChainPrefetcher(router)
+        builder = AtomicArbitrageBuilder(jupiter_client, SolanaClient(router=router), prefetcher)
+        simulator = TransactionSimulator(router, prefetcher)
+
+        amount = args.amount * 10 ** 6
+        min_profit = int(amount * args.min_profit_pct / 100)
+        result = await builder.build(USDC_MINT, TOKEN_MINT, amount, user, args.slippage_bps, min_profit,
+                                     "Raydium", "Orca", compute_unit_price=1000)
+        check(failures, result["success"], f"profitable spread builds ({result.get('error', 'ok')})")
+        if not result["success"]:
+            return failures
+
+        simulation = await simulator.simulate_transaction(result["transaction"])
+        check(failures, simulation["success"], f"stub RPC simulates the transaction ({simulation.get('error', 'ok')})")
+        check(failures, len(rpc.simulated) == 1, "one transaction carries both legs")
+        if not rpc.simulated:
+            return failures
+        decoded = rpc.simulated[0]
+
+        programs = [instruction["program_id"] for instruction in decoded["instructions"]]
+        check(failures, programs == [COMPUTE_BUDGET_PROGRAM_ID, COMPUTE_BUDGET_PROGRAM_ID, ATA_PROGRAM_ID, SWAP_PROGRAM_ID, SWAP_PROGRAM_ID],
+              "one compute budget, shared setup once, then buy and sell swaps")
+        limit = struct.unpack_from("<I", decoded["instructions"][0]["data"], 1)[0]
+        check(failures, limit == 400_000, f"compute unit limit covers both swaps ({limit})")
+        check(failures, decoded["size"] <= PACKET_DATA_SIZE, f"size {decoded['size']} bytes fits in a packet")
+        check(failures, [lookup["table"] for lookup in decoded["address_table_lookups"]] == [jupiter.table],
+              "pool accounts load from the lookup table")
+        buy_swap, sell_swap = decoded["instructions"][3:]
+        check(failures, buy_swap["accounts"][3:] == jupiter.pool_accounts["Raydium"]
+              and sell_swap["accounts"][3:] == jupiter.pool_accounts["Orca"], "looked-up accounts resolve to each leg's pools")
+        check(failures, decoded["account_keys"][0] == user and decoded["header"][0] == 1, "wallet is the only signer and pays the fee")
+        check(failures, decoded["recent_blockhash"] == prefetcher.get_blockhash().blockhash, "uses the prefetched blockhash")
+
+        buy_in, buy_min_out, _ = struct.unpack("<QQH", buy_swap["data"])
+        sell_in, sell_min_out, _ = struct.unpack("<QQH", sell_swap["data"])
+        check(failures, buy_in == amount and sell_in == buy_min_out, "sell leg spends the buy leg's guaranteed output")
+        check(failures, sell_min_out >= amount + min_profit,
+              f"sell leg reverts below input plus minimum profit ({sell_min_out} >= {amount + min_profit})")
+
+        swap_requests = len(jupiter.swap_requests)
+        thin = await builder.build(USDC_MINT, TOKEN_MINT, amount, user, args.slippage_bps,
+                                   int(amount * (args.sell_rate / args.buy_rate - 1) * 2), "Raydium", "Orca")
+        check(failures, not thin["success"] and len(jupiter.swap_requests) == swap_requests,
+              f"spread below the minimum profit is refused before building ({thin.get('error')})")
+
+        # A quote taken while sizing stands in for a Jupiter buy leg
+        buy_quote = await jupiter_client.get_quote(USDC_MINT, TOKEN_MINT, amount, args.slippage_bps)
+        quote_requests = len(jupiter.quote_requests)
+        reused = await builder.build(USDC_MINT, TOKEN_MINT, amount, user, args.slippage_bps, min_profit,
+                                     "Jupiter", "Orca", compute_unit_price=1000, buy_quote=buy_quote)
+        check(failures, reused["success"] and not any(
+            request["inputMint"] == USDC_MINT for request in jupiter.quote_requests[quote_requests:]
+        ) and buy_quote.quote_response in [request["quoteResponse"] for request in jupiter.swap_requests[-2:]],
+              "a matching buy quote is reused without quoting the buy leg again")
+    finally:
+        await rpc.stop()
+        await jupiter.stop()
+        await close_session()
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--amount", type=int, default=100, help="USDC spent on the buy leg")
+    parser.add_argument("--buy-rate", type=float, default=1.0, help="Tokens per USDC on the buy DEX")
+    parser.add_argument("--sell-rate", type=float, default=1.01, help="USDC per token on the sell DEX")
+    parser.add_argument("--min-profit-pct", type=float, default=0.25)
+    parser.add_argument("--slippage-bps", type=int, default=50)
+    args = parser.parse_args()
+    failures = asyncio.run(verify(args))
+    print(f"{len(failures)} check(s) failed" if failures else "All checks passed")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
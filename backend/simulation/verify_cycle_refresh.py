@@ -0,0 +1,79 @@
+"""
+Check that rate updates only re-price the cycles they touch.
+
+Usage:
+    python -m backend.simulation.verify_cycle_refresh
+
+Two profitable triangles that share no edge are found with a full refresh. One edge of the first
+is then updated, and an incremental refresh must re-price that triangle alone, searching from the
+updated edge only. A burst of live pool updates on the second triangle must then be folded into a
+single debounced refresh, as the account stream listener schedules it.
+"""
+import sys
+import asyncio
+import logging
+from typing import List
+from ..arbitrage.cycle_detector import CycleDetector
+from ..integrations.pool_stream import PoolRecord
+from .verify_atomic_arbitrage import check
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("verify_cycle_refresh")
+
+DEBOUNCE = 0.05
+
+def add_triangle(detector: CycleDetector, mints: List[str], closing_rate: float):
+    """A triangle that gains closing_rate - 1 one way round and loses 2% per hop the other way"""
+    for i, input_mint in enumerate(mints):
+        output_mint = mints[(i + 1) % len(mints)]
+        detector.update_rate("Raydium", input_mint, output_mint, closing_rate if i == len(mints) - 1 else 1.0)
+        detector.update_rate("Raydium", output_mint, input_mint, 0.98)
+
+async def verify() -> List[str]:
+    failures: List[str] = []
+    detector = CycleDetector(min_profit_pct=0.1, refresh_debounce=DEBOUNCE)
+    add_triangle(detector, ["U", "A", "B"], 1.01)
+    add_triangle(detector, ["V", "C", "D"], 1.02)
+
+    cycles = detector.refresh(full=True)
+    keys = {frozenset(cycle.mints): cycle.key for cycle in cycles}
+    check(failures, set(keys) == {frozenset("UAB"), frozenset("VCD")}, f"a full refresh finds both triangles ({len(cycles)} cycles)")
+    if set(keys) != {frozenset("UAB"), frozenset("VCD")}:
+        return failures
+    first, second = detector.cycles[keys[frozenset("UAB")]], detector.cycles[keys[frozenset("VCD")]]
+    second_weight = second.weight
+
+    searches = detector.searches
+    detector.update_rate("Raydium", "B", "U", 1.015)
+    changed = detector.refresh()
+    check(failures, [cycle.key for cycle in changed] == [first.key], "an incremental refresh re-prices only the updated triangle")
+    check(failures, abs(first.profit_pct - 1.5) < 1e-9, f"the updated triangle's profit follows the new rate ({first.profit_pct:.3f}%)")
+    check(failures, second.weight == second_weight, "the untouched triangle keeps its price")
+    check(failures, detector.searches - searches == 1,
+          f"new cycles are only searched from the updated edge ({detector.searches - searches} searches)")
+    check(failures, detector.refresh() == [], "a refresh without updates does nothing")
+
+    # Live pool updates on C/D, as the account stream delivers them within one slot
+    searches = detector.searches
+    pool = PoolRecord("pool", "C", "D", price=1.0)
+    for price in (1.001, 1.003, 1.005):
+        pool.price = price
+        detector.on_pool_update("Raydium", pool, 1)
+    check(failures, detector.refresh_handle is not None and second.weight == second_weight,
+          "pool updates schedule a refresh instead of running one each")
+    await asyncio.sleep(DEBOUNCE * 4)
+    check(failures, detector.refresh_handle is None and not detector.dirty, "the debounced refresh ran")
+    check(failures, abs(second.profit_pct - (1.005 * 1.02 - 1) * 100) < 1e-9,
+          f"it re-priced the triangle through the pool at its last price ({second.profit_pct:.3f}%)")
+    check(failures, detector.searches - searches == 2,
+          f"one refresh searched from both sides of the pool ({detector.searches - searches} searches)")
+    return failures
+
+def main():
+    failures = asyncio.run(verify())
+    print(f"{len(failures)} check(s) failed" if failures else "All checks passed")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Check that the quotes taken while sizing a trade are the ones its swaps are built from.
+
+Usage:
+    python -m backend.simulation.verify_quote_reuse
+
+A stub Jupiter API prices a token at a fixed spread. The trade is sized against it, the sizing's
+quotes are kept per pair and direction as the engine keeps them, and both swaps are then built.
+The checks cover that each swap reuses its leg's quote without a second /quote request, and that
+a quote is only handed out for the exact amount and slippage it was taken for.
+"""
+import sys
+import asyncio
+import logging
+from typing import List
+from ..arbitrage.trade_sizing import TradeSizer
+from ..integrations.http_session import close_session
+from ..integrations.jupiter_client import JupiterClient, QuoteHandleStore
+from ..integrations.quote_cache import QuoteCache
+from .verify_atomic_arbitrage import StubJupiter, USDC_MINT, TOKEN_MINT, check, random_pubkey
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("verify_quote_reuse")
+
+SLIPPAGE_BPS = 50
+
+async def verify() -> List[str]:
+    jupiter = StubJupiter({"Jupiter": {"buy": 1.0, "sell": 1.01}})
+    jupiter_url = await jupiter.start()
+    failures: List[str] = []
+    try:
+        client = JupiterClient(quote_cache=QuoteCache())
+        client.base_url = jupiter_url
+        sizer = TradeSizer({"Jupiter": client})
+        store = QuoteHandleStore()
+        user = random_pubkey()
+
+        sizing = await sizer.size("Jupiter", "Jupiter", TOKEN_MINT, 6, USDC_MINT, 6, 10, 1000,
+                                  slippage_bps=SLIPPAGE_BPS)
+        check(failures, sizing is not None and set(sizing.quotes) == {"buy", "sell"},
+              "sizing quotes both legs at the chosen size")
+        if sizing is None or set(sizing.quotes) != {"buy", "sell"}:
+            return failures
+        for quote_handle in sizing.quotes.values():
+            store.remember(quote_handle)
+
+        usdc_amount = int(sizing.size * 10 ** 6)
+        buy_quote = store.get(USDC_MINT, TOKEN_MINT, usdc_amount, SLIPPAGE_BPS)
+        sell_quote = store.get(TOKEN_MINT, USDC_MINT, buy_quote.out_amount if buy_quote else 0, SLIPPAGE_BPS)
+        check(failures, buy_quote is not None and sell_quote is not None, "both legs find their quote by pair and direction")
+        if buy_quote is None or sell_quote is None:
+            return failures
+
+        quotes_before = len(jupiter.quote_requests)
+        buy_tx, sell_tx = await asyncio.gather(
+            client.create_swap_transaction(USDC_MINT, TOKEN_MINT, usdc_amount, user, SLIPPAGE_BPS, quote_handle=buy_quote),
+            client.create_swap_transaction(TOKEN_MINT, USDC_MINT, buy_quote.out_amount, user, SLIPPAGE_BPS, quote_handle=sell_quote)
+        )
+        check(failures, buy_tx["success"] and sell_tx["success"], "both swaps build")
+        check(failures, buy_tx.get("quoteReused") and sell_tx.get("quoteReused"), "both swaps reuse the sizing quotes")
+        check(failures, len(jupiter.quote_requests) == quotes_before,
+              f"no second /quote request ({len(jupiter.quote_requests) - quotes_before} made)")
+        swapped = [request["quoteResponse"] for request in jupiter.swap_requests]
+        check(failures, len(swapped) == 2 and buy_quote.quote_response in swapped and sell_quote.quote_response in swapped,
+              "swaps are built from the sizing quotes")
+
+        check(failures, store.get(USDC_MINT, TOKEN_MINT, usdc_amount + 1, SLIPPAGE_BPS) is None,
+              "a quote is not handed out for another amount")
+        check(failures, store.get(USDC_MINT, TOKEN_MINT, usdc_amount, SLIPPAGE_BPS + 1) is None,
+              "a quote is not handed out for another slippage")
+    finally:
+        await jupiter.stop()
+        await close_session()
+    return failures
+
+def main():
+    failures = asyncio.run(verify())
+    print(f"{len(failures)} check(s) failed" if failures else "All checks passed")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()